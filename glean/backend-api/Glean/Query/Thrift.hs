@@ -28,7 +28,10 @@ module Glean.Query.Thrift
   , limitTime
   , expanding
   , store
+  , streamed
+  , inParallel
   , allFacts
+  , parameter
     -- * Support
   , displayQuery
   ) where
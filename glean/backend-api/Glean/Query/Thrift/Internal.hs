@@ -25,8 +25,11 @@ module Glean.Query.Thrift.Internal
   , limitBytes
   , limitTime
   , store
+  , streamed
+  , inParallel
   , allFacts
   , expanding
+  , parameter
     -- * Support
   , reportUserQueryStats
   , showUserQueryStats
@@ -194,6 +197,18 @@ expanding (Query q) = Query q'
     { userQueryOptions_expand_predicates =
        ref : userQueryOptions_expand_predicates old }}
 
+-- | Supply the value of a parameter @$name@ of a prepared query. The
+-- server compiles the query once for all values of its parameters.
+--
+-- >   parameter "file" (QueryParameter_string_value path) $
+-- >     angle @Src.File "src.File $file"
+--
+parameter :: Text -> Thrift.QueryParameter -> Query a -> Query a
+parameter name value (Query q) = Query q'
+  where
+  q' = q { userQuery_parameters =
+    Map.insert name value (userQuery_parameters q) }
+
 -- | Set a limit on the number of results returned by a query. This controls
 -- query result page size when streaming.
 limit :: Int -> Query a -> Query a
@@ -229,6 +244,27 @@ store (Query q) = Query q'
   q' = q { userQuery_options = Just (fromMaybe def (userQuery_options q))
     { userQueryOptions_store_derived_facts = True } }
 
+-- | Keep the query running on the server between pages of results,
+-- instead of restarting it from a continuation for each page. The
+-- server computes each page while the previous one is being processed.
+-- Useful for queries that return many pages, such as exports, when
+-- every page is fetched from the same server ('runQueryEach' etc.).
+streamed :: Query a -> Query a
+streamed (Query q) = Query q'
+  where
+  q' = q { userQuery_options = Just (fromMaybe def (userQuery_options q))
+    { userQueryOptions_stream = True } }
+
+-- | Run the query on up to this many threads on the server, each
+-- searching part of the facts. Results may come back in a different
+-- order, and the limits set with 'limit' and 'limitBytes' are shared
+-- between the threads.
+inParallel :: Int -> Query a -> Query a
+inParallel n (Query q) = Query q'
+  where
+  q' = q { userQuery_options = Just (fromMaybe def (userQuery_options q))
+    { userQueryOptions_parallelism = fromIntegral n } }
+
 justCheck :: Query a -> Query a
 justCheck (Query q) = Query q'
   where
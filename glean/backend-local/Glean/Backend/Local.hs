@@ -130,6 +130,7 @@ instance Backend Database.Env where
             , userQuery_schema_id = userQueryBatch_schema_id <|> schemaId env
             , userQuery_options = userQueryBatch_options
             , userQuery_query = q
+            , userQuery_parameters = Map.empty
             }
           | q <- userQueryBatch_queries
           ]
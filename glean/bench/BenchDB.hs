@@ -7,7 +7,7 @@
 -}
 
 {-# LANGUAGE TypeApplications #-}
-module BenchDB (withBenchDB) where
+module BenchDB (withBenchDB, withBenchDBSettings) where
 
 import Control.Monad
 import qualified Data.ByteString.Char8 as BC
@@ -33,13 +33,22 @@ withBenchDB
   -> Int
   -> (forall b . Backend b => b -> Repo -> IO a)
   -> IO a
-withBenchDB conf num act = do
+withBenchDB conf num = withBenchDBSettings conf num []
+
+-- | Like 'withBenchDB', with extra settings for the test environment
+withBenchDBSettings
+  :: GleanBenchConfig
+  -> Int
+  -> [Setting]
+  -> (forall b . Backend b => b -> Repo -> IO a)
+  -> IO a
+withBenchDBSettings conf num extra act = do
   let
     settings
       | useLMDB conf = [setLMDBStorage]
       | otherwise = []
 
-  withEmptyTestDB (enableRocksDBCache : settings) $ \env repo -> do
+  withEmptyTestDB (enableRocksDBCache : settings ++ extra) $ \env repo -> do
   withOpenDatabase env repo $ \odb ->
     void $ return odb
 
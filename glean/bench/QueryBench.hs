@@ -19,6 +19,7 @@ import Util.String.Quasi
 
 import Glean
 import Glean.Angle as Angle
+import Glean.Database.Test (setRocksDBKeyPrefixBytes)
 import qualified Glean.Schema.CodeCxx.Types as Code.Cxx
 import qualified Glean.Schema.Codemarkup.Types as Codemarkup
 import qualified Glean.Schema.Cxx1.Types as Cxx
@@ -31,6 +32,9 @@ import BenchDB
 main :: IO ()
 main = benchmarkMain $ \conf run ->
   withBenchDB conf 10000 $ \env repo -> do
+  -- the same facts, with prefix bloom filters on the keys
+  withBenchDBSettings conf 10000 [setRocksDBKeyPrefixBytes 4] $
+    \penv prepo -> do
   let
     nestedAngle :: Query Cxx.FunctionName
     nestedAngle = angle "cxx1.FunctionName { name = \"x1\" }"
@@ -73,6 +77,14 @@ main = benchmarkMain $ \conf run ->
         codemarkup.FileEntityXRefLocations { file = "foo" }
       |]
 
+    -- searches for key prefixes that no fact has, which the prefix
+    -- bloom filters can rule out without reading the files
+    missingPrefix :: Query Cxx.Name
+    missingPrefix = angle "cxx1.Name \"zzzz\".."
+
+    missingKey :: Query Sys.Blob
+    missingKey = angle "sys.Blob \"nope\""
+
     arrayPrefix :: Query Nat
     arrayPrefix = angleData @Nat
       [s| N where
@@ -115,4 +127,18 @@ main = benchmarkMain $ \conf run ->
         , bench "pagenested" $ whnfIO $
             runQuery_ env repo pageNestedAngle
         ]
+      , bgroup "key_prefix"
+        [ bench "missing_prefix" $ whnfIO $
+            runQuery_ env repo missingPrefix
+        , bench "missing_prefix_bloom" $ whnfIO $
+            runQuery_ penv prepo missingPrefix
+        , bench "missing_key" $ whnfIO $
+            runQuery_ env repo missingKey
+        , bench "missing_key_bloom" $ whnfIO $
+            runQuery_ penv prepo missingKey
+        , bench "page" $ whnfIO $
+            runQuery_ env repo pageAngle
+        , bench "page_bloom" $ whnfIO $
+            runQuery_ penv prepo pageAngle
+        ]
       ]
@@ -90,6 +90,16 @@ struct DatabaseRestorePolicy {
   // if enabled is true, this is a blocklist
   // if enabled is false, this is an allowlist
   2: set<RepoName> override = [];
+
+  // Restore DBs in two stages where the backup allows it (RocksDB
+  // backups made with db_rocksdb_backup_sst_files): first fetch and
+  // restore the small column families (admin, meta and stats), after
+  // which the DB is available, and then fetch and restore the rest in
+  // the background. Until then, requests that read facts fail with
+  // Retry, while the DB's metadata, schema and predicate stats can be
+  // fetched. Sites that can't fetch part of a backup fetch all of it
+  // in the first stage.
+  3: bool lazy = false;
 }
 
 struct DatabaseClosePolicy {
@@ -178,6 +188,16 @@ union SchemaLocation {
   5: string indexconfig;
 }
 
+// How to compress a column family of a RocksDB database
+enum RocksDBCompression {
+  LZ4 = 0,
+  ZSTD = 1,
+  // ZSTD with a dictionary trained on samples of each file, which
+  // compresses small, similar entries much better
+  ZSTD_DICTIONARY = 2,
+  NONE = 3,
+}
+
 // Configeration for Glean Servers
 struct Config {
   1: DatabaseRetentionPolicy retention;
@@ -237,7 +257,8 @@ struct Config {
   // If db_rocksdb_cache_to_mem_ratio is set, the value is ignored
   15: i32 db_rocksdb_cache_mb = 8000;
 
-  // lookup cache size limit for each database in MB
+  // lookup cache size limit for each database in MB (see also
+  // db_lookup_cache_total_limit_mb)
   16: i32 db_lookup_cache_limit_mb = 1000;
 
   // What binary representation to use for newly created databases
@@ -338,6 +359,61 @@ struct Config {
   // Default storage backend for newly created databases. Can be overriden
   // by command-line options. See also db_create_version.
   41: optional string db_create_storage;
+
+  // Number of compiled Angle queries to keep, so that repeated queries
+  // skip parsing, typechecking and optimisation. 0 disables the cache.
+  // Read at server startup.
+  42: i32 query_plan_cache_size = 1000;
+
+  // Total size in bytes of the query results to keep for complete
+  // databases, which never change. Results are dropped when the DB is
+  // closed or deleted. 0 disables the cache. Read at server startup.
+  43: i64 query_result_cache_bytes = 0;
+
+  // Evict facts from the lookup cache of a database when they haven't been
+  // used for this many seconds, even if the cache isn't full. 0 means never.
+  // Each sweep walks the whole cache under its write lock, so this is off
+  // by default.
+  44: i32 db_lookup_cache_max_idle_s = 0;
+
+  // Total size of the lookup caches of all databases in MB. When set, the
+  // server periodically divides it between the caches according to how
+  // much they are used, giving none more than db_lookup_cache_limit_mb.
+  45: optional i32 db_lookup_cache_total_limit_mb;
+
+  // Maximum number of query streams (see UserQueryOptions.stream) that
+  // can be running at once. 0 disables streaming.
+  46: i32 query_stream_limit = 100;
+
+  // Stop a query stream whose next page hasn't been fetched for this
+  // many seconds.
+  47: i32 query_stream_idle_s = 60;
+
+  // Maximum number of threads for a query (see
+  // UserQueryOptions.parallelism). 1 runs every query on one thread.
+  48: i32 query_max_parallelism = 8;
+
+  // Recompress these column families of a RocksDB database, by name,
+  // when the database is compacted at the end of writing (see
+  // compact_on_completion). The rest keep LZ4. Finished databases are
+  // only read, so it pays to spend time making them smaller: for
+  // example, {"entities": ZSTD_DICTIONARY, "keys": ZSTD_DICTIONARY}.
+  // The sizes before and after are logged.
+  49: map<string, RocksDBCompression> db_rocksdb_finished_compression = {};
+
+  // Keep bloom filters for the predicate and first N bytes of the keys
+  // of facts in a RocksDB database, so that a search for a key prefix
+  // of at least N bytes (such as a name) that has no facts can skip
+  // most of the files. 0 keeps only whole-key filters. Applies to the
+  // files written after the DB is opened with the setting.
+  50: i32 db_rocksdb_key_prefix_bytes = 0;
+
+  // Back up RocksDB databases as sorted SST files for each column
+  // family, rather than as a RocksDB backup. Restoring such a backup
+  // moves the files into a new database as they are, without rewriting
+  // or compacting them, which is much faster for large databases.
+  // Restore accepts both formats whatever this is set to.
+  51: bool db_rocksdb_backup_sst_files = false;
 }
 
 // The following were automatically generated and may benefit from renaming.
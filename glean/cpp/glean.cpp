@@ -23,10 +23,7 @@ BatchBase::BatchBase(
     : inventory(inv),
       stats(std::make_shared<rts::LookupCache::Stats>()),
       cache(
-          rts::LookupCache::Options{
-              cache_capacity,
-              0 // disable deferred LRU list manipulation
-          },
+          rts::LookupCache::Options{cache_capacity},
           stats),
       anchor(&rts::EmptyLookup::instance(), &cache),
       buffer(Id::lowest()),
@@ -52,7 +52,9 @@ import Glean.Database.Backup.Backend as Backend
 import Glean.Database.Backup.Locator
 import qualified Glean.Database.Catalog as Catalog
 import Glean.Database.Catalog.Filter
+import Glean.Database.Close (closeDatabase)
 import Glean.Database.CompletePredicates
+import Glean.Database.Delete (asyncDeleteDatabase)
 import qualified Glean.Database.Logger as Logger
 import Glean.Database.Meta
 import Glean.Database.Repo
@@ -71,6 +73,7 @@ import Glean.Types as Thrift hiding (Exception)
 import Glean.Util.Some
 import Glean.Util.Observed as Observed
 import Glean.Util.Trace
+import qualified Glean.Util.Warden as Warden
 
 data Event
   = BackupStarted Repo
@@ -254,7 +257,7 @@ doBackup env@Env{..} repo prefix site =
     withStorageFor env repo meta $ \storage -> do
 
     Backend.Data{..} <- withScratchDirectory storage repo $ \scratch ->
-      Storage.backup odbHandle cfg scratch $ \path Data{dataSize} -> do
+      Storage.backup odbHandle cfg scratch $ \path Data{..} -> do
         say logInfo "uploading"
         let policy = ServerConfig.databaseBackupPolicy_repos config_backup
             ttl = case Map.lookup (repo_name repo) policy of
@@ -271,7 +274,8 @@ doBackup env@Env{..} repo prefix site =
                     ,..}
                 _ -> metaCompleteness meta
         }
-        Backend.backup site repo metaWithBytes ttl path
+        Backend.backup site repo (setBackupHead dataHead metaWithBytes) ttl
+          path
     let locator = toRepoLocator prefix site repo
     Logger.logDBStatistics
       env
@@ -358,22 +362,88 @@ doRestore env@Env{..} repo meta
               neededBytes freeBytes
       _ -> return ()
 
-    withScratchDirectory storage repo $ \scratch -> do
-    say logInfo "starting"
-    say logInfo "downloading"
-    let scratch_restore = scratch </> "restore"
-        scratch_file = scratch </> "file"
-    -- TODO: implement buffered downloads in Manifold client
-    void $ traceMsg envTracer GleanTraceSiteRestore $
-      Backend.restore site repo scratch_file
-    say logInfo "restoring"
-    createDirectoryIfMissing True scratch_restore
-    traceMsg envTracer GleanTraceStorageRestore $
-      Storage.restore storage cfg repo scratch_restore scratch_file
-    say logInfo "adding"
-    traceMsg envTracer GleanTraceFinishRestore $
-      Catalog.finishRestoring envCatalog repo
-    atomically $ notify envListener $ RestoreFinished repo
+    let lazy = ServerConfig.databaseRestorePolicy_lazy $
+          ServerConfig.config_restore cfg
+    case backupHead meta of
+      Just head_bytes | lazy -> restoreInParts site storage cfg head_bytes
+      _ -> withScratchDirectory storage repo $ \scratch -> do
+        say logInfo "starting"
+        say logInfo "downloading"
+        let scratch_restore = scratch </> "restore"
+            scratch_file = scratch </> "file"
+        -- TODO: implement buffered downloads in Manifold client
+        void $ traceMsg envTracer GleanTraceSiteRestore $
+          Backend.restore site repo scratch_file
+        say logInfo "restoring"
+        createDirectoryIfMissing True scratch_restore
+        traceMsg envTracer GleanTraceStorageRestore $
+          Storage.restore storage cfg repo scratch_restore scratch_file
+        say logInfo "adding"
+        traceMsg envTracer GleanTraceFinishRestore $
+          Catalog.finishRestoringWith envCatalog repo (setBackupHead Nothing)
+        atomically $ notify envListener $ RestoreFinished repo
+        say logInfo "finished"
+
+  -- Restore a backup that was made in two parts (see
+  -- 'Storage.restoreStaged'). The DB is added as soon as the first part
+  -- is restored, and the rest is fetched and restored in the
+  -- background, keeping the scratch directory until then. Meanwhile,
+  -- reads of its facts fail with Retry (see
+  -- 'Glean.Database.Open.checkRestored').
+  restoreInParts
+    :: (Storage st, Site s)
+    => s
+    -> st
+    -> ServerConfig.Config
+    -> Int
+    -> IO ()
+  restoreInParts site storage cfg head_bytes = do
+    added <- newEmptyTMVarIO
+    worker <- Warden.spawn envWarden $ do
+      r <- try $ withScratchDirectory storage repo $ \scratch -> do
+        say logInfo "starting"
+        say logInfo "downloading the first part"
+        let scratch_restore = scratch </> "restore"
+            scratch_file = scratch </> "file"
+        fetchRest <- traceMsg envTracer GleanTraceSiteRestore $
+          Backend.restoreStaged site repo head_bytes scratch_file
+        say logInfo "restoring the first part"
+        createDirectoryIfMissing True scratch_restore
+        restoreRest <- traceMsg envTracer GleanTraceStorageRestore $
+          Storage.restoreStaged storage cfg repo scratch_restore scratch_file
+            head_bytes
+        say logInfo "adding"
+        -- the mark is persisted with the DB's metadata, so that the DB
+        -- isn't taken for a complete one if the server restarts before
+        -- the rest is restored
+        traceMsg envTracer GleanTraceFinishRestore $
+          Catalog.finishRestoringWith envCatalog repo $
+            markPartiallyRestored . setBackupHead Nothing
+        atomically $ putTMVar added Nothing
+        restoreRemaining $ do
+          say logInfo "downloading the rest"
+          fetchRest
+          say logInfo "restoring the rest"
+          restoreRest
+      -- until the DB is added, a failure is the restore's to handle
+      atomically $ void $ tryPutTMVar added $
+        either Just (const Nothing) (r :: Either SomeException ())
+    failed <- atomically (readTMVar added) `onException` cancel worker
+    mapM_ throwIO failed
+
+  -- The DB is kept open while the rest is restored, and closed
+  -- afterwards so that it is reopened with everything in it.
+  restoreRemaining restoreRest = do
+    withOpenDatabase env repo (const restoreRest) `catch` \exc -> do
+      say logError $ "failed: " ++ show (exc :: SomeException)
+      atomically $ notify envListener $ RestoreFailed repo
+      swallow $ void $ asyncDeleteDatabase env repo
+      throwIO exc
+    closeDatabase env repo
+    atomically $ do
+      void $ Catalog.modifyMeta envCatalog repo $
+        return . unmarkPartiallyRestored
+      notify envListener $ RestoreFinished repo
     say logInfo "finished"
 
   handler :: Storage s => s -> SomeException -> IO ()
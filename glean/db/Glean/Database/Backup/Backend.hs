@@ -20,7 +20,12 @@ import Glean.Database.Meta
 import Glean.Types (Repo)
 import Glean.Util.Some
 
-newtype Data = Data { dataSize :: Int }
+data Data = Data
+  { dataSize :: Int
+  , dataHead :: Maybe Int
+    -- ^ for a serialized DB that is made of two parts, the size of the
+    -- first one (see 'Glean.Database.Storage.restoreStaged')
+  }
 
 -- | A backup backend
 class Backend a where
@@ -41,6 +46,16 @@ class Site a where
     -> IO Data
   inspect :: a -> Repo -> IO Meta
   restore :: a -> Repo -> FilePath -> IO Meta
+
+  -- | Fetch a backup in two steps: fetch at least its first bytes, as
+  -- many as given, into a file, and return an action that fetches the
+  -- rest into the same file. The default fetches the whole backup in
+  -- the first step.
+  restoreStaged :: a -> Repo -> Int -> FilePath -> IO (IO ())
+  restoreStaged site repo _ file = do
+    _ <- restore site repo file
+    return (return ())
+
   delete :: a -> Repo -> IO ()
   enumerate :: a -> IO [(Repo, Meta)]
   toPath :: a -> Text
@@ -49,6 +64,7 @@ instance Site (Some Site) where
   backup (Some site) = backup site
   inspect (Some site) = inspect site
   restore (Some site) = restore site
+  restoreStaged (Some site) = restoreStaged site
   delete (Some site) = delete site
   enumerate (Some site) = enumerate site
   toPath (Some site) = toPath site
@@ -0,0 +1,245 @@
+{-
+  Copyright (c) Meta Platforms, Inc. and affiliates.
+  All rights reserved.
+
+  This source code is licensed under the BSD-style license found in the
+  LICENSE file in the root directory of this source tree.
+-}
+
+--
+-- | Transferring a backup as a sequence of chunks, for sites that can
+-- store more than one object per backup.
+--
+-- Chunks are moved on several streams at once, and each chunk is
+-- retried on its own, so a failure restarts one chunk rather than the
+-- whole transfer. A chunk is stored under a name made of its position
+-- and the checksum of its contents, which lets an upload skip the
+-- chunks that an earlier, interrupted upload of the same data already
+-- stored, and lets a download verify each chunk it receives against
+-- the manifest. A download records the chunks it has written next to
+-- the file, so a download that was interrupted can be resumed by
+-- downloading into the same file again.
+--
+module Glean.Database.Backup.Chunked
+  ( Options(..)
+  , defaultOptions
+  , Chunks(..)
+  , directory
+  , Chunk(..)
+  , upload
+  , download
+  , downloadPrefix
+  , serializeManifest
+  , deserializeManifest
+  ) where
+
+import Control.Concurrent
+import Control.Concurrent.Async (forConcurrently_)
+import Control.Exception
+import Control.Monad
+import Data.ByteString (ByteString)
+import qualified Data.ByteString as BS
+import qualified Data.ByteString.Char8 as BC
+import Data.IORef
+import Data.List (sortOn)
+import qualified Data.Set as Set
+import qualified Data.Vector as Vector
+import System.Directory
+import System.FilePath
+import System.IO
+import Text.Printf
+import Text.Read (readMaybe)
+
+import Util.Control.Exception (tryAll)
+
+import Glean.Angle.Hash (hashByteString)
+
+data Options = Options
+  { optionsChunkBytes :: Int
+    -- ^ size of each chunk, except the last one
+  , optionsStreams :: Int
+    -- ^ number of chunks transferred at the same time
+  , optionsAttempts :: Int
+    -- ^ number of times a chunk is tried before the transfer fails
+  }
+
+defaultOptions :: Options
+defaultOptions = Options
+  { optionsChunkBytes = 64 * 1024 * 1024
+  , optionsStreams = 4
+  , optionsAttempts = 5
+  }
+
+-- | Where the chunks of one backup are stored
+data Chunks = Chunks
+  { chunksList :: IO [FilePath]
+    -- ^ names of the chunks that are stored
+  , chunksPut :: FilePath -> ByteString -> IO ()
+  , chunksGet :: FilePath -> IO ByteString
+  }
+
+-- | Chunks stored as files in a directory. A chunk is written next to
+-- its final name and renamed into it, so a chunk that is listed is
+-- complete.
+directory :: FilePath -> Chunks
+directory dir = Chunks
+  { chunksList = do
+      exists <- doesDirectoryExist dir
+      fs <- if exists then listDirectory dir else return []
+      return [ f | f <- fs, takeExtension f /= tmpExtension ]
+  , chunksPut = \name bytes -> do
+      createDirectoryIfMissing True dir
+      let tmp = dir </> name <.> tmpExtension
+      BS.writeFile tmp bytes
+      renameFile tmp (dir </> name)
+  , chunksGet = \name -> BS.readFile (dir </> name)
+  }
+  where
+  tmpExtension = ".tmp"
+
+data Chunk = Chunk
+  { chunkName :: FilePath
+  , chunkBytes :: Int
+  , chunkChecksum :: String
+  }
+  deriving (Eq, Show)
+
+-- | Store a file as chunks, skipping those that are already stored.
+-- Returns the manifest of the file, in order.
+upload :: Options -> Chunks -> FilePath -> IO [Chunk]
+upload opts@Options{..} Chunks{..} file = do
+  size <- withBinaryFile file ReadMode hFileSize
+  stored <- Set.fromList <$> chunksList
+  done <- newIORef []
+  let count = fromIntegral
+        ((size + fromIntegral chunkSize - 1) `div` fromIntegral chunkSize)
+  inParallel opts count $ \i -> do
+    bytes <- withBinaryFile file ReadMode $ \h -> do
+      hSeek h AbsoluteSeek (fromIntegral i * fromIntegral chunkSize)
+      BS.hGet h chunkSize
+    let chunk = describe i bytes
+    unless (Set.member (chunkName chunk) stored) $
+      retrying opts (chunkName chunk) $ chunksPut (chunkName chunk) bytes
+    atomicModifyIORef' done $ \cs -> ((i, chunk) : cs, ())
+  map snd . sortOn fst <$> readIORef done
+  where
+  chunkSize = max 1 optionsChunkBytes
+
+-- | Fetch the chunks of a manifest into a file, checking each one
+-- against its size and checksum. The chunks that are written are
+-- listed in a file next to it, which is removed when the download is
+-- complete. If the download fails, downloading the same manifest into
+-- the same file again fetches only the chunks that are missing.
+download :: Options -> Chunks -> [Chunk] -> FilePath -> IO ()
+download opts chunks manifest file = do
+  fetch opts chunks manifest Nothing file
+  removeFile (progressFile file)
+
+-- | Fetch the chunks of a manifest that hold its first bytes, as many
+-- as given, into a file. The file is left as an interrupted 'download',
+-- so downloading the same manifest into it afterwards fetches only the
+-- rest of the chunks.
+downloadPrefix :: Options -> Chunks -> [Chunk] -> Int -> FilePath -> IO ()
+downloadPrefix opts chunks manifest bytes =
+  fetch opts chunks manifest (Just bytes)
+
+-- | Fetch the chunks of a manifest that start before the limit, if any,
+-- into a file
+fetch :: Options -> Chunks -> [Chunk] -> Maybe Int -> FilePath -> IO ()
+fetch opts Chunks{..} chunks limit file = do
+  resuming <- (&&) <$> doesFileExist file <*> doesFileExist progress
+  written <- if resuming
+    then Set.fromList . BC.lines <$> BS.readFile progress
+    else return Set.empty
+  let (fileMode, progressMode)
+        | resuming = (ReadWriteMode, AppendMode)
+        | otherwise = (WriteMode, WriteMode)
+  withBinaryFile file fileMode $ \h ->
+    withBinaryFile progress progressMode $ \p -> do
+      lock <- newMVar (h, p)
+      let
+        offsets = scanl (+) 0 (map chunkBytes chunks)
+        todo = Vector.fromList
+          [ (offset, chunk)
+          | (offset, chunk) <- zip offsets chunks
+          , maybe True (offset <) limit
+          , not $ Set.member (progressLine offset chunk) written ]
+      inParallel opts (Vector.length todo) $ \i -> do
+        let (offset, chunk) = todo Vector.! i
+        bytes <- retrying opts (chunkName chunk) $ do
+          bytes <- chunksGet (chunkName chunk)
+          let got = describe 0 bytes
+          when (chunkBytes got /= chunkBytes chunk
+              || chunkChecksum got /= chunkChecksum chunk) $
+            throwIO $ ErrorCall $ "corrupt chunk " <> chunkName chunk
+          return bytes
+        withMVar lock $ \(out, done) -> do
+          hSeek out AbsoluteSeek (fromIntegral offset)
+          BS.hPut out bytes
+          -- the chunk is listed only once its bytes are in the file
+          hFlush out
+          BC.hPutStrLn done (progressLine offset chunk)
+          hFlush done
+      -- a file left by a different download may be longer
+      hSetFileSize h (fromIntegral (last offsets))
+  where
+  progress = progressFile file
+
+  -- a chunk is identified by its position in the file as well as its
+  -- name, in case the file was left by the download of a different
+  -- manifest
+  progressLine offset chunk = BC.pack (show offset <> " " <> chunkName chunk)
+
+-- | The file listing the chunks that a download has written
+progressFile :: FilePath -> FilePath
+progressFile file = file <.> "chunks"
+
+describe :: Int -> ByteString -> Chunk
+describe i bytes = Chunk
+  { chunkName = printf "%08d-%s" i checksum
+  , chunkBytes = BS.length bytes
+  , chunkChecksum = checksum
+  }
+  where
+  checksum = show (hashByteString bytes)
+
+-- | Run an action for the numbers from 0 to n-1 on the configured
+-- number of threads.
+inParallel :: Options -> Int -> (Int -> IO ()) -> IO ()
+inParallel Options{..} n act = do
+  next <- newIORef 0
+  let worker = do
+        i <- atomicModifyIORef' next $ \i -> (i + 1, i)
+        when (i < n) $ act i >> worker
+  forConcurrently_ [1 .. max 1 (min n optionsStreams)] $ const worker
+
+-- | Try a transfer up to the configured number of times, waiting a
+-- little longer after each failure.
+retrying :: Options -> FilePath -> IO a -> IO a
+retrying Options{..} name act = go 1
+  where
+  go attempt = do
+    r <- tryAll act
+    case r of
+      Right a -> return a
+      Left e
+        | attempt >= optionsAttempts -> throwIO $ ErrorCall $
+            printf "chunk %s failed after %d attempts: %s"
+              name attempt (show e)
+        | otherwise -> do
+            threadDelay (100000 * 2 ^ min 6 attempt)
+            go (attempt + 1)
+
+-- | A manifest is stored as one line per chunk, in order.
+serializeManifest :: [Chunk] -> ByteString
+serializeManifest chunks = BC.unlines
+  [ BC.pack $ unwords [chunkName, show chunkBytes, chunkChecksum]
+  | Chunk{..} <- chunks ]
+
+deserializeManifest :: ByteString -> Either String [Chunk]
+deserializeManifest = mapM parse . BC.lines
+  where
+  parse line = case words (BC.unpack line) of
+    [name, bytes, checksum] | Just n <- readMaybe bytes ->
+      Right (Chunk name n checksum)
+    _ -> Left $ "can't parse manifest line: " <> BC.unpack line
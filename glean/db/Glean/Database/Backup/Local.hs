@@ -0,0 +1,180 @@
+{-
+  Copyright (c) Meta Platforms, Inc. and affiliates.
+  All rights reserved.
+
+  This source code is licensed under the BSD-style license found in the
+  LICENSE file in the root directory of this source tree.
+-}
+
+--
+-- | A Glean Backup provider that keeps backups in a directory, which
+-- may be on a shared filesystem. Locators look like @local:/some/dir@.
+--
+-- Each backup is a directory @<dir>/<name>.<hash>@ holding the
+-- serialized DB as chunks (see "Glean.Database.Backup.Chunked") in
+-- @chunks@, the list of chunks in @manifest@ and the DB's properties
+-- in @meta.json@. A backup is written next to its final place and
+-- renamed into it, so a site never has a partial backup. The chunks of
+-- a backup that was interrupted are kept, and the next attempt uploads
+-- only the chunks that are missing.
+--
+-- A backup is written in @<dir>/.tmp.<name>.<hash>@, whichever server
+-- writes it, so a backup holds an exclusive lock on
+-- @<dir>/.tmp.<name>.<hash>.lock@ while it runs and fails if another
+-- backup of the same DB holds it. The lock is an OS file lock, which
+-- some shared filesystems don't honour between machines; on those,
+-- only one server should back up a given DB at a time.
+--
+module Glean.Database.Backup.Local
+  ( local
+  , localSite
+  , localSiteWith
+  ) where
+
+import Control.Exception
+import Control.Monad
+import qualified Data.ByteString as BS
+import Data.List (isPrefixOf)
+import Data.Maybe
+import qualified Data.Text as Text
+import GHC.IO.Handle.Lock
+import System.Directory
+import System.FilePath
+import System.IO
+
+import Util.IO (safeRemovePathForcibly)
+
+import Glean.Database.Backup.Backend
+import Glean.Database.Backup.Chunked (Chunk(..), Chunks)
+import qualified Glean.Database.Backup.Chunked as Chunked
+import Glean.Repo.Text
+import Glean.Types
+import Glean.Util.Some
+import Thrift.Protocol.JSON
+
+
+data LocalBackend = LocalBackend
+
+data LocalSite = LocalSite
+  { localOptions :: Chunked.Options
+  , localChunks :: FilePath -> Chunks
+    -- ^ how the chunks in a directory are stored
+  , localPath :: FilePath
+  }
+
+local :: Some Backend
+local = Some LocalBackend
+
+localSite :: FilePath -> Some Site
+localSite = localSiteWith Chunked.defaultOptions Chunked.directory
+
+-- | A local site with the given transfer options, which stores its
+-- chunks with the given function
+localSiteWith
+  :: Chunked.Options
+  -> (FilePath -> Chunks)
+  -> FilePath
+  -> Some Site
+localSiteWith opts chunks = Some . LocalSite opts chunks
+
+instance Backend LocalBackend where
+  fromPath _ path
+    | Text.null path = Nothing
+    | otherwise = Just $ localSite $ Text.unpack path
+
+instance Site LocalSite where
+  backup LocalSite{..} repo props _ttl file = do
+    createDirectoryIfMissing True localPath
+    let target = repoDir localPath repo
+        tmp = localPath </> tmpPrefix <> takeFileName target
+    withStagingLock tmp $ do
+      createDirectoryIfMissing True (tmp </> chunksDir)
+      chunks <- Chunked.upload localOptions (localChunks (tmp </> chunksDir))
+        file
+      -- drop the chunks of an earlier attempt that aren't in this backup
+      stored <- listDirectory (tmp </> chunksDir)
+      forM_ stored $ \f ->
+        when (f `notElem` map chunkName chunks) $
+          safeRemovePathForcibly (tmp </> chunksDir </> f)
+      BS.writeFile (tmp </> manifestFile) (Chunked.serializeManifest chunks)
+      BS.writeFile (tmp </> metaFile) (serializeJSON props)
+      safeRemovePathForcibly target
+      renameDirectory tmp target
+      return Data
+        { dataSize = sum (map chunkBytes chunks)
+        , dataHead = Nothing
+        }
+
+  inspect site repo = do
+    s <- BS.readFile (repoDir (localPath site) repo </> metaFile)
+    case deserializeJSON s of
+      Left err -> throwIO $ ErrorCall $ "can't parse props: " <> err
+      Right r -> return r
+
+  restore site@LocalSite{..} repo file = do
+    props <- inspect site repo
+    chunks <- readManifest site repo
+    Chunked.download localOptions (chunksOf site repo) chunks file
+    return props
+
+  -- the chunks holding the first bytes are fetched first, and the rest
+  -- of the download resumes from them
+  restoreStaged site@LocalSite{..} repo bytes file = do
+    chunks <- readManifest site repo
+    Chunked.downloadPrefix localOptions (chunksOf site repo) chunks bytes file
+    return $ Chunked.download localOptions (chunksOf site repo) chunks file
+
+  delete site repo =
+    safeRemovePathForcibly $ repoDir (localPath site) repo
+
+  enumerate site@LocalSite{ localPath = path } = do
+    exists <- doesDirectoryExist path
+    fs <- if exists then listDirectory path else return []
+    fmap catMaybes $ forM fs $ \f ->
+      case splitExtension f of
+        (name, '.':hash)
+          | not (tmpPrefix `isPrefixOf` f) -> do
+            let repo = Repo (Text.pack name) (Text.pack hash)
+            complete <- doesFileExist (repoDir path repo </> metaFile)
+            if complete
+              then Just . (repo,) <$> inspect site repo
+              else return Nothing
+        _other -> return Nothing
+
+  toPath = Text.pack . localPath
+
+-- | Hold the lock of a backup's staging directory, failing if another
+-- backup holds it. The lock file is left behind, because removing it
+-- could let a waiting backup lock a file that is no longer there.
+withStagingLock :: FilePath -> IO a -> IO a
+withStagingLock tmp act =
+  withBinaryFile (tmp <.> "lock") ReadWriteMode $ \h -> do
+    locked <- hTryLock h ExclusiveLock
+    unless locked $ throwIO $ ErrorCall $
+      "a backup is already being written in " <> tmp
+    act
+
+readManifest :: LocalSite -> Repo -> IO [Chunk]
+readManifest LocalSite{..} repo = do
+  s <- BS.readFile (repoDir localPath repo </> manifestFile)
+  either (throwIO . ErrorCall) return (Chunked.deserializeManifest s)
+
+chunksOf :: LocalSite -> Repo -> Chunks
+chunksOf LocalSite{..} repo = localChunks (repoDir localPath repo </> chunksDir)
+
+repoDir :: FilePath -> Repo -> FilePath
+repoDir path repo = path </> showRepoSep "." repo
+
+chunksDir :: FilePath
+chunksDir = "chunks"
+
+manifestFile :: FilePath
+manifestFile = "manifest"
+
+metaFile :: FilePath
+metaFile = "meta.json"
+
+-- | Prefix of the directories of backups that are being written, or
+-- whose upload was interrupted
+tmpPrefix :: String
+tmpPrefix = ".tmp."
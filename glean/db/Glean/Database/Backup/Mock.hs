@@ -8,13 +8,20 @@
 
 --
 -- | A Glean Backup provider that just copies files to somewhere in
--- the filesystem, for testing purposes.
+-- the filesystem, for testing purposes. Also a throttled site, which
+-- transfers backups in chunks at a limited rate and can be made to
+-- drop transfers, for testing chunked transfers.
 --
 module Glean.Database.Backup.Mock
   ( mock
   , mockSite
+  , Throttle(..)
+  , throttled
+  , throttledSite
+  , throttledBackend
   ) where
 
+import Control.Concurrent (threadDelay)
 import Control.Exception
 import Control.Monad
 import qualified Data.ByteString as BS
@@ -25,6 +32,9 @@ import System.FilePath
 import qualified System.Posix.Files as Posix
 
 import Glean.Database.Backup.Backend
+import Glean.Database.Backup.Chunked (Chunks(..))
+import qualified Glean.Database.Backup.Chunked as Chunked
+import Glean.Database.Backup.Local (localSiteWith)
 import Glean.Repo.Text
 import Glean.Types
 import Glean.Util.Some
@@ -51,7 +61,7 @@ instance Site MockSite where
     copyFile file repo_path
     size <- Posix.fileSize <$> Posix.getFileStatus repo_path
     BS.writeFile (repo_path <.> "props") (serializeJSON props)
-    return Data { dataSize = fromIntegral size }
+    return Data { dataSize = fromIntegral size, dataHead = Nothing }
 
   inspect (MockSite path) repo = do
     s <- BS.readFile (repoPath path repo <.> "props")
@@ -82,3 +92,46 @@ instance Site MockSite where
 
 repoPath :: FilePath -> Repo -> FilePath
 repoPath path repo = path </> showRepoSep "." repo
+
+data Throttle = Throttle
+  { throttleBytesPerSecond :: Int
+    -- ^ transfer rate of each chunk, or 0 for no limit
+  , throttleBefore :: FilePath -> IO ()
+    -- ^ runs before each transfer of the named chunk, and can throw to
+    -- make the transfer fail
+  }
+
+-- | Chunks that are transferred at a limited rate
+throttled :: Throttle -> Chunks -> Chunks
+throttled Throttle{..} Chunks{..} = Chunks
+  { chunksList = chunksList
+  , chunksPut = \name bytes -> do
+      transfer name (BS.length bytes)
+      chunksPut name bytes
+  , chunksGet = \name -> do
+      bytes <- chunksGet name
+      transfer name (BS.length bytes)
+      return bytes
+  }
+  where
+  transfer name n = do
+    throttleBefore name
+    when (throttleBytesPerSecond > 0) $
+      threadDelay (n * 1000000 `div` throttleBytesPerSecond)
+
+-- | A local site (see "Glean.Database.Backup.Local") whose chunks are
+-- throttled
+throttledSite :: Throttle -> Chunked.Options -> FilePath -> Some Site
+throttledSite throttle opts =
+  localSiteWith opts (throttled throttle . Chunked.directory)
+
+data ThrottledBackend = ThrottledBackend Throttle Chunked.Options
+
+-- | A backend whose sites are throttled sites, all with the same
+-- throttle
+throttledBackend :: Throttle -> Chunked.Options -> Some Backend
+throttledBackend throttle = Some . ThrottledBackend throttle
+
+instance Backend ThrottledBackend where
+  fromPath (ThrottledBackend throttle opts) =
+    Just . throttledSite throttle opts . Text.unpack
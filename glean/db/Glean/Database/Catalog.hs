@@ -32,6 +32,7 @@ module Glean.Database.Catalog
   , unsetExpiring
   , startRestoring
   , finishRestoring
+  , finishRestoringWith
   , abortRestoring
   , resetElsewhere
   , getLocalDatabases
@@ -515,7 +516,12 @@ startRestoring cat repo meta = do
 -- | Notify the catalog that the database has been restored and is available
 -- locally
 finishRestoring :: Catalog -> Repo -> IO ()
-finishRestoring cat@Catalog{..} repo = tryBracket
+finishRestoring cat repo = finishRestoringWith cat repo id
+
+-- | Like 'finishRestoring', but update the metadata of the database as
+-- it is added
+finishRestoringWith :: Catalog -> Repo -> (Meta -> Meta) -> IO ()
+finishRestoringWith cat@Catalog{..} repo f = tryBracket
   (atomically $ do
     Entries{..} <- getEntries cat
     case HashMap.lookup repo entriesRestoring of
@@ -525,7 +531,7 @@ finishRestoring cat@Catalog{..} repo = tryBracket
           , entriesEphemeral = HashSet.insert repo entriesEphemeral
           , ..
           }
-        return meta
+        return (f meta)
       Nothing -> dbError repo "finishRestoring: unknown database")
   (\meta r -> atomically $ do
     entry <- mkEntry repo meta
@@ -27,6 +27,8 @@ import Glean.Database.Open
 import qualified Glean.Database.Storage as Storage
 import Glean.Database.Types
 import Glean.Database.Writes
+import qualified Glean.Query.PlanCache as PlanCache
+import qualified Glean.Query.ResultCache as ResultCache
 import qualified Glean.RTS.Foreign.LookupCache as LookupCache
 import Glean.Types hiding (Database)
 import qualified Glean.Types as Thrift
@@ -69,7 +71,11 @@ closeIf should_close env repo = usingActiveDatabase env repo $ \r ->
           return $ Just (db,odb)
         Nothing -> return Nothing
 
-    forM_ r $ \(db, odb) ->
+    forM_ r $ \(db, odb) -> do
+      -- compiled queries depend on the DB's schema, which may be
+      -- different when the DB is next opened
+      PlanCache.invalidateRepo (envPlanCache env) (dbRepo db)
+      ResultCache.invalidateRepo (envResultCache env) (dbRepo db)
       -- the actual closing of the DB must be uninterruptible
       uninterruptibleMask_ (closeOpenDB env odb)
         `finally` atomically (writeTVar (dbState db) Closed)
@@ -75,6 +75,7 @@ import Util.Log (logInfo)
 
 import Glean.Angle.Types
 import qualified Glean.Database.Backup.Backend as Backup -- from glean/util
+import qualified Glean.Database.Backup.Local as Backup.Local
 import qualified Glean.Database.Backup.Mock as Backup.Mock
 import qualified Glean.Database.BatchLocation as BatchLocation
 import Glean.Database.Catalog (Catalog)
@@ -237,7 +238,10 @@ instance Default Config where
     , cfgShardManager = \_ _ k -> k $ SomeShardManager noSharding
     , cfgServerLogger = Some NullGleanServerLogger
     , cfgDatabaseLogger = Some NullGleanDatabaseLogger
-    , cfgBackupBackends = HashMap.fromList [("mock", Backup.Mock.mock)]
+    , cfgBackupBackends = HashMap.fromList
+        [ ("mock", Backup.Mock.mock)
+        , ("local", Backup.Local.local)
+        ]
     , cfgBatchLocationParser = Some BatchLocation.DefaultParser
     , cfgEnableRecursion = False
     , cfgFilterAvailableDBs = const $ return []
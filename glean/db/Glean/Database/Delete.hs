@@ -36,6 +36,8 @@ import Glean.Database.Meta
 import Glean.Database.Repo
 import qualified Glean.Database.Storage as Storage
 import Glean.Database.Types
+import qualified Glean.Query.PlanCache as PlanCache
+import qualified Glean.Query.ResultCache as ResultCache
 import Glean.Types hiding (Database)
 import qualified Glean.Util.Warden as Warden
 
@@ -88,6 +90,10 @@ removeDatabase env@Env{..} repo todo = uninterruptibleMask_ $
         users <- readTVar dbUsers
         when (users /= 0) retry
       logExceptions (\s -> inRepo repo $ "while deleting: " ++s) $ do
+        -- a DB created later under the same repo may have a
+        -- different schema, so its queries must be compiled again
+        PlanCache.invalidateRepo envPlanCache repo
+        ResultCache.invalidateRepo envResultCache repo
         state <- readTVarIO dbState
         case state of
           Open odb -> closeOpenDB env odb
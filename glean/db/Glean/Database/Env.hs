@@ -19,6 +19,7 @@ import Control.Monad.Extra
 import Data.Default
 import Data.HashMap.Strict (HashMap)
 import qualified Data.HashMap.Strict as HashMap
+import Data.IORef
 import Data.List.Split
 import Data.Time
 import System.Clock (TimeSpec(..))
@@ -34,13 +35,21 @@ import Util.STM
 import qualified Glean.RTS.Foreign.LookupCache as LookupCache
 import Glean.Database.Backup (backuper)
 import qualified Glean.Database.Catalog as Catalog
+import Glean.Database.Catalog.Filter (Item(..), everythingF)
 import Glean.Database.Config
+import Glean.Database.Delete (asyncDeleteDatabase)
+import qualified Glean.Database.LookupCacheBudget as LookupCacheBudget
 import Glean.Database.Close
 import Glean.Database.Janitor
+import Glean.Database.Meta (isPartiallyRestored)
 import Glean.Database.Open
+import Glean.Database.Repo (inRepo)
 import qualified Glean.Database.Storage as Storage
 import Glean.Database.Types
 import Glean.Database.Writes
+import qualified Glean.Query.PlanCache as PlanCache
+import qualified Glean.Query.ResultCache as ResultCache
+import qualified Glean.Query.Stream as QueryStream
 import qualified Glean.ServerConfig.Types as ServerConfig
 import Glean.Util.ConfigProvider
 import Glean.Util.Observed as Observed
@@ -128,6 +137,13 @@ initEnv evb envStorage envDefaultStorage envCatalog shardManager cfg
 
     envDbSchemaCache <- newMVar HashMap.empty
 
+    envPlanCache <- PlanCache.new (fromIntegral config_query_plan_cache_size)
+
+    envResultCache <-
+      ResultCache.new (fromIntegral config_query_result_cache_bytes)
+
+    envQueryStreams <- QueryStream.new envServerConfig envWarden
+
     debug <- getDebugEnv
 
     return Env
@@ -207,6 +223,15 @@ spawnThreads env@Env{..} = do
     Nothing ->
       recordJanitorResult JanitorDisabled
 
+  -- DBs whose facts were still being restored when the server stopped
+  -- are deleted, so that they are restored again
+  partial <- atomically $
+    Catalog.list envCatalog [Local] everythingF
+  forM_ partial $ \Item{..} ->
+    when (isPartiallyRestored itemMeta) $ do
+      logWarning $ inRepo itemRepo "deleting partially restored DB"
+      void $ asyncDeleteDatabase env itemRepo
+
   Warden.spawn_ envWarden $ backuper env
 
   replicateM_ (fromIntegral config_db_writer_threads)
@@ -220,6 +245,11 @@ spawnThreads env@Env{..} = do
     doOnUpdate envSchemaSource $
       atomically $ void $ tryPutTMVar envSchemaUpdateSignal ()
 
+  -- Divide the lookup cache budget between the writable DBs
+  weights <- newIORef mempty
+  Warden.spawn_ envWarden $ doPeriodically (seconds 10) $
+    writeIORef weights =<< LookupCacheBudget.rebalance env =<< readIORef weights
+
   -- Disk usage counters
   Warden.spawn_ envWarden $ doPeriodically (seconds 600) $
     withDefaultStorage env $ \_ storage -> do
@@ -0,0 +1,210 @@
+{-
+  Copyright (c) Meta Platforms, Inc. and affiliates.
+  All rights reserved.
+
+  This source code is licensed under the BSD-style license found in the
+  LICENSE file in the root directory of this source tree.
+-}
+
+-- | Divide one memory budget (server config
+-- @db_lookup_cache_total_limit_mb@) between the lookup caches of the
+-- writable databases, instead of giving every database a fixed
+-- @db_lookup_cache_limit_mb@.
+--
+-- Every few seconds 'rebalance' reads how much each cache was used
+-- since the last time and gives the caches new capacities with
+-- 'allocate': caches of DBs that are being written to get most of the
+-- budget, idle caches shrink to a small floor.
+module Glean.Database.LookupCacheBudget
+  ( Demand(..)
+  , allocate
+  , Weights
+  , rebalance
+  , initialCapacity
+  ) where
+
+import Control.Monad
+import Data.HashMap.Strict (HashMap)
+import qualified Data.HashMap.Strict as HashMap
+import qualified Data.IntMap.Strict as IntMap
+import Data.List (partition)
+import Data.Maybe
+import qualified Data.Text.Encoding as Text
+import Data.Word
+
+import ServiceData.GlobalStats
+import Util.STM
+
+import Glean.Database.Types
+import Glean.RTS.Foreign.LookupCache (LookupCache)
+import qualified Glean.RTS.Foreign.LookupCache as LookupCache
+import qualified Glean.ServerConfig.Types as ServerConfig
+import qualified Glean.Types as Thrift
+import qualified Glean.Util.Observed as Observed
+
+-- | What a cache wants from the budget
+data Demand = Demand
+  { demandWeight :: !Double
+    -- ^ how much the cache has been used recently
+  , demandBytes :: !Word64
+    -- ^ size of the cached facts
+  , demandCapacity :: !Word64
+    -- ^ current capacity
+  }
+
+-- | Divide a budget between caches, giving none more than the maximum.
+--
+-- Every cache gets a floor of a quarter of an equal share, so an idle
+-- cache keeps its hottest facts and can warm up again. The rest of the
+-- budget goes to the caches in proportion to their weights. A cache
+-- that isn't close to full gets at most twice what it holds, because it
+-- wouldn't use more; what it doesn't take goes to the others.
+allocate :: Word64 -> Word64 -> [(k, Demand)] -> [(k, Word64)]
+allocate _ _ [] = []
+allocate budget maxEach demands =
+  [ (k, base + extra) | ((k, _), extra) <- zip demands extras ]
+  where
+  n = fromIntegral (length demands)
+  base = min maxEach (budget `div` (4 * n))
+  extras = fill
+    (fromIntegral (budget - n * base))
+    [ (max 0 demandWeight, limit d - base) | (_, d@Demand{..}) <- demands ]
+
+  limit Demand{..}
+    | demandBytes * 10 >= demandCapacity * 8 = maxEach
+    | otherwise = min maxEach (max base (2 * demandBytes))
+
+-- | Share out an amount in proportion to the weights, giving none more
+-- than its room. When the amount is more than the weighted entries have
+-- room for, the rest is shared equally by the others.
+fill :: Double -> [(Double, Word64)] -> [Word64]
+fill amount wanted = go amount (zip [0 :: Int ..] wanted) IntMap.empty
+  where
+  go left open done
+    | null open || left <= 0 = result done
+    | null full = result $ IntMap.union done $ IntMap.fromList
+        [ (i, floor (share w)) | (i, (w, _)) <- open ]
+    | otherwise = go
+        (left - sum [ fromIntegral room | (_, (_, room)) <- full ])
+        rest
+        (IntMap.union done $ IntMap.fromList
+          [ (i, room) | (i, (_, room)) <- full ])
+    where
+    total = sum [ w | (_, (w, _)) <- open ]
+    share w
+      | total > 0 = left * w / total
+      | otherwise = left / fromIntegral (length open)
+    (full, rest) = partition (\(_, (w, room)) -> share w >= fromIntegral room)
+      open
+
+  result done =
+    [ IntMap.findWithDefault 0 i done | i <- [0 .. length wanted - 1] ]
+
+-- | Smoothed weights of the caches, carried from one 'rebalance' to the
+-- next
+type Weights = HashMap Thrift.Repo Double
+
+-- | Give the lookup caches of the writable DBs new capacities according
+-- to their recent use, and export the allocation as counters
+--
+-- > glean.db.<repo>.lookup_cache.capacity_bytes
+-- > glean.db.<repo>.lookup_cache.used_bytes
+-- > glean.db.lookup_cache.budget_bytes
+--
+-- Without a budget, the caches get the per-DB limit.
+rebalance :: Env -> Weights -> IO Weights
+rebalance env@Env{..} weights = do
+  scfg <- Observed.get envServerConfig
+  let maxEach = perDbLimit scfg
+  caches <- writableCaches env
+  usages <- forM caches $ \(repo, cache) ->
+    (repo, cache,) <$> LookupCache.readUsage cache
+  case budgetBytes scfg of
+    Nothing -> do
+      -- the budget was removed: restore the fixed limit once
+      unless (HashMap.null weights) $
+        forM_ caches $ \(_, cache) -> LookupCache.setCapacity cache maxEach
+      return mempty
+    Just budget -> do
+      let
+        -- misses count a little, so a cache that is warming up
+        -- still gets room to grow
+        weight repo usage = smoothing * recent + (1 - smoothing) * previous
+          where
+          hits = fromIntegral (LookupCache.usageHits usage)
+          misses = fromIntegral (LookupCache.usageMisses usage)
+          recent = hits + 0.1 * (hits + misses)
+          previous = HashMap.lookupDefault 0 repo weights
+
+        demands =
+          [ ((repo, cache, usage), Demand
+              { demandWeight = weight repo usage
+              , demandBytes = LookupCache.usageBytes usage
+              , demandCapacity = LookupCache.usageCapacity usage
+              })
+          | (repo, cache, usage) <- usages
+          ]
+
+        allocation = allocate budget maxEach demands
+
+      forM_ allocation $ \((_, cache, usage), capacity) ->
+        when (capacity /= LookupCache.usageCapacity usage) $
+          LookupCache.setCapacity cache capacity
+
+      let
+        byName f = HashMap.fromListWith (+)
+          [ (Thrift.repo_name repo, f usage capacity)
+          | ((repo, _, usage), capacity) <- allocation
+          ]
+        gone = HashMap.fromList
+          [ (Thrift.repo_name repo, 0) | repo <- HashMap.keys weights ]
+        export suffix counts =
+          forM_ (HashMap.toList (HashMap.union counts gone)) $
+            \(name, value) -> setCounter
+              ("glean.db." <> Text.encodeUtf8 name <> ".lookup_cache."
+                <> suffix)
+              (fromIntegral value)
+      export "capacity_bytes" $ byName $ \_ capacity -> capacity
+      export "used_bytes" $ byName $ \usage _ -> LookupCache.usageBytes usage
+      setCounter "glean.db.lookup_cache.budget_bytes" (fromIntegral budget)
+
+      return $ HashMap.fromList
+        [ (repo, demandWeight demand)
+        | ((repo, _, _), demand) <- demands
+        ]
+  where
+  -- weight of the last interval in the smoothed weight
+  smoothing = 0.5
+
+-- | The capacity of the cache of a DB that is being opened for writing:
+-- the per-DB limit or, with a budget, an equal share of it. The next
+-- 'rebalance' adjusts it.
+initialCapacity :: Env -> IO Word64
+initialCapacity env@Env{..} = do
+  scfg <- Observed.get envServerConfig
+  case budgetBytes scfg of
+    Nothing -> return (perDbLimit scfg)
+    Just budget -> do
+      caches <- writableCaches env
+      return $
+        min (perDbLimit scfg) (budget `div` fromIntegral (length caches + 1))
+
+perDbLimit :: ServerConfig.Config -> Word64
+perDbLimit = megabytes . ServerConfig.config_db_lookup_cache_limit_mb
+
+budgetBytes :: ServerConfig.Config -> Maybe Word64
+budgetBytes =
+  fmap megabytes . ServerConfig.config_db_lookup_cache_total_limit_mb
+
+megabytes :: Integral a => a -> Word64
+megabytes mb = fromIntegral (max 0 mb) * 1024 * 1024
+
+writableCaches :: Env -> IO [(Thrift.Repo, LookupCache)]
+writableCaches Env{..} = atomically $ do
+  dbs <- readTVar envActive
+  fmap catMaybes $ forM (HashMap.toList dbs) $ \(repo, db) -> do
+    state <- readTVar (dbState db)
+    return $ case state of
+      Open OpenDB{ odbWriting = Just Writing{..} } ->
+        Just (repo, wrLookupCache)
+      _ -> Nothing
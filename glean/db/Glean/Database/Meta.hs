@@ -22,16 +22,26 @@ module Glean.Database.Meta
   , utcTimeToPosixEpochTime
   , posixEpochTimeToUTCTime
   , posixEpochTimeToTime
+  , backupHeadProperty
+  , backupHead
+  , setBackupHead
+  , partiallyRestoredProperty
+  , isPartiallyRestored
+  , markPartiallyRestored
+  , unmarkPartiallyRestored
   ) where
 
 import qualified Data.ByteString.Char8 as B
 import Data.Functor
+import qualified Data.HashMap.Strict as HashMap
 import Data.Map (Map)
 import qualified Data.Map as Map
 import Data.Maybe
 import Data.Text (Text)
+import qualified Data.Text as Text
 import Data.Time (UTCTime, NominalDiffTime, diffUTCTime)
 import Data.Time.Clock.POSIX
+import Text.Read (readMaybe)
 
 import Thrift.Protocol.JSON
 import Util.TimeSec
@@ -137,3 +147,41 @@ posixEpochTimeToUTCTime = toUTCTime . posixEpochTimeToTime
 
 posixEpochTimeToTime :: PosixEpochTime -> Time
 posixEpochTimeToTime = Time . fromIntegral . unPosixEpochTime
+
+-- | Property of a backup that is made of two parts, holding the size of
+-- the first one (see 'Glean.Database.Storage.restoreStaged')
+backupHeadProperty :: Text
+backupHeadProperty = "glean.backup.head_bytes"
+
+backupHead :: Meta -> Maybe Int
+backupHead meta =
+  readMaybe . Text.unpack =<<
+    HashMap.lookup backupHeadProperty (metaProperties meta)
+
+setBackupHead :: Maybe Int -> Meta -> Meta
+setBackupHead bytes meta = meta
+  { metaProperties = case bytes of
+      Just n ->
+        HashMap.insert backupHeadProperty (Text.pack (show n)) props
+      Nothing -> HashMap.delete backupHeadProperty props
+  }
+  where
+  props = metaProperties meta
+
+-- | Property of a DB whose facts are still being restored
+partiallyRestoredProperty :: Text
+partiallyRestoredProperty = "glean.restore.partial"
+
+isPartiallyRestored :: Meta -> Bool
+isPartiallyRestored =
+  HashMap.member partiallyRestoredProperty . metaProperties
+
+markPartiallyRestored :: Meta -> Meta
+markPartiallyRestored meta = meta
+  { metaProperties =
+      HashMap.insert partiallyRestoredProperty "true" (metaProperties meta) }
+
+unmarkPartiallyRestored :: Meta -> Meta
+unmarkPartiallyRestored meta = meta
+  { metaProperties =
+      HashMap.delete partiallyRestoredProperty (metaProperties meta) }
@@ -33,7 +33,6 @@ import Data.IORef
 import Data.Maybe
 import Data.Set (Set)
 import qualified Data.Text as Text
-import Data.Word
 import qualified Data.Set as Set
 import GHC.Stack (HasCallStack)
 
@@ -49,13 +48,15 @@ import Glean.Database.Data
 import Glean.Database.Exception
 import Glean.Database.Repo
 import Glean.Database.Storage as Storage
-import Glean.Database.Meta (Meta(..))
+import qualified Glean.Database.LookupCacheBudget as LookupCacheBudget
+import Glean.Database.Meta (Meta(..), isPartiallyRestored)
 import Glean.Database.Schema
 import Glean.Database.Schema.Types
 import Glean.Database.Types
 import Glean.Database.Write.Queue
 import Glean.Logger
 import Glean.Query.Codegen (Boundaries, flatBoundaries, stackedBoundaries)
+import qualified Glean.Query.PlanCache as PlanCache
 import Glean.Repo.Text
 import qualified Glean.RTS.Foreign.Lookup as Lookup
 import Glean.RTS.Foreign.Lookup (Lookup)
@@ -219,10 +220,21 @@ readDatabaseWithBoundaries
   -> (OpenDB -> Boundaries -> Lookup -> IO a)
   -> IO a
 readDatabaseWithBoundaries env repo f =
-  withOpenDatabase env repo $ \odb ->
+  withOpenDatabase env repo $ \odb -> do
+  checkRestored env repo
   withOpenDBLookup env repo odb $ \bounds lookup ->
     f odb bounds lookup
 
+-- | Fail with 'Thrift.Retry' if the facts of a DB, or of a DB it is
+-- stacked on, are still being restored.
+checkRestored :: Env -> Repo -> IO ()
+checkRestored env@Env{..} repo = do
+  parents <- repoParents env repo
+  partial <- atomically $
+    anyM (fmap isPartiallyRestored . Catalog.readMeta envCatalog)
+      (repo : parents)
+  when partial $ throwIO $ Thrift.Retry 5
+
 newDB :: Repo -> STM DB
 newDB repo = DB repo
   <$> newTVar Closed
@@ -394,6 +406,7 @@ schemaUpdated env@Env{..} mbRepo = do
   -- this cache anywhere else.
   when (isNothing mbRepo) $ do
     modifyMVar_ envDbSchemaCache $ \_ -> return HashMap.empty
+    PlanCache.clear envPlanCache
     -- previously failed DBs might now open successfully
     atomically $ Catalog.resetFailed envCatalog
 
@@ -423,29 +436,30 @@ schemaUpdated env@Env{..} mbRepo = do
             case r of
               Left err -> logError $ "schema update for " <> showRepo dbRepo <>
                 " failed: " <> show err
-              Right schema -> atomically $ do
-                state <- readTVar dbState
-                case state of
-                  Opening -> return ()
-                   -- if we are Opening now, this must have happened
-                   -- after the transaction above, so it will already
-                   -- pick up the new schema.
-                  Open odb ->
-                    writeTVar dbState $ Open odb { odbSchema = schema }
-                  Closing -> return ()
-                  Closed -> return ()
+              Right schema -> do
+                atomically $ do
+                  state <- readTVar dbState
+                  case state of
+                    Opening -> return ()
+                     -- if we are Opening now, this must have happened
+                     -- after the transaction above, so it will already
+                     -- pick up the new schema.
+                    Open odb ->
+                      writeTVar dbState $ Open odb { odbSchema = schema }
+                    Closing -> return ()
+                    Closed -> return ()
+                -- drop queries compiled against the old schema
+                PlanCache.invalidateRepo envPlanCache dbRepo
   logInfo "done updating schema for open DBs"
 
 
 setupWriting :: Lookup.CanLookup lookup => Env -> lookup -> IO Writing
-setupWriting Env{..} lookup = do
+setupWriting env@Env{..} lookup = do
   scfg <- Observed.get envServerConfig
-  -- Convert to Word64 from Int32 to prevent silent truncation.
-  let cache_limit_mb :: Word64 = fromIntegral $
-        ServerConfig.config_db_lookup_cache_limit_mb scfg
+  capacity <- LookupCacheBudget.initialCapacity env
   lookupCache <- LookupCache.new
-    (fromIntegral$ cache_limit_mb * 1024 * 1024)
-    (fromIntegral $ ServerConfig.config_db_writer_threads scfg)
+    capacity
+    (fromIntegral $ max 0 $ ServerConfig.config_db_lookup_cache_max_idle_s scfg)
     envLookupCacheStats
   next_id <- newIORef =<< Lookup.firstFreeId lookup
   mutex <- newMutex (Storage.WriteLock ())
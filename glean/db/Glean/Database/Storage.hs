@@ -19,6 +19,7 @@ module Glean.Database.Storage
   , currentVersion
   ) where
 
+import Control.Exception (throwIO)
 import Data.ByteString (ByteString)
 import Data.HashMap.Strict (HashMap)
 import Data.Text (Text)
@@ -128,6 +129,24 @@ class DatabaseOps (Database s) => Storage s where
     -> FilePath  -- ^ file containing the serialiased database (produced by 'backup')
     -> IO ()
 
+  -- | Restore a database from a backup that 'backup' made in two parts
+  -- (see 'Glean.Database.Backup.Backend.dataHead'). The file needs to
+  -- hold only the first part. Once this returns, the database can be
+  -- opened, with everything but its facts. The returned action adds
+  -- the rest once the whole backup is in the file, and can run while
+  -- the database is open. Both use the scratch directory, which must
+  -- not be deleted in between.
+  restoreStaged
+    :: s   -- ^ storage
+    -> ServerConfig.Config  -- ^ server config
+    -> Repo  -- ^ repo
+    -> FilePath  -- ^ scratch directory
+    -> FilePath  -- ^ file containing the serialiased database
+    -> Int  -- ^ size of the first part
+    -> IO (IO ())
+  restoreStaged _ _ _ _ _ _ =
+    throwIO $ userError "backups in two parts are not supported"
+
 class CanLookup db => DatabaseOps db where
   -- | Close a database
   close :: db -> IO ()
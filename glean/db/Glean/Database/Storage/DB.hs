@@ -210,7 +210,7 @@ instance DatabaseOps DB where
     createDirectoryIfMissing True path
     withContainer db $ \s_ptr ->
       withCString path $ invoke . glean_rocksdb_container_backup s_ptr
-    process path (Data 0)
+    process path (Data 0 Nothing)
 
 newtype Container = Container (Ptr Container)
   deriving(Storable)
@@ -186,7 +186,7 @@ instance DatabaseOps (Database LMDB) where
         callProcess "mksquashfs" $ [ path, out ] <>
           map Text.unpack (ServerConfig.config_db_lmdb_mksquashfs_args cfg)
         size <- getFileSize out
-        process out (Data $ fromIntegral size)
+        process out (Data (fromIntegral size) Nothing)
 
 
 foreign import ccall safe glean_lmdb_container_open
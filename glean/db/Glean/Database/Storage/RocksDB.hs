@@ -15,20 +15,34 @@ module Glean.Database.Storage.RocksDB
 import Control.Exception
 import Control.Monad
 import Data.Int
+import Data.List (partition)
+import qualified Data.Map as Map
+import qualified Data.Text as Text
 import Foreign.C.String
 import Foreign.C.Types
 import Foreign.ForeignPtr
+import Foreign.Marshal.Array (withArrayLen)
+import Foreign.Marshal.Utils (withMany)
 import Foreign.Ptr
 import System.Directory
 import System.IO.Temp (withTempDirectory)
 import System.FilePath
-import System.Process (readProcessWithExitCode)
+import System.IO (IOMode(..), SeekMode(..), hGetContents, hSeek, withBinaryFile)
+import System.Process
+  ( CreateProcess(std_err, std_in, std_out)
+  , StdStream(..)
+  , createProcess
+  , proc
+  , readProcessWithExitCode
+  , waitForProcess
+  )
 import System.Exit (ExitCode(ExitSuccess))
+import Thrift.Protocol (fromThriftEnum)
 
 import Util.FFI
 import Util.IO (safeRemovePathForcibly)
 
-import Glean.Database.Backup.Backend (Data(Data))
+import Glean.Database.Backup.Backend (Data(..))
 import Glean.Database.Repo (databasePath)
 import Glean.Database.Storage
 import Glean.Database.Storage.DB
@@ -67,6 +81,12 @@ data RocksDB = RocksDB
     -- not enforced. It's up to each io usage to check diskspace before writing.
     -- We're using this to avoid serving too many dbs on query servers,
     -- and smarter sharding.
+  , rocksFinishedCompression :: [(String, ServerConfig.RocksDBCompression)]
+    -- ^ how to recompress column families when a DB is compacted at
+    -- the end of writing
+  , rocksKeyPrefixBytes :: Int
+    -- ^ bytes of each key, after the predicate, in the prefix bloom
+    -- filters (0 for none)
   }
 
 -- | Compute the size of the cache in bytes
@@ -90,6 +110,9 @@ newStorage root config@ServerConfig.Config{..} = do
   cache <- if cache_size > 0
     then Just <$> newCache cache_size
     else return Nothing
+  -- check the profile once here, rather than each time a DB is opened
+  withCompression finishedCompression $ \names types count ->
+    invoke $ glean_rocksdb_check_compression names types count
   return RocksDB
     { rocksRoot = root
     , rocksCache = cache
@@ -99,7 +122,28 @@ newStorage root config@ServerConfig.Config{..} = do
         Just mem -> (* (mem * 1024)) . fromIntegral <$>
           config_db_rocksdb_disk_mem_capacity_ratio_limit
         Nothing -> Nothing
+    , rocksFinishedCompression = finishedCompression
+    , rocksKeyPrefixBytes =
+        max 0 (fromIntegral config_db_rocksdb_key_prefix_bytes)
     }
+  where
+  finishedCompression =
+    [ (Text.unpack name, compression)
+    | (name, compression) <-
+        Map.toList config_db_rocksdb_finished_compression ]
+
+-- | Pass a compression profile to C++ as arrays of family names and
+-- compressions.
+withCompression
+  :: [(String, ServerConfig.RocksDBCompression)]
+  -> (Ptr CString -> Ptr CInt -> CSize -> IO a)
+  -> IO a
+withCompression compression f =
+  withMany withCString (map fst compression) $ \names ->
+  withArrayLen names $ \count names_ptr ->
+  withArrayLen (map (fromIntegral . fromThriftEnum . snd) compression) $
+    \_ types_ptr ->
+  f names_ptr types_ptr (fromIntegral count)
 
 newtype instance Database RocksDB = Database DB
   deriving (CanLookup)
@@ -119,11 +163,17 @@ instance Storage RocksDB where
         return (2, start, ownership)
     withCString path $ \cpath ->
       withCache (rocksCache rocks) $ \cache_ptr ->
+      withCompression (rocksFinishedCompression rocks) $
+        \names_ptr types_ptr count ->
       using (invoke $
           glean_rocksdb_container_open cpath
             cmode
             (fromIntegral (fromEnum (rocksCacheIndexAndFilterBlocks rocks)))
-            cache_ptr)
+            cache_ptr
+            names_ptr
+            types_ptr
+            count
+            (fromIntegral (rocksKeyPrefixBytes rocks)))
         $ \container -> do
       fp <- mask_ $ do
         first_unit_id <- maybe (return firstUsetId) nextUsetId ownership
@@ -173,19 +223,23 @@ instance Storage RocksDB where
       removeFile scratch_file
 
       -- If the tarfile contains "backup/.." then it is a RocksDB backup
+      -- If the tarfile contains "sst/.." then it is a set of SST files
       -- If the tarfile contains "db/.." then it is a plain tarball of the DB
-      let scratch_restore_backup = scratch_restore </> "backup"
-      is_rocksdb_backup <- doesDirectoryExist scratch_restore_backup
-      db <-
-        if is_rocksdb_backup
-          then do
-            let scratch_db = scratch </> "db"
-            createDirectoryIfMissing True scratch_db
-            withCString scratch_db $ \p_target ->
-              withCString (scratch_restore </> "backup") $ \p_source ->
-                invoke $ glean_rocksdb_restore p_target p_source
-            return scratch_db
-          else do
+      let
+        scratch_db = scratch </> "db"
+        convert from f = do
+          createDirectoryIfMissing True scratch_db
+          withCString scratch_db $ \p_target ->
+            withCString (scratch_restore </> from) $ \p_source ->
+              invoke $ f p_target p_source
+          return scratch_db
+      is_rocksdb_backup <- doesDirectoryExist (scratch_restore </> "backup")
+      is_sst_files <- doesDirectoryExist (scratch_restore </> "sst")
+      db <- if
+        | is_rocksdb_backup -> convert "backup" glean_rocksdb_restore
+        | is_sst_files -> convert "sst" $ \p_target p_source ->
+            glean_rocksdb_ingest p_target p_source 1
+        | otherwise -> do
             let scratch_restore_db = scratch_restore </> "db"
             is_copy <- doesDirectoryExist scratch_restore_db
             if is_copy
@@ -196,6 +250,39 @@ instance Storage RocksDB where
       createDirectoryIfMissing True $ takeDirectory target
       renameDirectory db target
 
+  -- The file holds two tar archives of SST files, one after the other:
+  -- the first has the column families in 'headFamilies', and the
+  -- second the rest. Unless told to skip the end of an archive, tar
+  -- stops at the end of the first one.
+  restoreStaged rocks _ repo scratch scratch_file head_bytes = do
+    let scratch_db = scratch </> "db"
+        target = containerPath rocks repo
+    withTempDirectory scratch "head" $ \scratch_head -> do
+      tar ["-xf", scratch_file, "-C", scratch_head]
+      createDirectoryIfMissing True scratch_db
+      ingest scratch_db (scratch_head </> "sst") True
+      createDirectoryIfMissing True $ takeDirectory target
+      renameDirectory scratch_db target
+    return $ withTempDirectory scratch "rest" $ \scratch_rest -> do
+      withBinaryFile scratch_file ReadMode $ \h -> do
+        hSeek h AbsoluteSeek (fromIntegral head_bytes)
+        tarWith (\p -> p { std_in = UseHandle h })
+          ["-xf", "-", "-C", scratch_rest]
+      removeFile scratch_file
+      ingest target (scratch_rest </> "sst") False
+    where
+      ingest db source create =
+        withCString db $ \p_target ->
+        withCString source $ \p_source ->
+          invoke $ glean_rocksdb_ingest p_target p_source
+            (fromIntegral (fromEnum create))
+
+-- | The column families that are enough to open a DB and read its
+-- properties, schema and predicate stats, which a backup made of SST
+-- files has first
+headFamilies :: [FilePath]
+headFamilies = ["admin", "meta", "stats"]
+
 instance DatabaseOps (Database RocksDB) where
   close (Database db) = close db
   predicateStats (Database db) = predicateStats db
@@ -219,18 +306,41 @@ instance DatabaseOps (Database RocksDB) where
   cacheOwnership (Database db) = cacheOwnership db
   prepareFactOwnerCache (Database db) = prepareFactOwnerCache db
 
-  backup (Database db) cfg scratch process = do
-    backup db cfg scratch $ \path _ -> do
+  -- SST files are backed up in two parts, so that a DB can be restored
+  -- in two steps (see 'restoreStaged')
+  backup (Database db) cfg scratch process
+    | ServerConfig.config_db_rocksdb_backup_sst_files cfg = do
+      let path = scratch </> "sst"
+      withContainer db $ \container ->
+        withCString path $
+          invoke . glean_rocksdb_container_export_files container
+      families <- listDirectory path
+      let (first, rest) = partition (`elem` headFamilies) families
+          archive = ("-C" :) . (scratch :) . map ("sst" </>)
+      withTempFile $ \tarFile -> do
+        tar $ ["-cf", tarFile] <> archive first
+        headSize <- getFileSize tarFile
+        withBinaryFile tarFile AppendMode $ \h ->
+          tarWith (\p -> p { std_out = UseHandle h }) $
+            ["-cf", "-"] <> archive rest
+        size <- getFileSize tarFile
+        process tarFile $ Data
+          { dataSize = fromIntegral size
+          , dataHead = Just (fromIntegral headSize)
+          }
+    | otherwise = backup db cfg scratch $ \path _ -> do
       let (base, dir) = splitFileName path
       withTempFile $ \tarFile -> do
         tar ["-cf", tarFile, "-C", base, dir]
         size <- getFileSize tarFile
-        process tarFile (Data $ fromIntegral size)
+        process tarFile (Data (fromIntegral size) Nothing)
 
 
+-- | Unpack a backup, including both parts of one that was made in two
+-- parts (see 'restoreStaged')
 unTar :: FilePath -> FilePath -> IO ()
 unTar scratch_file scratch_restore =
-  tar ["-xf", scratch_file, "-C", scratch_restore]
+  tar ["--ignore-zeros", "-xf", scratch_file, "-C", scratch_restore]
 
 tar :: [String] -> IO ()
 tar args = do
@@ -241,6 +351,19 @@ tar args = do
       (ec, _, err) <- readProcessWithExitCode path args ""
       unless (ec == ExitSuccess) $ throwIO $ userError err
 
+-- | Run tar with its standard input or output redirected
+tarWith :: (CreateProcess -> CreateProcess) -> [String] -> IO ()
+tarWith redirect args = do
+  tarPath <- findExecutable "tar"
+  case tarPath of
+    Nothing  -> throwIO $ userError "Cannot find tar executable"
+    Just path -> do
+      (_, _, Just err_h, ph) <- createProcess $
+        (redirect (proc path args)) { std_err = CreatePipe }
+      err <- hGetContents err_h
+      ec <- evaluate (length err) >> waitForProcess ph
+      unless (ec == ExitSuccess) $ throwIO $ userError err
+
 containerPath :: RocksDB -> Repo -> FilePath
 containerPath RocksDB{..} repo = databasePath rocksRoot repo </> "db"
 
@@ -257,11 +380,21 @@ getCacheCapacity rocks = do
     fmap fromIntegral . glean_rocksdb_cache_capacity
 
 
+foreign import ccall unsafe glean_rocksdb_check_compression
+  :: Ptr CString
+  -> Ptr CInt
+  -> CSize
+  -> IO CString
+
 foreign import ccall safe glean_rocksdb_container_open
   :: CString
   -> CInt
   -> CBool
   -> Ptr Cache
+  -> Ptr CString
+  -> Ptr CInt
+  -> CSize
+  -> CSize
   -> Ptr Container
   -> IO CString
 
@@ -279,3 +412,14 @@ foreign import ccall safe glean_rocksdb_restore
   :: CString
   -> CString
   -> IO CString
+
+foreign import ccall safe glean_rocksdb_container_export_files
+  :: Container
+  -> CString
+  -> IO CString
+
+foreign import ccall safe glean_rocksdb_ingest
+  :: CString
+  -> CString
+  -> CBool
+  -> IO CString
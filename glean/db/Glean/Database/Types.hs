@@ -54,6 +54,9 @@ import Glean.Database.Trace
 import Glean.Internal.Types (StorageName(..))
 import Glean.Logger.Server (GleanServerLogger)
 import Glean.Logger.Database (GleanDatabaseLogger)
+import Glean.Query.PlanCache (PlanCache)
+import Glean.Query.ResultCache (ResultCache)
+import Glean.Query.Stream (QueryStreams)
 import Glean.RTS.Foreign.FactSet (FactSet)
 import Glean.RTS.Foreign.LookupCache (LookupCache)
 import qualified Glean.RTS.Foreign.LookupCache as LookupCache
@@ -240,6 +243,12 @@ data Env = Env
   , envSchemaSource :: Observed SchemaIndex
     -- ^ The schema source, and its parsed/resolved form are both cached here.
   , envDbSchemaCache :: MVar DbSchemaCache
+  , envPlanCache :: PlanCache
+    -- ^ Compiled Angle queries, see Glean.Query.PlanCache
+  , envResultCache :: ResultCache
+    -- ^ Results of queries on complete DBs, see Glean.Query.ResultCache
+  , envQueryStreams :: QueryStreams
+    -- ^ Queries running between pages of results, see Glean.Query.Stream
   , envUpdateSchema :: Bool
   , envSchemaUpdateSignal :: TMVar ()
   , envSchemaId :: Maybe Thrift.SchemaId
@@ -9,10 +9,14 @@
 {-# LANGUAGE RecursiveDo #-}
 module Glean.Query.Codegen
   ( compileQuery
+  , compileQueryPartition
+  , partitionable
   , compileQueryFacts
   , Boundaries
+  , SectionBoundaries
   , flatBoundaries
   , stackedBoundaries
+  , partitionBoundaries
   , skipTrusted
   , buildTerm
   ) where
@@ -26,11 +30,12 @@ import Data.ByteString (ByteString)
 import Data.Coerce
 import Data.IntSet (IntSet)
 import qualified Data.IntSet as IntSet
-import Data.List (find,genericLength)
+import Data.List (find,genericLength,sort)
 import Data.Maybe
 import qualified Data.Text as Text
 import qualified Data.Vector as Vector
 import Data.Vector (Vector, (!), (//))
+import qualified Data.Vector.Storable as VS
 import Data.Word
 import Foreign.Ptr hiding (WordPtr)
 import System.IO.Unsafe
@@ -165,6 +170,22 @@ findOutputs stmts = findOutputsStmts stmts IntSet.empty
     foldr findOutputsPat r (all:exps)
   findOutputsMatch _ r = r
 
+-- | Does the pattern bind a variable?
+patBinds :: Term (Match e v) -> Bool
+patBinds pat = flip any (matches pat) $ \case
+  MatchBind _ -> True
+  MatchWild _ -> False
+  MatchNever _ -> False
+  MatchFid _ -> False
+  MatchVar _ -> False
+  MatchAnd l r -> patBinds l || patBinds r
+  MatchPrefix _ exp -> patBinds exp
+  MatchArrayPrefix _ exps all -> any patBinds exps || patBinds all
+  MatchExt _ -> False
+  where
+  matches :: Term (Match e v) -> [Match e v]
+  matches p = foldMap pure p
+
 -- | The database boundaries we are interested in to implement
 -- sectioned 'seek' calls.
 data Boundaries
@@ -191,6 +212,51 @@ sectionBounds lookup = SectionBoundaries
   <$> Lookup.startingId lookup
   <*> Lookup.firstFreeId lookup
 
+-- | Split the facts that a 'partitionable' query searches into at most
+-- n ranges of fact IDs holding about the same number of them, for
+-- running the query on each range in parallel with
+-- 'compileQueryPartition'.
+--
+-- The ranges are split at the IDs of a sample of the predicate's facts
+-- (see 'Lookup.sampleIds'), which is all of them for a small predicate,
+-- so a predicate whose facts are in a narrow band of IDs is still
+-- shared between the parts. The first and last ranges extend to the
+-- start and end of the DB, so the ranges always cover all the facts.
+partitionBoundaries
+  :: Lookup
+  -> Int
+  -> Boundaries
+  -> CodegenQuery
+  -> IO [SectionBoundaries]
+partitionBoundaries lookup n bounds query = do
+  sample <- case searchedPid query of
+    Nothing -> return VS.empty
+    Just pid -> VS.fromList . sort . VS.toList <$>
+      Lookup.sampleIds lookup pid partitionSampleSize
+  let
+    size = VS.length sample
+    parts = max 1 (min n size)
+    cuts = [ sample VS.! (i * size `div` parts) | i <- [1 .. parts - 1] ]
+    points = [start] <> cuts <> [end]
+  return $ zipWith SectionBoundaries points (drop 1 points)
+  where
+  (start, end) = case bounds of
+    FlatBoundaries (SectionBoundaries from to) -> (from, to)
+    StackedBoundaries (SectionBoundaries from _) (SectionBoundaries _ to) ->
+      (from, to)
+
+-- | How many of a predicate's facts 'partitionBoundaries' looks at
+partitionSampleSize :: Int
+partitionSampleSize = 4096
+
+-- | The predicate searched by the outermost statement of a
+-- 'partitionable' query
+searchedPid :: CodegenQuery -> Maybe Pid
+searchedPid query = case queryStatements query of
+  Just (_, _, _, CgStatement _ (FactGenerator (PidRef pid _) _ _ _) : _) ->
+    Just pid
+  _ -> Nothing
+
 compileQuery
   :: EnableRecursion
   -> QueryTransformations
@@ -200,23 +266,62 @@ compileQuery
      -- done on this; we assume that earlier phases have done this.  A
      -- malformed query can cause a crash.
   -> IO CompiledQuery
+compileQuery r qtrans bounds = compileQueryWith r qtrans bounds Nothing
 
-compileQuery r qtrans bounds (QueryWithInfo query numVars lookup ty) = do
+-- | Compile a query whose outermost statement only searches the facts
+-- in a range of fact IDs from 'partitionBoundaries'. Together, the
+-- results of the queries for all the ranges are the results of the
+-- whole query. The query must be 'partitionable'.
+compileQueryPartition
+  :: EnableRecursion
+  -> QueryTransformations
+  -> Boundaries
+  -> SectionBoundaries
+  -> CodegenQuery
+  -> IO CompiledQuery
+compileQueryPartition r qtrans bounds range =
+  compileQueryWith r qtrans bounds (Just range)
+
+-- | Whether a query can be compiled with 'compileQueryPartition'. Its
+-- outermost statement must search for facts and bind them, or
+-- something in them: then each of the facts it finds is in one range,
+-- and the rest of the query runs for it in that range only.
+partitionable :: CodegenQuery -> Bool
+partitionable query = case queryStatements query of
+  Just (_, _, _, CgStatement pat (FactGenerator _ key val SeekOnAllFacts) : _)
+    | Ref (MatchBind _) <- pat -> True
+    | Ref (MatchWild _) <- pat -> patBinds key || patBinds val
+  _ -> False
+
+-- | The terms for the ID, key and value of each result of a query, and
+-- the statements that produce them.
+queryStatements :: CodegenQuery -> Maybe (Expr, Expr, Expr, [CgStatement])
+queryStatements (QueryWithInfo query _ lookup _) = if
+  | Just gen@(FactGenerator _ keyTerm valTerm _) <- lookup,
+    CgQuery idTerm stmts <- query -> do
+      let lookup = CgStatement idTerm gen
+      let
+        unBind (Ref (MatchBind x)) = Ref (MatchVar x)
+        unBind (Ref (MatchWild (Angle.RecordTy []))) = Tuple []
+        unBind _ = error "unBind"
+      return (idTerm, unBind keyTerm, unBind valTerm, stmts <> [lookup])
+  | CgQuery (Tuple [idTerm, resultKey, resultValue]) stmts <- query ->
+      return (idTerm, resultKey, resultValue, stmts)
+  | otherwise -> Nothing
+
+compileQueryWith
+  :: EnableRecursion
+  -> QueryTransformations
+  -> Boundaries
+  -> Maybe SectionBoundaries
+  -> CodegenQuery
+  -> IO CompiledQuery
+compileQueryWith r qtrans bounds partition
+    q@(QueryWithInfo query numVars _ ty) = do
   StringLog.vlog 2 $ show (displayDefault query)
 
-  (idTerm, resultKey, resultValue, stmts) <- if
-    | Just gen@(FactGenerator _ keyTerm valTerm _) <- lookup,
-      CgQuery idTerm stmts <- query -> do
-        let lookup = CgStatement idTerm gen
-        let
-          unBind (Ref (MatchBind x)) = Ref (MatchVar x)
-          unBind (Ref (MatchWild (Angle.RecordTy []))) = Tuple []
-          unBind _ = error "unBind"
-        return (idTerm, unBind keyTerm, unBind valTerm, stmts <> [lookup])
-    | CgQuery (Tuple [idTerm, resultKey, resultValue]) stmts <- query ->
-        return (idTerm, resultKey, resultValue, stmts)
-    | otherwise ->
-        throwIO $ BadQuery "unsupported query"
+  (idTerm, resultKey, resultValue, stmts) <-
+    maybe (throwIO $ BadQuery "unsupported query") return (queryStatements q)
 
   (Meta{..}, sub) <- generateQueryCode $ \ regs@QueryRegs{..} -> do
 
@@ -239,7 +344,14 @@ compileQuery r qtrans bounds (QueryWithInfo query numVars lookup ty) = do
     outputUninitialized $ \resultKeyOutput resultValueOutput ->
       let
         code :: forall a. Code a -> Code a
-        code = compileStatements regs qtrans bounds regs stmts vars
+        code = case (partition, stmts) of
+          (Just range, CgStatement pat (FactGenerator pid k v _) : rest) ->
+            -- search the range as if it were the base of a stacked DB
+            let only = StackedBoundaries range range in
+            compileStatements regs qtrans only regs
+              [CgStatement pat (FactGenerator pid k v SeekOnBase)] vars
+            . compileStatements regs qtrans bounds regs rest vars
+          _ -> compileStatements regs qtrans bounds regs stmts vars
 
         queryStmts :: forall a. Code a -> Code a
         queryStmts = case r of
@@ -497,25 +609,10 @@ compileStatements
           -- any variables at all.
           isExistenceCheck = case gen of
             FactGenerator _ k v _ ->
-              let bindsAnywhere = bindsIn pat || bindsIn k || bindsIn v in
+              let bindsAnywhere = patBinds pat || patBinds k || patBinds v in
               not bindsAnywhere
             _ -> False
 
-          -- does the pattern bind a variable?
-          bindsIn pat = flip any (matches pat) $ \case
-            MatchBind _ -> True
-            MatchWild _ -> False
-            MatchNever _ -> False
-            MatchFid _ -> False
-            MatchVar _ -> False
-            MatchAnd l r -> bindsIn l || bindsIn r
-            MatchPrefix _ exp -> bindsIn exp
-            MatchArrayPrefix _ exps all -> any bindsIn exps || bindsIn all
-            MatchExt _ -> False
-
-          matches :: Term (Match e v) -> [Match e v]
-          matches p = foldMap pure p
-
       compile (CgAllStatement (Var (Angle.SetTy ty) v _) expr stmts : rest)
         | isWordTy ty = do
         local $ \setReg -> do
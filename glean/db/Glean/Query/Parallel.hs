@@ -0,0 +1,128 @@
+{-
+  Copyright (c) Meta Platforms, Inc. and affiliates.
+  All rights reserved.
+
+  This source code is licensed under the BSD-style license found in the
+  LICENSE file in the root directory of this source tree.
+-}
+
+-- | Running a query on several threads (see
+-- @UserQueryOptions.parallelism@).
+--
+-- The query is compiled once for each range of fact IDs from
+-- 'partitionBoundaries', with its outermost statement searching only
+-- the facts in the range (see 'compileQueryPartition'). The parts run
+-- at the same time, each with its own query executor and its own set of
+-- derived facts, and their results are merged into one page. The parts
+-- that didn't finish are carried in the continuation, and resume in
+-- parallel on the next page.
+--
+-- The limits on results and bytes for a page are split between the
+-- parts that run, so no more parts can run than there are results to
+-- share between them (see 'width'). The ranges are split at the IDs of
+-- a sample of the facts of the predicate being searched, so that each
+-- part searches about the same number of them, wherever they are in
+-- the DB.
+module Glean.Query.Parallel
+  ( firstIds
+  , width
+  , run
+  ) where
+
+import Control.Concurrent.Async (forConcurrently)
+import Data.Int
+import qualified Data.Map as Map
+import Data.Maybe
+import qualified Data.Set as Set
+import qualified Data.Vector as Vector
+
+import Glean.RTS.Foreign.FactSet (FactSet)
+import qualified Glean.RTS.Foreign.FactSet as FactSet
+import Glean.RTS.Foreign.Lookup (Lookup)
+import Glean.RTS.Foreign.Query
+import Glean.RTS.Foreign.Stacked (Stacked, stacked)
+import Glean.RTS.Types (Fid(..))
+import qualified Glean.Types as Thrift
+
+-- | The first ID for the derived facts of each of n new parts of a
+-- query, far enough apart that the IDs of different parts don't meet.
+firstIds :: Fid -> Int -> [Fid]
+firstIds (Fid next) n =
+  [ Fid (next + i * stride) | i <- [0 .. fromIntegral n - 1] ]
+  where
+  stride = 2 ^ (32 :: Int)
+
+-- | The number of parts, out of n, that can run at the same time
+-- within the limits: each part needs a limit of at least one result
+-- and one byte, as a limit of 0 would mean no limit at all.
+width :: QueryRuntimeOptions -> Int -> Int
+width QueryRuntimeOptions{..} n =
+  max 1 $ minimum $ n :
+    [ fromIntegral m | Just m <- [queryMaxResults, queryMaxBytes], m > 0 ]
+
+-- | Run the parts of a query at the same time, and merge their
+-- results. Each part is given the first ID for its derived facts, which
+-- are added to the DB. The limits on results and bytes are split
+-- between the parts, which must be no more than 'width' of them, so the
+-- page is within the limits. Returns the parts that didn't finish.
+run
+  :: Lookup
+  -> QueryRuntimeOptions
+  -> [(Fid, Stacked FactSet -> QueryRuntimeOptions -> IO QueryResults)]
+  -> IO (QueryResults, [Thrift.UserQueryPartition])
+run lookup limits parts = do
+  done <- forConcurrently (zip [0..] parts) $ \(i, (nextId, query)) -> do
+    derived <- FactSet.new nextId
+    results <- query (stacked lookup derived) (share (length parts) i limits)
+    next <- FactSet.firstFreeId derived
+    return (results, next)
+  return
+    ( merge (map fst done)
+    , [ Thrift.UserQueryPartition cont (fromFid next)
+      | (QueryResults{ queryResultsCont = Just cont }, next) <- done ]
+    )
+
+-- | The limits for part i of n: the shares of the parts add up to the
+-- limits for the whole page.
+share :: Int -> Int -> QueryRuntimeOptions -> QueryRuntimeOptions
+share n i limits = limits
+  { queryMaxResults = part <$> queryMaxResults limits
+  , queryMaxBytes = part <$> queryMaxBytes limits
+  }
+  where
+  part :: Int64 -> Int64
+  part m
+    | m > 0 = m `div` parts + (if index < m `mod` parts then 1 else 0)
+    | otherwise = m
+  parts = fromIntegral n
+  index = fromIntegral i
+
+-- | Merge the results of the parts of a query. A result found by more
+-- than one part is returned once, as it would be by the whole query.
+merge :: [QueryResults] -> QueryResults
+merge results = QueryResults
+  { queryResultsFacts =
+      unique key (concatMap (list . queryResultsFacts) results)
+  , queryResultsNestedFacts =
+      unique fst (concatMap (list . queryResultsNestedFacts) results)
+  , queryResultsStats =
+      case mapMaybe queryResultsStats results of
+        [] -> Nothing
+        stats -> Just (Map.unionsWith (+) stats)
+  , queryResultsElapsedNs = maximum (0 : map queryResultsElapsedNs results)
+  , queryResultsCont = Nothing
+  , queryResultsResultBytes = sum (map queryResultsResultBytes results)
+  }
+  where
+  list = Vector.toList
+
+  -- derived facts found by different parts have different IDs, so
+  -- compare them by their contents
+  key (_, Thrift.Fact pid k v) = (pid, k, v)
+
+  unique f = Vector.fromList . go Set.empty
+    where
+    go _ [] = []
+    go seen (x : xs)
+      | Set.member (f x) seen = go seen xs
+      | otherwise = x : go (Set.insert (f x) seen) xs
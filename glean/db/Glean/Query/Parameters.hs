@@ -0,0 +1,231 @@
+{-
+  Copyright (c) Meta Platforms, Inc. and affiliates.
+  All rights reserved.
+
+  This source code is licensed under the BSD-style license found in the
+  LICENSE file in the root directory of this source tree.
+-}
+
+-- | Prepared queries: Angle queries containing parameters, written
+-- @$name@, whose values are supplied separately in
+-- @UserQuery.parameters@.
+--
+-- A prepared query is compiled with each parameter replaced by a
+-- placeholder literal of the parameter's type, so the compiled query
+-- (and its entry in "Glean.Query.PlanCache") is the same for every
+-- value of the parameters. 'bindParameters' then replaces the
+-- placeholders in the compiled query with the actual values.
+module Glean.Query.Parameters
+  ( Parameters
+  , placeholderQuery
+  , inlineQuery
+  , bindParameters
+  ) where
+
+import Control.Monad.State.Strict
+import Data.ByteString (ByteString)
+import qualified Data.ByteString as B
+import qualified Data.ByteString.Builder as Builder
+import qualified Data.ByteString.Char8 as BC
+import qualified Data.ByteString.Lazy as LB
+import Data.Char (isAsciiLower, isAsciiUpper, isDigit)
+import Data.Map (Map)
+import qualified Data.Map as Map
+import qualified Data.Set as Set
+import Data.Text (Text)
+import qualified Data.Text as Text
+import qualified Data.Text.Encoding as Text
+import Data.Word (Word64)
+import TextShow
+
+import Glean.Angle.Lexer (encodeTextForAngle)
+import Glean.Query.Codegen.Types
+import Glean.RTS.Term (Term(..))
+import qualified Glean.Types as Thrift
+
+type Parameters = Map Text Thrift.QueryParameter
+
+-- | A literal standing for a parameter while the query is compiled.
+data Placeholder
+  = StringPlaceholder ByteString
+  | NatPlaceholder Word64
+  deriving (Eq, Ord)
+
+-- | The placeholder for each parameter. The placeholders can't be
+-- confused with literals in a real query: strings start with a NUL,
+-- nats count down from maxBound.
+placeholders :: Parameters -> Map Text (Placeholder, Thrift.QueryParameter)
+placeholders params = Map.fromList
+  [ (name, (placeholder n param, param))
+  | (n, (name, param)) <- zip [0..] (Map.toAscList params)
+  ]
+  where
+  placeholder :: Int -> Thrift.QueryParameter -> Placeholder
+  placeholder n = \case
+    Thrift.QueryParameter_string_value{} ->
+      StringPlaceholder $ Text.encodeUtf8 $ "\0glean:parameter:" <> showt n
+    Thrift.QueryParameter_nat_value{} ->
+      NatPlaceholder $ maxBound - fromIntegral n
+
+-- | The query with each parameter replaced by its placeholder.
+placeholderQuery :: Parameters -> ByteString -> Either Text ByteString
+placeholderQuery params query = do
+  mapM_ literal params -- reject invalid values before compiling
+  substitute (Right . render <$> placeholders params) query
+  where
+  render (StringPlaceholder s, _) = encodeTextForAngle (Text.decodeUtf8 s)
+  render (NatPlaceholder n, _) = showt n
+
+-- | The query with each parameter replaced by its value.
+inlineQuery :: Parameters -> ByteString -> Either Text ByteString
+inlineQuery params query = do
+  literals <- mapM literal params
+  substitute (Right <$> literals) query
+
+literal :: Thrift.QueryParameter -> Either Text Text
+literal = \case
+  Thrift.QueryParameter_string_value s -> Right (encodeTextForAngle s)
+  Thrift.QueryParameter_nat_value (Thrift.Nat n)
+    | n < 0 -> Left $ "negative nat parameter: " <> showt n
+    | otherwise -> Right (showt n)
+
+-- | Replace each @$name@ in the query, outside strings and comments,
+-- with the text for the parameter. @$name@ is not otherwise valid
+-- Angle: a fact ID is @$1234@ or @$pred 1234@, where pred is
+-- capitalised or qualified.
+substitute
+  :: Map Text (Either Text Text)
+  -> ByteString
+  -> Either Text ByteString
+substitute params query =
+  LB.toStrict . Builder.toLazyByteString <$> go 0 0
+  where
+  len = B.length query
+  at = BC.index query
+
+  -- copy query[from..i) and carry on scanning at i
+  go :: Int -> Int -> Either Text Builder.Builder
+  go from i
+    | i >= len = Right (chunk from len)
+    | otherwise = case at i of
+      '"' -> go from (stringEnd (i + 1))
+      '#' | i == 0 || not (isIdentChar (at (i - 1))) ->
+        go from (maybe len (+ i) (BC.elemIndex '\n' (B.drop i query)))
+      '$'
+        | (name, rest) <- BC.span isIdentChar (B.drop (i + 1) query)
+        , Just (c, _) <- BC.uncons name
+        , isAsciiLower c
+        , not ("." `B.isPrefixOf` rest) -> do
+          let param = Text.decodeUtf8 name
+              next = i + 1 + B.length name
+          text <- case Map.lookup param params of
+            Nothing -> Left $ "unknown query parameter: $" <> param
+            Just text -> text
+          (\r -> chunk from i <> Text.encodeUtf8Builder text <> r)
+            <$> go next next
+      _ -> go from (i + 1)
+
+  chunk from to = Builder.byteString (B.take (to - from) (B.drop from query))
+
+  stringEnd i
+    | i >= len = len
+    | otherwise = case at i of
+      '"' -> i + 1
+      '\\' -> stringEnd (i + 2)
+      _ -> stringEnd (i + 1)
+
+  isIdentChar c = isAsciiLower c || isAsciiUpper c || isDigit c || c == '_'
+
+-- | Replace the placeholders in a query compiled from 'placeholderQuery'
+-- with the parameter values. Returns Nothing if the optimiser may have
+-- used the value of a placeholder: when a placeholder no longer
+-- appears as a literal, or the query contains a statement that can
+-- never match, which is what comparing a placeholder with another
+-- literal produces. Such a query must be compiled from 'inlineQuery'
+-- instead.
+bindParameters :: Parameters -> CodegenQuery -> Maybe CodegenQuery
+bindParameters params query
+  | not never
+  , not (any isFalse (flatQueryBody (qiQuery query)))
+  , found == Set.fromList (Map.keys values) = Just bound
+  | otherwise = Nothing
+  where
+  values = Map.fromList
+    [ (placeholder, value param)
+    | (placeholder, param) <- Map.elems (placeholders params)
+    ]
+
+  value = \case
+    Thrift.QueryParameter_string_value s -> String (Text.encodeUtf8 s)
+    Thrift.QueryParameter_nat_value (Thrift.Nat n) -> Nat (fromIntegral n)
+
+  (bound, (found, never)) =
+    runState (traverseTerms bind query) (Set.empty, False)
+
+  bind t = case t of
+    Ref MatchNever{} -> do
+      modify' $ \(seen, _) -> (seen, True)
+      return t
+    _ | Just p <- placeholderOf t, Just v <- Map.lookup p values -> do
+      modify' $ \(seen, fails) -> (Set.insert p seen, fails)
+      return v
+    _ -> return t
+
+  placeholderOf = \case
+    String s -> Just (StringPlaceholder s)
+    Nat n -> Just (NatPlaceholder n)
+    _ -> Nothing
+
+  isFalse = \case
+    CgStatement{} -> False
+    CgAllStatement _ _ stmts -> any isFalse stmts
+    CgNegation stmts -> any isFalse stmts
+    CgDisjunction [] -> True
+    CgDisjunction alts -> any (any isFalse) alts
+    CgConditional c t e -> any isFalse (c ++ t ++ e)
+
+-- | Apply a function to every term in a query, bottom-up.
+traverseTerms
+  :: Monad m
+  => (Expr -> m Expr)
+  -> CodegenQuery
+  -> m CodegenQuery
+traverseTerms f q@QueryWithInfo{..} = do
+  query <- cgQuery qiQuery
+  gen <- traverse generator qiGenerator
+  return q { qiQuery = query, qiGenerator = gen }
+  where
+  cgQuery (CgQuery hd body) = CgQuery <$> term hd <*> mapM stmt body
+
+  stmt = \case
+    CgStatement pat gen -> CgStatement <$> term pat <*> generator gen
+    CgAllStatement v e stmts ->
+      CgAllStatement v <$> term e <*> mapM stmt stmts
+    CgNegation stmts -> CgNegation <$> mapM stmt stmts
+    CgDisjunction alts -> CgDisjunction <$> mapM (mapM stmt) alts
+    CgConditional c t e ->
+      CgConditional <$> mapM stmt c <*> mapM stmt t <*> mapM stmt e
+
+  generator = \case
+    FactGenerator pid key val section ->
+      FactGenerator pid <$> term key <*> term val <*> pure section
+    TermGenerator e -> TermGenerator <$> term e
+    DerivedFactGenerator pid key val ->
+      DerivedFactGenerator pid <$> term key <*> term val
+    ArrayElementGenerator ty e -> ArrayElementGenerator ty <$> term e
+    SetElementGenerator ty e -> SetElementGenerator ty <$> term e
+    PrimCall op args ty -> PrimCall op <$> mapM term args <*> pure ty
+
+  term t = f =<< case t of
+    Array ts -> Array <$> mapM term ts
+    Tuple ts -> Tuple <$> mapM term ts
+    Alt n t' -> Alt n <$> term t'
+    Ref m -> Ref <$> match m
+    _ -> return t
+
+  match = \case
+    MatchAnd a b -> MatchAnd <$> term a <*> term b
+    MatchPrefix s t -> MatchPrefix s <$> term t
+    MatchArrayPrefix ty ts t ->
+      MatchArrayPrefix ty <$> mapM term ts <*> term t
+    m -> return m
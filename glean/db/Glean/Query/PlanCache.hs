@@ -0,0 +1,147 @@
+{-
+  Copyright (c) Meta Platforms, Inc. and affiliates.
+  All rights reserved.
+
+  This source code is licensed under the BSD-style license found in the
+  LICENSE file in the root directory of this source tree.
+-}
+
+{-# LANGUAGE DeriveAnyClass #-}
+
+-- | A cache of compiled Angle queries, so that repeated queries (for
+-- example the codemarkup queries issued by Glass) skip parsing,
+-- typechecking, flattening and reordering.
+--
+-- The compiled query depends on the DB's schema, which can change
+-- when the schema is updated or the DB is reopened, so entries are
+-- keyed by repo and dropped by 'invalidateRepo' and 'clear' when
+-- that happens.
+module Glean.Query.PlanCache
+  ( PlanCache
+  , PlanKey(..)
+  , CompiledAngleQuery
+  , new
+  , lookup
+  , insert
+  , invalidateRepo
+  , clear
+  , size
+  ) where
+
+import Prelude hiding (lookup)
+
+import Data.ByteString (ByteString)
+import Data.Hashable
+import qualified Data.HashMap.Strict as HashMap
+import Data.HashMap.Strict (HashMap)
+import Data.IORef
+import qualified Data.Map.Strict as Map
+import Data.Map.Strict (Map)
+import Data.Word (Word64)
+import GHC.Generics (Generic)
+
+import Glean.Query.Codegen.Types (CodegenQuery)
+import Glean.Query.Typecheck.Types (TcPred)
+import Glean.RTS.Types (Type)
+import qualified Glean.Types as Thrift
+
+-- | The result of compileAngleQuery
+type CompiledAngleQuery = (CodegenQuery, Type, [TcPred])
+
+-- | Everything that compileAngleQuery depends on
+data PlanKey = PlanKey
+  { planRepo :: !Thrift.Repo
+  , planLatestSchemaId :: !Thrift.SchemaId
+    -- ^ the latest SchemaId of the DB's schema, which changes when a
+    -- new schema is loaded
+  , planSchemaId :: !(Maybe Thrift.SchemaId)
+    -- ^ the SchemaId used to resolve the query, Nothing for the latest
+  , planStored :: !Bool
+  , planRecursion :: !Bool
+  , planQuery :: !ByteString
+  }
+  deriving (Eq, Generic, Hashable)
+
+data Entries = Entries
+  { entriesTick :: !Word64
+  , entriesByKey :: !(HashMap PlanKey (Word64, CompiledAngleQuery))
+  , entriesByAge :: !(Map Word64 PlanKey)
+    -- ^ least recently used first
+  }
+
+data PlanCache = PlanCache
+  { planCacheMaxEntries :: !Int
+  , planCacheEntries :: !(IORef Entries)
+  }
+
+-- | A cache holding at most the given number of compiled queries. A
+-- cache of size 0 never holds anything.
+new :: Int -> IO PlanCache
+new maxEntries = PlanCache (max 0 maxEntries) <$>
+  newIORef (Entries 0 HashMap.empty Map.empty)
+
+lookup :: PlanCache -> PlanKey -> IO (Maybe CompiledAngleQuery)
+lookup PlanCache{..} key =
+  atomicModifyIORef' planCacheEntries $ \entries@Entries{..} ->
+    case HashMap.lookup key entriesByKey of
+      Nothing -> (entries, Nothing)
+      Just (tick, plan) ->
+        let !next = entriesTick + 1 in
+        ( Entries
+            { entriesTick = next
+            , entriesByKey = HashMap.insert key (next, plan) entriesByKey
+            , entriesByAge =
+                Map.insert next key (Map.delete tick entriesByAge)
+            }
+        , Just plan )
+
+insert :: PlanCache -> PlanKey -> CompiledAngleQuery -> IO ()
+insert PlanCache{..} key plan
+  | planCacheMaxEntries == 0 = return ()
+  | otherwise =
+    atomicModifyIORef' planCacheEntries $ \Entries{..} ->
+      let
+        !next = entriesTick + 1
+        byAge = case HashMap.lookup key entriesByKey of
+          Nothing -> entriesByAge
+          Just (tick, _) -> Map.delete tick entriesByAge
+      in
+      (evict planCacheMaxEntries Entries
+        { entriesTick = next
+        , entriesByKey = HashMap.insert key (next, plan) entriesByKey
+        , entriesByAge = Map.insert next key byAge
+        }, ())
+
+evict :: Int -> Entries -> Entries
+evict maxEntries entries@Entries{..}
+  | HashMap.size entriesByKey <= maxEntries = entries
+  | Just ((_, key), byAge) <- Map.minViewWithKey entriesByAge =
+    evict maxEntries entries
+      { entriesByKey = HashMap.delete key entriesByKey
+      , entriesByAge = byAge
+      }
+  | otherwise = entries
+
+-- | Drop the compiled queries for a repo, when its DB is closed or
+-- its schema changes.
+invalidateRepo :: PlanCache -> Thrift.Repo -> IO ()
+invalidateRepo PlanCache{..} repo =
+  atomicModifyIORef' planCacheEntries $ \entries@Entries{..} ->
+    let
+      ofRepo key _ = planRepo key == repo
+      stale = HashMap.filterWithKey ofRepo entriesByKey
+    in
+    (entries
+      { entriesByKey = HashMap.filterWithKey (\k v -> not (ofRepo k v))
+          entriesByKey
+      , entriesByAge =
+          foldr (Map.delete . fst) entriesByAge (HashMap.elems stale)
+      }, ())
+
+clear :: PlanCache -> IO ()
+clear PlanCache{..} =
+  atomicModifyIORef' planCacheEntries $ \entries ->
+    (entries { entriesByKey = HashMap.empty, entriesByAge = Map.empty }, ())
+
+size :: PlanCache -> IO Int
+size PlanCache{..} = HashMap.size . entriesByKey <$> readIORef planCacheEntries
@@ -0,0 +1,148 @@
+{-
+  Copyright (c) Meta Platforms, Inc. and affiliates.
+  All rights reserved.
+
+  This source code is licensed under the BSD-style license found in the
+  LICENSE file in the root directory of this source tree.
+-}
+
+{-# LANGUAGE DeriveAnyClass #-}
+
+-- | A cache of query results for complete databases. A complete DB
+-- never changes, so the result of a query depends only on the query
+-- itself (including its options, limits, continuation and encodings)
+-- and the schema it was compiled against. Entries are dropped only
+-- when the DB is closed or deleted, or to keep the cache within its
+-- size bound, least recently used first.
+module Glean.Query.ResultCache
+  ( ResultCache
+  , ResultKey(..)
+  , new
+  , enabled
+  , lookup
+  , insert
+  , invalidateRepo
+  , bytes
+  ) where
+
+import Prelude hiding (lookup)
+
+import Data.ByteString (ByteString)
+import qualified Data.ByteString as B
+import Data.Hashable
+import qualified Data.HashMap.Strict as HashMap
+import Data.HashMap.Strict (HashMap)
+import Data.IORef
+import qualified Data.Map.Strict as Map
+import Data.Map.Strict (Map)
+import Data.Word (Word64)
+import GHC.Generics (Generic)
+import Thrift.Protocol.Compact (serializeCompact)
+
+import qualified Glean.Types as Thrift
+
+data ResultKey = ResultKey
+  { resultRepo :: !Thrift.Repo
+  , resultLatestSchemaId :: !Thrift.SchemaId
+    -- ^ the latest SchemaId of the DB's schema, which changes when a
+    -- new schema is loaded
+  , resultQuery :: !ByteString
+    -- ^ the serialized UserQuery, without the client info
+  }
+  deriving (Eq, Generic, Hashable)
+
+data Entry = Entry
+  { entryTick :: !Word64
+  , entryBytes :: !Int
+  , entryResults :: !Thrift.UserQueryResults
+  }
+
+data Entries = Entries
+  { entriesTick :: !Word64
+  , entriesBytes :: !Int
+  , entriesByKey :: !(HashMap ResultKey Entry)
+  , entriesByAge :: !(Map Word64 ResultKey)
+    -- ^ least recently used first
+  }
+
+data ResultCache = ResultCache
+  { resultCacheMaxBytes :: !Int
+  , resultCacheEntries :: !(IORef Entries)
+  }
+
+-- | A cache holding results of at most the given total size in bytes,
+-- as measured by their serialized size. A cache of size 0 is
+-- disabled.
+new :: Int -> IO ResultCache
+new maxBytes = ResultCache (max 0 maxBytes) <$>
+  newIORef (Entries 0 0 HashMap.empty Map.empty)
+
+enabled :: ResultCache -> Bool
+enabled cache = resultCacheMaxBytes cache > 0
+
+lookup :: ResultCache -> ResultKey -> IO (Maybe Thrift.UserQueryResults)
+lookup ResultCache{..} key =
+  atomicModifyIORef' resultCacheEntries $ \entries@Entries{..} ->
+    case HashMap.lookup key entriesByKey of
+      Nothing -> (entries, Nothing)
+      Just entry@Entry{..} ->
+        let !next = entriesTick + 1 in
+        ( entries
+            { entriesTick = next
+            , entriesByKey =
+                HashMap.insert key entry { entryTick = next } entriesByKey
+            , entriesByAge =
+                Map.insert next key (Map.delete entryTick entriesByAge)
+            }
+        , Just entryResults )
+
+-- | Add the results of a query, evicting the least recently used
+-- results to make room. Results larger than the whole cache are not
+-- added.
+insert :: ResultCache -> ResultKey -> Thrift.UserQueryResults -> IO ()
+insert ResultCache{..} key results
+  | size > resultCacheMaxBytes = return ()
+  | otherwise =
+    atomicModifyIORef' resultCacheEntries $ \entries ->
+      let
+        Entries{..} = remove key entries
+        !next = entriesTick + 1
+      in
+      (evict resultCacheMaxBytes Entries
+        { entriesTick = next
+        , entriesBytes = entriesBytes + size
+        , entriesByKey = HashMap.insert key (Entry next size results)
+            entriesByKey
+        , entriesByAge = Map.insert next key entriesByAge
+        }, ())
+  where
+  size = B.length (resultQuery key) + B.length (serializeCompact results)
+
+remove :: ResultKey -> Entries -> Entries
+remove key entries@Entries{..} = case HashMap.lookup key entriesByKey of
+  Nothing -> entries
+  Just Entry{..} -> entries
+    { entriesBytes = entriesBytes - entryBytes
+    , entriesByKey = HashMap.delete key entriesByKey
+    , entriesByAge = Map.delete entryTick entriesByAge
+    }
+
+evict :: Int -> Entries -> Entries
+evict maxBytes entries@Entries{..}
+  | entriesBytes <= maxBytes = entries
+  | Just ((_, key), _) <- Map.minViewWithKey entriesByAge =
+    evict maxBytes (remove key entries)
+  | otherwise = entries
+
+-- | Drop the results for a repo, when its DB is closed or deleted.
+invalidateRepo :: ResultCache -> Thrift.Repo -> IO ()
+invalidateRepo ResultCache{..} repo =
+  atomicModifyIORef' resultCacheEntries $ \entries@Entries{..} ->
+    let
+      stale = filter ((== repo) . resultRepo) (HashMap.keys entriesByKey)
+    in
+    (foldr remove entries stale, ())
+
+-- | The total size of the cached results
+bytes :: ResultCache -> IO Int
+bytes ResultCache{..} = entriesBytes <$> readIORef resultCacheEntries
@@ -0,0 +1,180 @@
+{-
+  Copyright (c) Meta Platforms, Inc. and affiliates.
+  All rights reserved.
+
+  This source code is licensed under the BSD-style license found in the
+  LICENSE file in the root directory of this source tree.
+-}
+
+-- | Query streams (see @UserQueryOptions.stream@): queries that keep
+-- running on the server between pages of results.
+--
+-- Each stream is a thread that runs the query and hands over its pages
+-- one at a time. The thread computes the next page while the client
+-- processes the current one, and then waits until the client asks for
+-- it, so the client controls how far ahead the query runs. Since the
+-- thread keeps the DB open and the query's iterators alive, each page
+-- resumes the query where the last one stopped, instead of restarting
+-- it from a serialized continuation. A stream whose next page isn't
+-- fetched within the idle timeout is stopped.
+module Glean.Query.Stream
+  ( QueryStreams
+  , StreamId
+  , new
+  , start
+  , next
+  ) where
+
+import Control.Exception
+import Control.Monad
+import Data.HashMap.Strict (HashMap)
+import qualified Data.HashMap.Strict as HashMap
+import Data.Int
+import System.Random (randomIO)
+import TextShow
+
+import ServiceData.GlobalStats
+import Util.Control.Exception (tryAll)
+import Util.STM
+
+import qualified Glean.ServerConfig.Types as ServerConfig
+import qualified Glean.Types as Thrift
+import Glean.Util.Observed as Observed
+import Glean.Util.Warden (Warden)
+import qualified Glean.Util.Warden as Warden
+
+-- | Identifies a stream in a continuation. Chosen at random, so that a
+-- continuation from before a restart of the server doesn't refer to a
+-- different stream.
+type StreamId = Int64
+
+data Stream = Stream
+  { streamRepo :: !Thrift.Repo
+  , streamPage :: !(TMVar (Either SomeException Thrift.UserQueryResults))
+    -- ^ the next page, waiting to be fetched
+  , streamNext :: !(TVar Int64)
+    -- ^ the number of the next page, counting from 0
+  , streamDone :: !(TVar Bool)
+    -- ^ the query has finished, failed or been stopped
+  }
+
+data QueryStreams = QueryStreams
+  { streamsConfig :: Observed ServerConfig.Config
+  , streamsWarden :: Warden
+  , streamsActive :: TVar (HashMap StreamId Stream)
+  }
+
+new :: Observed ServerConfig.Config -> Warden -> IO QueryStreams
+new config warden = QueryStreams config warden <$> newTVarIO HashMap.empty
+
+-- | Start a stream running a query. The query passes its pages in order
+-- to the function it is given, which waits until the previous page has
+-- been fetched. The function returns False if the stream has been
+-- abandoned, in which case the query should stop. An exception thrown
+-- by the query is returned by 'next' in place of the next page.
+start
+  :: QueryStreams
+  -> Thrift.Repo
+  -> (StreamId -> (Thrift.UserQueryResults -> IO Bool) -> IO ())
+  -> IO StreamId
+start QueryStreams{..} repo run = do
+  ServerConfig.Config{..} <- Observed.get streamsConfig
+  when (config_query_stream_limit <= 0) $
+    throwIO $ Thrift.BadQuery "query streams are disabled on this server"
+  stream <- Stream repo <$> newEmptyTMVarIO <*> newTVarIO 0 <*> newTVarIO False
+  let
+    register = do
+      sid <- randomIO
+      added <- atomically $ do
+        active <- readTVar streamsActive
+        when (HashMap.size active >= fromIntegral config_query_stream_limit) $
+          throwSTM $ Thrift.Retry 1
+        let fresh = not (HashMap.member sid active)
+        when fresh $ writeTVar streamsActive $ HashMap.insert sid stream active
+        return fresh
+      if added then return sid else register
+  sid <- register
+  publish
+  abandoned <- newTVarIO False
+  let
+    idle = fromIntegral (max 1 config_query_stream_idle_s) * 1000000
+    -- once a page hasn't been fetched in time the stream is abandoned,
+    -- and no more pages are offered
+    offer page = do
+      gone <- readTVarIO abandoned
+      if gone
+        then return False
+        else do
+          fetched <- put idle stream page
+          unless fetched $ atomically $ writeTVar abandoned True
+          return fetched
+    stop = do
+      atomically $ do
+        writeTVar (streamDone stream) True
+        modifyTVar' streamsActive (HashMap.delete sid)
+      publish
+  Warden.spawn_ streamsWarden $ flip finally stop $ do
+    r <- tryAll $ run sid (offer . Right)
+    case r of
+      Left e -> void $ offer (Left e)
+      Right () -> return ()
+    -- keep the stream until its last page has been fetched
+    gone <- readTVarIO abandoned
+    unless gone $ do
+      timeout <- registerDelay idle
+      atomically $
+        (isEmptyTMVar (streamPage stream) >>= check)
+        `orElse` (readTVar timeout >>= check)
+  return sid
+  where
+  publish = do
+    n <- HashMap.size <$> readTVarIO streamsActive
+    setCounter "glean.query.streams" n
+
+-- | Wait until the previous page has been fetched and make this page the
+-- next one. Returns False if the previous page wasn't fetched before
+-- the idle timeout.
+put
+  :: Int
+  -> Stream
+  -> Either SomeException Thrift.UserQueryResults
+  -> IO Bool
+put idle Stream{..} page = do
+  timeout <- registerDelay idle
+  atomically $
+    (putTMVar streamPage page >> return True)
+    `orElse` (readTVar timeout >>= check >> return False)
+
+-- | Fetch a page of a stream, waiting for it to be computed. The pages
+-- must be fetched in order: a request that is repeated, for example
+-- because the client retried it, fails instead of skipping a page.
+next
+  :: QueryStreams
+  -> Thrift.Repo
+  -> StreamId
+  -> Int64
+     -- ^ number of the page, counting from 0
+  -> IO Thrift.UserQueryResults
+next QueryStreams{..} repo sid n = do
+  active <- readTVarIO streamsActive
+  Stream{..} <- case HashMap.lookup sid active of
+    Just stream | streamRepo stream == repo -> return stream
+    _ -> throwIO $ Thrift.BadQuery "unknown or expired query stream"
+  page <- atomically $ do
+    expected <- readTVar streamNext
+    if expected /= n
+      then return $ Left $ Thrift.BadQuery $
+        "query stream page " <> showt n <> " was requested, expected "
+          <> showt expected
+      else
+        (do
+          page <- takeTMVar streamPage
+          writeTVar streamNext (n + 1)
+          return (Right page))
+        `orElse` do
+          readTVar streamDone >>= check
+          return $ Left $ Thrift.BadQuery "query stream was stopped"
+  case page of
+    Right (Right results) -> return results
+    Right (Left e) -> throwIO e
+    Left e -> throwIO e
@@ -24,10 +24,11 @@ import qualified Data.ByteString as B
 import Data.Coerce
 import Data.Default
 import qualified Data.HashMap.Strict as HashMap
-import Data.Hashable (hash)
+import Data.Hashable (hash, hashWithSalt)
 import Data.Int
 import Data.IntMap (IntMap)
 import qualified Data.IntMap as IntMap
+import Data.IORef
 import Data.Map (Map)
 import qualified Data.Map as Map
 import Data.Maybe
@@ -44,6 +45,7 @@ import qualified Data.Vector.Storable as VS
 import Data.Word (Word64)
 import System.IO
 import TextShow
+import Thrift.Protocol.Compact (serializeCompact)
 
 import ServiceData.GlobalStats as Stats
 import qualified ServiceData.Types as Stats
@@ -72,6 +74,13 @@ import Glean.Query.Codegen.Types hiding (Match(..))
 import Glean.Query.Transform
 import Glean.Query.Flatten
 import Glean.Query.Opt
+import Glean.Query.Parameters
+import Glean.Query.PlanCache (PlanKey(..))
+import qualified Glean.Query.PlanCache as PlanCache
+import qualified Glean.Query.Parallel as Parallel
+import Glean.Query.ResultCache (ResultKey(..))
+import qualified Glean.Query.ResultCache as ResultCache
+import qualified Glean.Query.Stream as Stream
 import Glean.Query.Reorder
 import Glean.Query.Incremental (makeIncremental)
 import Glean.RTS as RTS
@@ -137,10 +146,123 @@ genericUserQuery
 {-# INLINE genericUserQuery #-}
 genericUserQuery env repo query enc = do
   config@ServerConfig.Config{..} <- Observed.get (envServerConfig env)
-  readDatabaseWithBoundaries env repo $ \odb bounds lookup ->
-    maybe id limitAllocsThrow config_query_alloc_limit
-      $ performUserQuery enc (odbSchema odb)
-      $ userQueryImpl env odb config NoExtraSteps bounds lookup repo query
+  let
+    stream = do
+      cont <- Thrift.userQueryOptions_continuation opts
+      sid <- Thrift.userQueryCont_stream cont
+      return (cont, sid, fromMaybe 0 (Thrift.userQueryCont_streamPage cont))
+  case stream of
+    Just (cont, sid, n) -> do
+      checkUserQueryCont cont
+      Stream.next (envQueryStreams env) repo sid n
+    Nothing
+      | Thrift.userQueryOptions_stream opts ->
+        streamUserQuery env config repo query enc
+      | otherwise ->
+        readDatabaseWithBoundaries env repo $ \odb bounds lookup ->
+          withResultCache env repo odb query
+            $ maybe id limitAllocsThrow config_query_alloc_limit
+            $ performUserQuery enc (odbSchema odb)
+            $ userQueryImpl env odb config NoExtraSteps Paged bounds lookup
+                repo query
+  where
+  opts = fromMaybe def (Thrift.userQuery_options query)
+
+-- | Start a query stream (see "Glean.Query.Stream") and return its
+-- first page. The continuation of each page refers to the stream,
+-- except when the query was interrupted: then the stream ends, and the
+-- continuation resumes the query in the usual way.
+--
+-- The pages are encoded with the encodings of the first request.
+streamUserQuery
+  :: Encoding e
+  => Database.Env
+  -> ServerConfig.Config
+  -> Thrift.Repo
+  -> Thrift.UserQuery
+  -> e
+  -> IO Thrift.UserQueryResults
+{-# INLINE streamUserQuery #-}
+streamUserQuery env config repo query enc = do
+  when (Thrift.userQueryOptions_store_derived_facts opts) $
+    throwIO $ Thrift.BadQuery
+      "store_derived_facts is not supported with query streams"
+  sid <- Stream.start (envQueryStreams env) repo $ \sid yield ->
+    readDatabaseWithBoundaries env repo $ \odb bounds lookup -> do
+      pages <- newIORef 0
+      let
+        page more results = do
+          res <- performUserQuery enc (odbSchema odb) (return results)
+          n <- atomicModifyIORef' pages $ \n -> (n + 1, n + 1)
+          return $ case Thrift.userQueryResults_continuation res of
+            Nothing | more -> res
+              { Thrift.userQueryResults_continuation =
+                  Just (streamUserQueryCont sid n) }
+            _ -> res
+      final <- userQueryImpl env odb config NoExtraSteps
+        (Streamed (yield <=< page True)) bounds lookup repo query
+      void $ yield =<< page False final
+  Stream.next (envQueryStreams env) repo sid 0
+  where
+  opts = fromMaybe def (Thrift.userQuery_options query)
+
+-- | Reuse the results of an earlier identical query on a complete DB
+-- (see "Glean.Query.ResultCache"). Queries that store derived facts
+-- are never cached, since they have to write to the DB.
+withResultCache
+  :: Database.Env
+  -> Thrift.Repo
+  -> OpenDB
+  -> Thrift.UserQuery
+  -> IO Thrift.UserQueryResults
+  -> IO Thrift.UserQueryResults
+withResultCache env repo odb query run
+  | not (ResultCache.enabled cache)
+    || isJust (odbWriting odb)
+    || Thrift.userQueryOptions_store_derived_facts opts = run
+  | otherwise = do
+    meta <- atomically $ Catalog.readMeta (envCatalog env) repo
+    case Thrift.metaCompleteness meta of
+      Thrift.Complete{} -> do
+        (secs, bytes, cached) <- timeIt $ ResultCache.lookup cache key
+        case cached of
+          Just results -> do
+            addStatValueType "glean.query.result_cache.hit" 1 Stats.Sum
+            return results
+              { Thrift.userQueryResults_stats =
+                  cachedStats secs bytes <$>
+                    Thrift.userQueryResults_stats results }
+          Nothing -> do
+            addStatValueType "glean.query.result_cache.miss" 1 Stats.Sum
+            results <- run
+            ResultCache.insert cache key results
+            return results
+      _ -> run
+  where
+  cache = envResultCache env
+  opts = fromMaybe def (Thrift.userQuery_options query)
+  key = ResultKey
+    { resultRepo = repo
+    , resultLatestSchemaId = schemaId (odbSchema odb)
+    , resultQuery = serializeCompact query
+        { Thrift.userQuery_client_info = Nothing }
+    }
+
+-- | The stats of results served from the result cache: they describe
+-- the same results, but the time taken is that of the lookup, and
+-- nothing was compiled, executed or searched.
+cachedStats :: Double -> Int -> Thrift.UserQueryStats -> Thrift.UserQueryStats
+cachedStats secs bytes stats = stats
+  { Thrift.userQueryStats_elapsed_ns = truncate (secs * 1000000000)
+  , Thrift.userQueryStats_allocated_bytes = fromIntegral bytes
+  , Thrift.userQueryStats_facts_searched = Nothing
+  , Thrift.userQueryStats_compile_time_ns = Nothing
+  , Thrift.userQueryStats_bytecode_size = Nothing
+  , Thrift.userQueryStats_execute_time_ns = Nothing
+  , Thrift.userQueryStats_codegen_time_ns = Nothing
+  , Thrift.userQueryStats_full_scans = []
+  , Thrift.userQueryStats_cached = True
+  }
 
 -- | A generic implementation of lookup queries.
 genericUserQueryFacts
@@ -564,7 +686,7 @@ userQueryWrites env odb config bounds lookup repo pred q = do
     then IncrementalDerivation <$> sectionsStats
     else return NoExtraSteps
   Results{..} <- withStats $
-    userQueryImpl env odb config mode bounds lookup repo q
+    userQueryImpl env odb config mode Paged bounds lookup repo q
   return (resStats, resCont, resWriteHandle)
   where
     -- We derive incrementally if
@@ -611,6 +733,7 @@ userQueryImpl
   -> OpenDB
   -> ServerConfig.Config
   -> CompilationMode
+  -> Paging
   -> Boundaries
   -> Lookup
   -> Thrift.Repo
@@ -622,6 +745,7 @@ userQueryImpl
   odb
   config
   mode
+  paging
   bounds
   lookup
   repo
@@ -653,14 +777,15 @@ userQueryImpl
         -- that returns a temporary predicate.
         _ -> do
           (compileTime, _, (query@QueryWithInfo{..}, ty, preds)) <-
-            timeIt $ compileAngleQuery
-              (envEnableRecursion env)
+            timeIt $ compileWithParameters
+              env
+              repo
               schemaVersion
               schema
               mode
               userQuery_query
+              userQuery_parameters
               stored
-              (envDebug env)
 
           predDiag <- if Thrift.queryDebugOptions_pred_has_facts debug then
               getPredDiags env repo schema preds
@@ -686,7 +811,17 @@ userQueryImpl
         compileDiag = diag,
         cont = cont
         }
-      runQuery env odb config bounds lookup repo details compileInfo query
+      runQuery env odb config paging bounds lookup repo details compileInfo
+        query
+
+-- | How a query returns its results
+data Paging
+  = Paged
+    -- ^ one page, whose continuation carries the state of the query
+  | Streamed (Results Stats Thrift.Fact -> IO Bool)
+    -- ^ every page but the last is passed to the function, which
+    -- returns False to stop the query; the last page is returned.
+    -- A query resumed from a continuation returns just one page.
 
 data CompileInfo = CompileInfo {
   returnType :: Type,
@@ -757,6 +892,7 @@ runQuery
   :: Database.Env
   -> OpenDB
   -> ServerConfig.Config
+  -> Paging
   -> Boundaries
   -> Lookup
   -> Thrift.Repo
@@ -768,6 +904,7 @@ runQuery
   env
   odb
   config
+  paging
   bounds
   lookup
   repo
@@ -814,91 +951,181 @@ runQuery
     appliedTrans <- either (throwIO . Thrift.BadQuery) return $
       transformationsFor schema trans returnType
 
-    ( qResults@QueryResults{..}
-      , queryDiag
-      , bytecodeSize
-      , codegenTime
-      , fullScans ) <-
-      case cont of
-        Right ucont -> do
-          let binaryCont = Thrift.userQueryCont_continuation ucont
-          results <- transformResultsBack appliedTrans <$>
-            restartCompiled
-              schemaInventory
-              defineOwners
-              stack
-              (Just $ predicatePid details)
-              limits
-              binaryCont
-          return (results, [], B.length binaryCont, 0, [])
-
-        Left query -> do
-          let
-            debug = Thrift.userQueryOptions_debug opts
-            bytecodeDiag sub =
-              [ "bytecode:\n" <> Text.unlines
-                (disassemble "Query" userQuerySysCalls $ compiledQuerySub sub)
-              | Thrift.queryDebugOptions_bytecode debug ]
-
-          bracket
-            (timeIt $ compileQuery (envEnableRecursion env) trans bounds query)
-            (\(_, _, sub) -> release $ compiledQuerySub sub)
-            $ \(codegenTime, _, sub) -> do
-              results <- transformResultsBack appliedTrans <$>
-                executeCompiled schemaInventory defineOwners stack sub limits
+    let
+      parallelism = fromIntegral $ max 1 $ min
+        (Thrift.userQueryOptions_parallelism opts)
+        (ServerConfig.config_query_max_parallelism config)
+      parallel = parallelism > 1 && not stored && case paging of
+        Paged -> True
+        Streamed{} -> False
 
-              diags <-
-                evaluate $ force (bytecodeDiag sub) -- don't keep sub alive
-              sz <- evaluate $ Bytecode.size (compiledQuerySub sub)
-              let fullScans = compiledQueryFullScans sub
-              return (results, diags, sz, codegenTime, fullScans)
-
-    -- If we're storing derived facts, queue them for writing and
-    -- return the handle. We allow querying for stored derived
-    -- predicates with stored=True on a read-only DB; this is used
-    -- by the regression testing framework to test derived predicates.
-    maybeWriteHandle <-
-      if stored && (
-          isJust (odbWriting odb) ||
-          Thrift.userQueryOptions_omit_results opts)
-        then writeDerivedFacts env repo nextId derived defineOwners
-          queryResultsFacts
-        else return Nothing
-
-    userCont <- case queryResultsCont of
-      Nothing -> return Nothing
-      Just bs -> do
-        nextId <- firstFreeId derived
-        return $ Just $ mkUserQueryCont (Right returnType) bs nextId
-
-    stats <- getStats schema fullScans qResults
-
-    when (isJust userCont) $
-      addStatValueType "glean.query.truncated" 1 Stats.Sum
-
-    let ppType = renderStrict $ layoutPretty defaultLayoutOptions $
-          displayDefault returnType
-
-        results = Results
-          { resFacts = Vector.toList queryResultsFacts
-          , resPredicate = Just details
-          , resNestedFacts = mkNestedFacts queryResultsNestedFacts
-          , resCont = userCont
-          , resStats = stats
-          , resDiags = compileDiag ++ queryDiag
-          , resWriteHandle = maybeWriteHandle
-          , resFactsSearched = queryResultsStats
-          , resType = Just ppType
-          , resBytecodeSize = Just bytecodeSize
-          , resCompileTime = Just compileTime
-          , resCodegenTime = Just codegenTime
-          , resExecutionTime = Just queryResultsElapsedNs
-          , resResultBytes = Just queryResultsResultBytes
-          }
+      debug = Thrift.userQueryOptions_debug opts
+      bytecodeDiag sub =
+        [ "bytecode:\n" <> Text.unlines
+          (disassemble "Query" userQuerySysCalls $ compiledQuerySub sub)
+        | Thrift.queryDebugOptions_bytecode debug ]
 
-    return $ if Thrift.userQueryOptions_omit_results opts
-      then withoutFacts results
-      else results
+      -- the continuation of a query that ran on one thread
+      sequentialCont QueryResults{..} = forM queryResultsCont $ \bs -> do
+        nextId <- firstFreeId derived
+        return $ mkUserQueryCont (Right returnType) bs nextId
+
+      finish
+          ( qResults@QueryResults{..}
+          , userCont
+          , queryDiag
+          , bytecodeSize
+          , codegenTime
+          , fullScans ) = do
+        -- If we're storing derived facts, queue them for writing and
+        -- return the handle. We allow querying for stored derived
+        -- predicates with stored=True on a read-only DB; this is used
+        -- by the regression testing framework to test derived predicates.
+        maybeWriteHandle <-
+          if stored && (
+              isJust (odbWriting odb) ||
+              Thrift.userQueryOptions_omit_results opts)
+            then writeDerivedFacts env repo nextId derived defineOwners
+              queryResultsFacts
+            else return Nothing
+
+        stats <- getStats schema fullScans qResults
+
+        when (isJust userCont) $
+          addStatValueType "glean.query.truncated" 1 Stats.Sum
+
+        let ppType = renderStrict $ layoutPretty defaultLayoutOptions $
+              displayDefault returnType
+
+            results = Results
+              { resFacts = Vector.toList queryResultsFacts
+              , resPredicate = Just details
+              , resNestedFacts = mkNestedFacts queryResultsNestedFacts
+              , resCont = userCont
+              , resStats = stats
+              , resDiags = compileDiag ++ queryDiag
+              , resWriteHandle = maybeWriteHandle
+              , resFactsSearched = queryResultsStats
+              , resType = Just ppType
+              , resBytecodeSize = Just bytecodeSize
+              , resCompileTime = Just compileTime
+              , resCodegenTime = Just codegenTime
+              , resExecutionTime = Just queryResultsElapsedNs
+              , resResultBytes = Just queryResultsResultBytes
+              }
+
+        return $ if Thrift.userQueryOptions_omit_results opts
+          then withoutFacts results
+          else results
+
+    case cont of
+      Right ucont
+        | parts@(_:_) <- Thrift.userQueryCont_partitions ucont -> do
+        -- the parts that don't fit in the limits of this page wait for
+        -- the next one, ahead of the parts that ran
+        let (now, later) =
+              splitAt (Parallel.width limits (length parts)) parts
+        (results, remaining) <- Parallel.run lookup limits
+          [ ( Fid userQueryPartition_nextId
+            , \stack limits -> restartCompiled
+                schemaInventory
+                Nothing
+                stack
+                (Just $ predicatePid details)
+                limits
+                userQueryPartition_continuation )
+          | Thrift.UserQueryPartition{..} <- now ]
+        finish
+          ( transformResultsBack appliedTrans results
+          , parallelUserQueryCont returnType (later ++ remaining)
+          , []
+          , sum [ B.length c | Thrift.UserQueryPartition c _ <- now ]
+          , 0
+          , [] )
+
+      Right ucont -> do
+        let binaryCont = Thrift.userQueryCont_continuation ucont
+        results <- restartCompiled
+          schemaInventory
+          defineOwners
+          stack
+          (Just $ predicatePid details)
+          limits
+          binaryCont
+        userCont <- sequentialCont results
+        finish
+          ( transformResultsBack appliedTrans results
+          , userCont
+          , []
+          , B.length binaryCont
+          , 0
+          , [] )
+
+      Left query | parallel, partitionable query -> do
+        ranges <- partitionBoundaries lookup
+          (Parallel.width limits parallelism) bounds query
+        let
+          compile range = timeIt $ compileQueryPartition
+            (envEnableRecursion env) trans bounds range query
+        bracket
+          (mapM compile ranges)
+          (mapM_ (\(_, _, sub) -> release $ compiledQuerySub sub))
+          $ \compiled -> do
+            let subs = [ sub | (_, _, sub) <- compiled ]
+            diags <- evaluate $ force $ concatMap bytecodeDiag (take 1 subs)
+            sizes <- mapM (evaluate . Bytecode.size . compiledQuerySub) subs
+            (results, remaining) <- Parallel.run lookup limits
+              [ (firstId, \stack limits ->
+                  executeCompiled schemaInventory Nothing stack sub limits)
+              | (firstId, sub) <-
+                  zip (Parallel.firstIds nextId (length subs)) subs ]
+            finish
+              ( transformResultsBack appliedTrans results
+              , parallelUserQueryCont returnType remaining
+              , diags
+              , sum sizes
+              , sum [ t | (t, _, _) <- compiled ]
+              , concatMap compiledQueryFullScans (take 1 subs) )
+
+      Left query -> do
+        bracket
+          (timeIt $ compileQuery (envEnableRecursion env) trans bounds query)
+          (\(_, _, sub) -> release $ compiledQuerySub sub)
+          $ \(codegenTime, _, sub) -> do
+            diags <-
+              evaluate $ force (bytecodeDiag sub) -- don't keep sub alive
+            sz <- evaluate $ Bytecode.size (compiledQuerySub sub)
+            let
+              fullScans = compiledQueryFullScans sub
+              page results = do
+                userCont <- sequentialCont results
+                finish
+                  ( transformResultsBack appliedTrans results
+                  , userCont
+                  , diags
+                  , sz
+                  , codegenTime
+                  , fullScans )
+            case paging of
+              Paged -> page =<<
+                executeCompiled schemaInventory defineOwners stack sub limits
+              Streamed yield ->
+                withQueryStream schemaInventory defineOwners stack sub limits $
+                  \stream -> do
+                  let
+                    -- the allocation limit applies to each page
+                    next = maybe id limitAllocsThrow
+                      (ServerConfig.config_query_alloc_limit config) $ do
+                        (results, done) <- nextPage stream limits
+                        (, done) <$> page results
+                    loop = do
+                      (results, done) <- next
+                      if done
+                        then return results
+                        else do
+                          continue <- yield results
+                          if continue then loop else return results
+                  loop
 
 transformationsForQuery
   :: DbSchema
@@ -950,6 +1177,79 @@ data CompilationMode
   = NoExtraSteps
   | IncrementalDerivation (SeekSection -> Pid -> Bool)
 
+-- | Compile a query and bind its parameters, if it has any. The query
+-- is compiled with placeholders for the parameters so that the
+-- compiled query is cached for all their values; if the placeholders
+-- can't be replaced afterwards the values are inlined and the query
+-- compiled again.
+compileWithParameters
+  :: Database.Env
+  -> Thrift.Repo
+  -> SchemaSelector
+  -> DbSchema
+  -> CompilationMode
+  -> ByteString
+  -> Parameters
+  -> Bool
+  -> IO (CodegenQuery, Type, [TcPred])
+compileWithParameters env repo ver dbSchema mode source params stored
+  | Map.null params = compile source
+  | otherwise = do
+    (query, ty, preds) <- compile =<< badQuery (placeholderQuery params source)
+    case bindParameters params query of
+      Just bound -> return (bound, ty, preds)
+      Nothing -> do
+        vlog 2 "query parameters could not be bound, inlining them"
+        compile =<< badQuery (inlineQuery params source)
+  where
+  compile q = cachedCompileAngleQuery env repo ver dbSchema mode q stored
+  badQuery = either (throwIO . Thrift.BadQuery) return
+
+-- | 'compileAngleQuery', reusing the result for a query that was
+-- compiled before (see "Glean.Query.PlanCache"). Queries compiled for
+-- incremental derivation depend on the DB contents so they are never
+-- cached, and neither are queries when debug output is enabled.
+cachedCompileAngleQuery
+  :: Database.Env
+  -> Thrift.Repo
+  -> SchemaSelector
+  -> DbSchema
+  -> CompilationMode
+  -> ByteString
+  -> Bool
+  -> IO (CodegenQuery, Type, [TcPred])
+cachedCompileAngleQuery env repo ver dbSchema mode source stored =
+  case mode of
+    NoExtraSteps | not (tcDebug debug || queryDebug debug) -> do
+      cached <- PlanCache.lookup cache key
+      case cached of
+        Just plan -> do
+          addStatValueType "glean.query.plan_cache.hit" 1 Stats.Sum
+          return plan
+        Nothing -> do
+          addStatValueType "glean.query.plan_cache.miss" 1 Stats.Sum
+          plan <- compile
+          PlanCache.insert cache key plan
+          return plan
+    _otherwise -> compile
+  where
+  cache = envPlanCache env
+  debug = envDebug env
+  compile = compileAngleQuery
+    (envEnableRecursion env) ver dbSchema mode source stored debug
+  key = PlanKey
+    { planRepo = repo
+    , planLatestSchemaId = schemaId dbSchema
+    , planSchemaId = case ver of
+        LatestSchema -> Nothing
+        SpecificSchemaId sid -> Just sid
+    , planStored = stored
+    , planRecursion = case envEnableRecursion env of
+        EnableRecursion -> True
+        DisableRecursion -> False
+    , planQuery = source
+    }
+
 compileAngleQuery
   :: EnableRecursion
   -> SchemaSelector
@@ -1219,6 +1519,7 @@ withStats io = do
         , Thrift.userQueryStats_full_scans = statFullScans $ resStats res
         , Thrift.userQueryStats_result_bytes =
             fromIntegral <$> resResultBytes res
+        , Thrift.userQueryStats_cached = False
         }
   return res{ resStats = stats }
 
@@ -1235,6 +1536,9 @@ mkUserQueryCont contInfo cont nextId =
   , userQueryCont_hash = 0
   , userQueryCont_returnType = returnType
   , userQueryCont_pids = pids
+  , userQueryCont_stream = Nothing
+  , userQueryCont_partitions = []
+  , userQueryCont_streamPage = Nothing
   }
   where
     returnType = case contInfo of
@@ -1262,15 +1566,46 @@ hashUserQueryCont Thrift.UserQueryCont{..} = Thrift.UserQueryCont
   -- so a 64 bit non-crypto hash should work fine. Hashable currently uses a
   -- slightly broken (https://github.com/tibbe/hashable/issues/190) version of
   -- FNV-1 but should still be good enough.
-  { userQueryCont_hash = fromIntegral $ hash
-      ( userQueryCont_continuation
-      , userQueryCont_nextId
-      , userQueryCont_version
-      , userQueryCont_returnType
-      )
+  --
+  -- The stream and partitions are only hashed when they are set, so
+  -- that the hash of other continuations doesn't change.
+  { userQueryCont_hash = fromIntegral
+      $ (case userQueryCont_stream of
+          Nothing -> id
+          Just sid -> flip hashWithSalt (sid, userQueryCont_streamPage))
+      $ (if null userQueryCont_partitions then id else flip hashWithSalt
+          [ (continuation, nextId)
+          | Thrift.UserQueryPartition continuation nextId <-
+              userQueryCont_partitions ])
+      $ hash
+        ( userQueryCont_continuation
+        , userQueryCont_nextId
+        , userQueryCont_version
+        , userQueryCont_returnType
+        )
   , ..
   }
 
+-- | The continuation of a query that ran in parallel, which resumes the
+-- parts that didn't finish.
+parallelUserQueryCont
+  :: Type
+  -> [Thrift.UserQueryPartition]
+  -> Maybe Thrift.UserQueryCont
+parallelUserQueryCont _ [] = Nothing
+parallelUserQueryCont ty parts = Just $ hashUserQueryCont
+  (mkUserQueryCont (Right ty) B.empty (Fid 0))
+    { Thrift.userQueryCont_partitions = parts }
+
+-- | The continuation of a page of a query stream, which fetches page
+-- number n of the stream (counting from 0).
+streamUserQueryCont :: Stream.StreamId -> Int64 -> Thrift.UserQueryCont
+streamUserQueryCont sid n = hashUserQueryCont def
+  { Thrift.userQueryCont_version = fromIntegral Bytecode.version
+  , Thrift.userQueryCont_stream = Just sid
+  , Thrift.userQueryCont_streamPage = Just n
+  }
+
 serializeType :: Type -> ByteString
 serializeType = Text.encodeUtf8 . renderStrict . layoutCompact .
   displayDefault
@@ -273,7 +273,7 @@ instance Site S3Site where
     -- maybe not even more compact.
     let meta' = HashMap.singleton metadataKey (Text.decodeUtf8 $ Thrift.serializeJSON meta)
     _ <- uploadFile s3Client (dbPath repoPath) meta' body
-    pure $ Data (fromIntegral $ AWS.contentLength body)
+    pure $ Data (fromIntegral $ AWS.contentLength body) Nothing
 
   delete S3Site{s3Client, bucketBasePath} repo = runResourceT $ do
     let repoPath = makeRepoPath bucketBasePath repo
@@ -124,9 +124,16 @@ findReferenceRanges env@Glass.Env{..} sym opts@RequestOptions{..} =
       let filename = extractDefFileFilter symbolFilters
       (ranges, maybeError) <-
             fetchSymbolReferenceRanges env repo lang toks limit filename GleanBackend{..}
-      return (ranges, maybeError)
+      return (page ranges, maybeError)
   where
-    limit = fmap fromIntegral requestOptions_limit
+    offset = maybe 0 fromIntegral requestOptions_offset
+    -- when paging, fetch everything up to the end of the requested page.
+    -- Each page fetches the pages before it again, so walking n pages
+    -- costs O(n^2) results from Glean.
+    limit = fmap ((+ offset) . fromIntegral) requestOptions_limit
+    page = case requestOptions_offset of
+      Nothing -> id
+      Just _ -> maybe id (take . fromIntegral) requestOptions_limit . drop offset
 
 -- | Resolve a symbol identifier to its range-based location in the latest db
 -- This is about 10x cheaper than a full describeSymbol() call
@@ -273,7 +280,7 @@ searchSymbol
   case selectGleanDBs repoMapping scmRepo languageSet of
     Left err -> throwIO $ ServerException err
     Right rs -> case sFeelingLucky of
-      Normal -> joinSearchResults mlimit terse sorted <$>
+      Normal -> joinSearchResults offset mlimit terse sorted <$>
         Async.mapConcurrently
           (continueOnErrors. uncurry searchSymbolsIn)
           (Map.toList rs)
@@ -289,9 +296,12 @@ searchSymbol
     SymbolSearchOptions{..} = symbolSearchRequest_options
     terse = not symbolSearchOptions_detailedResults
     sorted = symbolSearchOptions_sortResults
+    offset = maybe 0 fromIntegral requestOptions_offset
     mlimit = fromIntegral <$> requestOptions_limit
     -- inner limit can be higher if we are sampling/sorting into kind/lang sets
-    mlimitInner = if sorted then fmap (*5) mlimit else mlimit
+    -- and must cover the results skipped by the offset (so, as with
+    -- findReferenceRanges, walking n pages costs O(n^2) results)
+    mlimitInner = (+ offset) <$> if sorted then fmap (*5) mlimit else mlimit
 
     sCase = if symbolSearchOptions_ignoreCase then Insensitive else Sensitive
     sType = if symbolSearchOptions_exactMatch then Exact else Prefix
@@ -476,23 +486,36 @@ processContext repo SymbolSearchData{..} = do
 -- search results appear sampled and ranked.
 --
 joinSearchResults
-  :: Maybe Int
+  :: Int
+  -> Maybe Int
   -> Bool
   -> Bool
   -> [RepoSearchResult]
   -> SymbolSearchResult
-joinSearchResults mlimit terse sorted xs = SymbolSearchResult syms $
+joinSearchResults offset mlimit terse sorted xs = SymbolSearchResult syms $
     if terse then [] else catMaybes descs
   where
     uniqXs = dedupSearchResult <$> xs
-    (syms,descs) = unzip $ nubOrd $ case (mlimit, sorted) of
-      (Nothing, _) -> flattened
-      (Just n, False) -> take n flattened
+    -- results are made unique before the page is taken, so that a page
+    -- is short only at the end of the results
+    (syms,descs) = unzip $ drop offset $ case (mlimit, sorted) of
+      (Nothing, _) -> nubOrd flattened
+      (Just n, False) -> take (offset + n) (nubOrd flattened)
       -- codehub/aka "sorted" mode grouping, ranking and sampling
-      (Just n, True) -> takeFairN n (concatMap sortResults uniqXs)
+      (Just n, True) -> takeFairN (offset + n)
+        (uniqueGroups (concatMap sortResults uniqXs))
 
     flattened = concat uniqXs
 
+-- | Drop the results that appear in an earlier group, or earlier in
+-- the same group
+uniqueGroups :: Ord a => [[a]] -> [[a]]
+uniqueGroups = go Set.empty
+  where
+    go _ [] = []
+    go seen (g : gs) = g' : go (foldr Set.insert seen g') gs
+      where g' = nubOrd (filter (`Set.notMember` seen) g)
+
 --
 -- DFS to first singleton result.
 --
@@ -635,17 +658,42 @@ fetchSymbolReferenceRanges env scsrepo lang toks limit filename b =
     case er of
       Left err -> return ([], Just $ logDBs err)
       Right (entities, searchErr) -> do
-        ranges <- forM entities $ \(entityRepo, query) ->
-          withRepo entityRepo $ do
+        let
+          search mlimit (entityRepo, query) = withRepo entityRepo $ do
             let convert (targetFile, rspan) =
                   rangeSpanToLocationRange scsrepo targetFile rspan
-            uses <- searchWithLimit limit $ case (filename, lang) of
+            uses <- searchWithLimit mlimit $ case (filename, lang) of
               -- Definition file filter only supported for Python
               (Just filename, Language_Python) ->
                 Query.findReferenceRangeSpanByDef query filename
               _ -> Query.findReferenceRangeSpan query
             mapM convert uses
-        return (nubOrd $ concat ranges, fmap (logDBs . logError) searchErr)
+        ranges <- case limit of
+          Nothing -> nubOrd . concat <$> mapM (search Nothing) entities
+          Just n -> firstUnique n
+            [ \lim -> search (Just lim) entity
+            | entity <- NonEmpty.toList entities ]
+        return (ranges, fmap (logDBs . logError) searchErr)
+
+-- | The first n unique results of a list of searches, in order, as if
+-- each search had returned all of its results. The searches are run
+-- with a limit, and run again with a higher one when a search may have
+-- been cut short before the results up to its end fill the n.
+firstUnique :: (Monad m, Ord a) => Int -> [Int -> m [a]] -> m [a]
+firstUnique n searches = go (max 1 n)
+  where
+    go lim = do
+      results <- mapM ($ lim) searches
+      if enough lim Set.empty results
+        then return $ take n $ nubOrd $ concat results
+        else go (lim * 2)
+
+    enough _ _ [] = True
+    enough lim seen (r : rs)
+      | Set.size seen' >= n = True
+      | length r >= lim = False
+      | otherwise = enough lim seen' rs
+      where seen' = foldr Set.insert seen r
 
 -- | Search for a symbol and return an Angle query that identifies the entities
 -- Return the angle query and the Glean.repo to which it applies.
@@ -22,11 +22,13 @@ import qualified Haxl.Core as Haxl
 
 import qualified Glean.LocalOrRemote as Glean
 import Glean.Util.Some (Some(..))
+import Util.EventBase (EventBaseDataplane)
 import Util.Time
 
 import qualified Glean.Glass.Env as Glass
 import qualified Glean.Glass.Config as Glass
 import Glean.Glass.SnapshotBackend
+import Glean.Glass.SnapshotBackend.Local (LocalSnapshotBackend(..))
 import Glean.Glass.SourceControl
 import Glean.Glass.Config (defaultWelcomeMessage)
 
@@ -43,7 +45,7 @@ configParser = do
   refreshFreq <- refreshFreqParser
   listDatabasesRetry <- listDatabasesRetryParser
   numWorkerThreads <- workerThreadsParser
-  snapshotBackend <- pure $ pure $ pure $ Some NilSnapshotBackend
+  snapshotBackend <- localSnapshotBackendParser
   sourceControl <- pure (const (return (Some NilSourceControl)))
   haxlState <- pure (const (return Haxl.stateEmpty))
   allocationLimit <- pure (return Nothing)
@@ -89,6 +91,18 @@ workerThreadsParser = optional $ option auto $ mconcat
   , help "Number of worker threads (defaults to the number of cores)"
   ]
 
+-- | Serve snapshots from a local directory if one is given
+localSnapshotBackendParser
+  :: Parser (EventBaseDataplane -> IO (Some SnapshotBackend))
+localSnapshotBackendParser = backend <$> optional (strOption $ mconcat
+  [ long "snapshot-dir"
+  , metavar "DIR"
+  , help "Serve precomputed documentSymbolListX results from this directory"
+  ])
+  where
+    backend Nothing = const $ return $ Some NilSnapshotBackend
+    backend (Just dir) = const $ return $ Some $ LocalSnapshotBackend dir
+
 tracerParser :: TextShow a => Parser (Tracer a)
 tracerParser = flag mempty (vlogShowTracer $ const 0) $ mconcat
   [ long "trace-to-vlog"
@@ -8,8 +8,8 @@
 
 {-
 A snapshot backend is a DB in which we store precomputed results
-of some Glass queries. This isn't implemented yet in the open source version
-of Glass
+of some Glass queries. The open source version of Glass can serve them
+from a local directory, see Glean.Glass.SnapshotBackend.Local
 -}
 
 module Glean.Glass.SnapshotBackend
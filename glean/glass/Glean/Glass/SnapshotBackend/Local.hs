@@ -0,0 +1,144 @@
+{-
+  Copyright (c) Meta Platforms, Inc. and affiliates.
+  All rights reserved.
+
+  This source code is licensed under the BSD-style license found in the
+  LICENSE file in the root directory of this source tree.
+-}
+
+{-
+A snapshot backend serving precomputed DocumentSymbolListXResults from a
+local directory. The layout is
+
+  <root>/<repo>/<revision>/<path>.snapshot
+  <root>/<repo>/<revision>.generation    (optional)
+
+where each .snapshot file is a zlib-compressed, Thrift compact-serialized
+DocumentSymbolListXResult and the optional .generation file holds the
+decimal SCM generation of the revision. Snapshot stores are built with
+glean/glass/tools/local_snapshots.py.
+-}
+
+module Glean.Glass.SnapshotBackend.Local
+  ( LocalSnapshotBackend(..)
+  , snapshotFile
+  ) where
+
+import qualified Codec.Compression.Zlib as Zlib
+import Control.Exception (SomeException, evaluate, try)
+import Control.Monad (filterM)
+import qualified Data.ByteString as BS
+import qualified Data.ByteString.Lazy as LBS
+import Data.List (sortOn)
+import Data.Maybe (listToMaybe)
+import Data.Ord (Down(..))
+import qualified Data.Text as Text
+import Data.Time (UTCTime)
+import System.Directory
+  (doesDirectoryExist, doesFileExist, getModificationTime, listDirectory)
+import System.FilePath
+import Text.Read (readMaybe)
+import Thrift.Protocol.Compact (deserializeCompact)
+
+import Glean.Glass.SnapshotBackend
+import Glean.Glass.SourceControl (ScmGeneration(..))
+import Glean.Glass.Types
+  (DocumentSymbolListXResult, Path(..), RepoName(..), Revision(..))
+
+-- | Root directory of the snapshot store
+newtype LocalSnapshotBackend = LocalSnapshotBackend FilePath
+
+instance SnapshotBackend LocalSnapshotBackend where
+  getSnapshot _ (LocalSnapshotBackend root) (RepoName repo) path mrev mgen
+    | Just file <- relativeFile path = do
+      r <- try $ findSnapshot (root </> Text.unpack repo) file mrev mgen
+      return $ case r of
+        Left (_ :: SomeException) -> Left DbError
+        Right Nothing -> Left NotFound
+        Right (Just (rev, f)) -> Right (rev, readSnapshot f)
+    | otherwise = return (Left NotFound)
+
+-- | Location of the snapshot of a file at a revision
+snapshotFile :: FilePath -> RepoName -> Revision -> Path -> Maybe FilePath
+snapshotFile root (RepoName repo) (Revision rev) path =
+  (\file -> root </> Text.unpack repo </> Text.unpack rev </> file)
+    <$> relativeFile path
+
+-- | The file name of a snapshot relative to its revision directory.
+-- Rejects paths that would escape it.
+relativeFile :: Path -> Maybe FilePath
+relativeFile (Path path)
+  | isRelative file && ".." `notElem` splitDirectories file =
+    Just (file <.> "snapshot")
+  | otherwise = Nothing
+  where
+    file = Text.unpack path
+
+-- | Mirrors the lookup rules of the snapshot tier: an exact revision
+-- match first, then the earliest revision at or after the requested
+-- generation, or the latest snapshot if neither was asked for.
+findSnapshot
+  :: FilePath
+  -> FilePath
+  -> Maybe Revision
+  -> Maybe ScmGeneration
+  -> IO (Maybe (Revision, FilePath))
+findSnapshot repoDir file mrev mgen = do
+  exact <- case mrev of
+    Nothing -> return Nothing
+    Just rev@(Revision r) -> do
+      let f = repoDir </> Text.unpack r </> file
+      found <- doesFileExist f
+      return $ if found then Just (rev, f) else Nothing
+  case (exact, mrev, mgen) of
+    (Just match, _, _) -> return (Just match)
+    (Nothing, _, Just gen) -> do
+      candidates <- revisionsWith repoDir file
+      return $ listToMaybe
+        [ (rev, f)
+        | (rev, f, Just gen', _) <- sortOn (\(_, _, g, _) -> g) candidates
+        , gen' >= gen
+        ]
+    (Nothing, Nothing, Nothing) -> do
+      candidates <- revisionsWith repoDir file
+      return $ listToMaybe
+        [ (rev, f)
+        | (rev, f, _, _) <-
+            sortOn (\(_, _, g, t) -> Down (g, t)) candidates
+        ]
+    _ -> return Nothing
+
+-- | All revisions that have a snapshot of the file, with their
+-- generation if known and the time the snapshot was written
+revisionsWith
+  :: FilePath
+  -> FilePath
+  -> IO [(Revision, FilePath, Maybe ScmGeneration, UTCTime)]
+revisionsWith repoDir file = do
+  exists <- doesDirectoryExist repoDir
+  revs <- if exists then listDirectory repoDir else return []
+  dirs <- filterM (doesDirectoryExist . (repoDir </>)) revs
+  withFile <- filterM (doesFileExist . snapshotOf) dirs
+  mapM describe withFile
+  where
+    snapshotOf rev = repoDir </> rev </> file
+    describe rev = do
+      gen <- readGeneration (repoDir </> rev <.> "generation")
+      time <- getModificationTime (snapshotOf rev)
+      return (Revision (Text.pack rev), snapshotOf rev, gen, time)
+
+readGeneration :: FilePath -> IO (Maybe ScmGeneration)
+readGeneration f = do
+  exists <- doesFileExist f
+  if not exists
+    then return Nothing
+    else fmap ScmGeneration . readMaybe <$> readFile f
+
+readSnapshot :: FilePath -> IO (Maybe DocumentSymbolListXResult)
+readSnapshot f = do
+  r <- try $ do
+    compressed <- BS.readFile f
+    evaluate $ LBS.toStrict $ Zlib.decompress $ LBS.fromStrict compressed
+  return $ case r of
+    Left (_ :: SomeException) -> Nothing
+    Right bytes -> either (const Nothing) Just (deserializeCompact bytes)
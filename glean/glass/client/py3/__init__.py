@@ -4,8 +4,24 @@
 # This source code is licensed under the BSD-style license found in the
 # LICENSE file in the root directory of this source tree.
 
+import asyncio
+import time
+from collections import OrderedDict
 from types import TracebackType
-from typing import Optional, Sequence, Type
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Hashable,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Type,
+    TypeVar,
+)
 
 from glean.glass.clients import GlassService
 from glean.glass.thrift_types import (
@@ -30,44 +46,332 @@ from glean.glass.thrift_types import (
     USRSymbolDefinition,
     USRToDefinitionRequest,
 )
-from libfb.py.build_info import BuildInfo
-from libfb.py.pwdutils import get_current_user_name
-from libfb.py.thrift_client_factory import get_client
-
-# See for explanation https://fburl.com/code/57snxyzh
-try:
-    from servicerouter.py3 import ClientParams, get_sr_client
-except ImportError:
-    get_sr_client = None
-    ClientParams = None
-
-
-# Client info for all Glass API calls
-client_info: ClientInfo = ClientInfo(
-    name="api-python3",
-    unixname=get_current_user_name(),
-    application=BuildInfo.get_build_rule(),
-)
+from thrift.python.exceptions import TransportError
+
+# Imported lazily, see _sr_client
+_NOT_LOADED = object()
+_sr_client_api: object = _NOT_LOADED
+
+
+def _sr_client() -> Optional[Tuple[Any, Any]]:
+    """
+    Returns (get_sr_client, ClientParams), or None if servicerouter is
+    unavailable. Deferred until a client is created to keep importing
+    this module cheap.
+    """
+    global _sr_client_api
+    if _sr_client_api is _NOT_LOADED:
+        # See for explanation https://fburl.com/code/57snxyzh
+        try:
+            from servicerouter.py3 import ClientParams, get_sr_client
+
+            _sr_client_api = (get_sr_client, ClientParams)
+        except ImportError:
+            _sr_client_api = None
+    return _sr_client_api
+
+
+_client_info: Optional[ClientInfo] = None
+_default_options: Optional[RequestOptions] = None
+
+
+def _get_client_info() -> ClientInfo:
+    """
+    Client info for all Glass API calls, computed on first use.
+    """
+    global _client_info
+    if _client_info is None:
+        from libfb.py.build_info import BuildInfo
+        from libfb.py.pwdutils import get_current_user_name
+
+        _client_info = ClientInfo(
+            name="api-python3",
+            unixname=get_current_user_name(),
+            application=BuildInfo.get_build_rule(),
+        )
+    return _client_info
+
+
+def __getattr__(name: str) -> object:
+    # client_info used to be a module constant; keep it available
+    if name == "client_info":
+        return _get_client_info()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def _with_client_info(options: Optional[RequestOptions] = None) -> RequestOptions:
     """
     Creates or updates RequestOptions with client_info attached.
+
+    Options that already carry client_info are passed through unchanged,
+    and the options used when none are given are built only once.
     """
+    global _default_options
     if options is None:
-        return RequestOptions(client_info=client_info)
+        if _default_options is None:
+            _default_options = RequestOptions(client_info=_get_client_info())
+        return _default_options
+
+    if options.client_info is not None:
+        return options
+
+    return options(client_info=_get_client_info())
+
+
+T = TypeVar("T")
+
+# Default number of requests a batch call keeps outstanding at once
+DEFAULT_BATCH_CONCURRENCY: int = 32
+
+
+async def _gather_bounded(
+    call: Callable[[str], Awaitable[T]],
+    keys: Iterable[str],
+    concurrency: int,
+) -> List[T]:
+    """
+    Runs call once per distinct key with at most `concurrency` calls
+    outstanding. Results are returned in the order of `keys`, with
+    duplicate keys sharing a single request.
+    """
+    if concurrency < 1:
+        raise ValueError("concurrency must be at least 1")
+
+    keys = list(keys)
+    unique = list(dict.fromkeys(keys))
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(key: str) -> T:
+        async with semaphore:
+            return await call(key)
+
+    results = await asyncio.gather(*(run(key) for key in unique))
+    by_key = dict(zip(unique, results))
+    return [by_key[key] for key in keys]
+
+
+class ResponseCache:
+    """
+    A size-bounded LRU cache of Glass responses, with optional expiry.
+
+    Only requests that pin a revision are cached: without one Glass
+    answers from the latest DB, which changes over time. Entries are
+    keyed by the method, the request and the RequestOptions, so the
+    revision and exact_revision always form part of the key.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: Optional[float] = None) -> None:
+        """
+        Args:
+            max_size: Maximum number of responses to retain.
+            ttl: Optional lifetime of an entry in seconds.
+        """
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            stored, value = entry
+            if self.ttl is None or time.monotonic() - stored < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, value
+            del self._entries[key]
+        self.misses += 1
+        return False, None
+
+    def put(self, key: Hashable, value: Any) -> None:
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+
+def _service_context(
+    tier: str,
+    host: Optional[str],
+    port: Optional[int],
+    params: Optional[object],
+    client_id: Optional[str],
+) -> object:
+    """
+    Creates a GlassService context manager for a tier or a single host.
+    """
+    sr_client = _sr_client()
+    if sr_client is not None:
+        get_sr_client, ClientParams = sr_client
+        if params is None:
+            params = ClientParams()
+
+        if client_id is not None:
+            params.setClientId(client_id)
+
+        if host is not None and port is not None:
+            params.setSingleHost(ipAddr=host, port=port)
+
+        return get_sr_client(
+            GlassService,
+            tier=tier,
+            params=params,
+        )
+
+    from libfb.py.thrift_client_factory import get_client
+
+    if host is not None and port is not None:
+        return get_client(GlassService, host=host, port=port)
+    return get_client(GlassService, tier)
+
+
+# Default number of results per page for the paging calls
+DEFAULT_PAGE_SIZE: int = 1000
+
+
+async def _pages(
+    fetch: Callable[[RequestOptions], Awaitable[T]],
+    size: Callable[[T], int],
+    page_size: int,
+    options: Optional[RequestOptions],
+) -> AsyncIterator[T]:
+    """
+    Fetches successive pages using RequestOptions.limit and offset,
+    stopping at the first empty page. A page may be short before the
+    end of the results, so a short page doesn't end the iteration.
+    """
+    if page_size < 1:
+        raise ValueError("page_size must be at least 1")
+
+    base = options if options is not None else RequestOptions()
+    offset = 0
+    while True:
+        page = await fetch(base(limit=page_size, offset=offset))
+        n = size(page)
+        if n == 0:
+            return
+        yield page
+        offset += n
+
+
+# Connection selection policies for pooled clients
+ROUND_ROBIN = "round_robin"
+LEAST_OUTSTANDING = "least_outstanding"
 
-    return RequestOptions(
-        revision=options.revision,
-        limit=options.limit,
-        feature_flags=options.feature_flags,
-        strict=options.strict,
-        exact_revision=options.exact_revision,
-        matching_revision=options.matching_revision,
-        content_check=options.content_check,
-        attribute_opts=options.attribute_opts,
-        client_info=client_info,
-    )
+
+class _Channel:
+    def __init__(self, host: Tuple[str, int], context: object) -> None:
+        self.host = host
+        self.context = context
+        self.service: object = None
+        self.outstanding = 0
+
+
+class _HostHealth:
+    def __init__(self) -> None:
+        self.failures = 0
+        self.ejected_until = 0.0
+
+
+class _ServicePool:
+    """
+    A set of persistent GlassService connections used in place of a
+    single service. Each request goes to one connection chosen by the
+    balancing policy; hosts that keep failing with transport errors are
+    ejected for a while. If every host is ejected, requests are spread
+    over all of them rather than failing outright.
+    """
+
+    def __init__(
+        self,
+        channels: Sequence[Tuple[Tuple[str, int], object]],
+        balancing: str,
+        max_failures: int,
+        ejection_period: float,
+    ) -> None:
+        if not channels:
+            raise ValueError("A pooled client needs at least one connection.")
+        if balancing not in (ROUND_ROBIN, LEAST_OUTSTANDING):
+            raise ValueError(f"Unknown balancing policy: {balancing}")
+        self._channels = [_Channel(host, context) for host, context in channels]
+        self._health = {channel.host: _HostHealth() for channel in self._channels}
+        self._balancing = balancing
+        self._max_failures = max_failures
+        self._ejection_period = ejection_period
+        self._next = 0
+
+    async def __aenter__(self) -> "_ServicePool":
+        entered: List[_Channel] = []
+        try:
+            for channel in self._channels:
+                channel.service = await channel.context.__aenter__()
+                entered.append(channel)
+        except BaseException as e:
+            for channel in reversed(entered):
+                await channel.context.__aexit__(type(e), e, e.__traceback__)
+            raise
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc: Optional[BaseException],
+        tb: Optional[TracebackType],
+    ) -> None:
+        for channel in reversed(self._channels):
+            await channel.context.__aexit__(exc_type, exc, tb)
+
+    def __getattr__(self, method: str) -> Callable[..., Awaitable[Any]]:
+        if method.startswith("_"):
+            raise AttributeError(method)
+        return lambda *args: self._call(method, args)
+
+    def ejected_hosts(self) -> List[Tuple[str, int]]:
+        now = time.monotonic()
+        return [
+            host for host, health in self._health.items() if health.ejected_until > now
+        ]
+
+    def _select(self) -> _Channel:
+        now = time.monotonic()
+        candidates = [
+            channel
+            for channel in self._channels
+            if self._health[channel.host].ejected_until <= now
+        ] or self._channels
+        start = self._next % len(candidates)
+        self._next += 1
+        if self._balancing == LEAST_OUTSTANDING:
+            # rotate the starting point so that ties are spread evenly
+            rotated = candidates[start:] + candidates[:start]
+            return min(rotated, key=lambda channel: channel.outstanding)
+        return candidates[start]
+
+    async def _call(self, method: str, args: Tuple[Any, ...]) -> Any:
+        channel = self._select()
+        health = self._health[channel.host]
+        channel.outstanding += 1
+        try:
+            result = await getattr(channel.service, method)(*args)
+        except TransportError:
+            health.failures += 1
+            if health.failures >= self._max_failures:
+                health.failures = 0
+                health.ejected_until = time.monotonic() + self._ejection_period
+            raise
+        finally:
+            channel.outstanding -= 1
+        health.failures = 0
+        return result
 
 
 class GlassClient:
@@ -85,17 +389,50 @@ class GlassClient:
                 result = await client.searchSymbol(request)
                 symbol = await client.describeSymbol(symbol_id)
 
+    Batch variants (describe_many, symbol_location_many,
+    find_reference_ranges_many) issue many requests concurrently:
+
+                descriptions = await client.describe_many(symbol_ids)
+
+    Large result sets can be consumed a page at a time:
+
+                async for ranges in client.reference_range_pages(symbol_id):
+                    ...
+
     """
 
-    def __init__(self, service: object) -> None:
+    def __init__(
+        self, service: object, cache: Optional[ResponseCache] = None
+    ) -> None:
         """
         Initialize the GlassClient.
 
         Args:
             service: GlassService context manager from get_client/get_sr_client.
+            cache: Optional ResponseCache for documentSymbolListX and
+                describeSymbol results of revision-pinned requests.
         """
         self._service_context = service
         self._service: object = None
+        self.cache = cache
+
+    async def _cached(
+        self,
+        method: str,
+        request: Hashable,
+        options: Optional[RequestOptions],
+        call: Callable[[], Awaitable[T]],
+    ) -> T:
+        cache = self.cache
+        if cache is None or options is None or options.revision is None:
+            return await call()
+        key = (method, request, options)
+        found, value = cache.get(key)
+        if found:
+            return value
+        value = await call()
+        cache.put(key, value)
+        return value
 
     @staticmethod
     async def new(
@@ -104,6 +441,12 @@ class GlassClient:
         port: Optional[int] = None,
         params: Optional[object] = None,
         client_id: Optional[str] = None,
+        cache: Optional[ResponseCache] = None,
+        hosts: Optional[Sequence[Tuple[str, int]]] = None,
+        channels_per_host: int = 1,
+        balancing: str = ROUND_ROBIN,
+        max_failures: int = 3,
+        ejection_period: float = 30.0,
     ) -> "GlassClient":
         """
         Create a new GlassClient connected to the specified tier.
@@ -120,6 +463,18 @@ class GlassClient:
                 If provided, takes precedence over host/port.
             client_id: Optional ServiceRouter client ID. If provided, sets the
                 client ID on the ServiceRouter params.
+            cache: Optional ResponseCache shared by the client's
+                revision-pinned documentSymbolListX/describeSymbol calls.
+            hosts: Optional list of (host, port) pairs to spread requests
+                over. Cannot be combined with host/port or params.
+            channels_per_host: Number of persistent connections opened to
+                each of the hosts.
+            balancing: How to pick a connection for each request, either
+                ROUND_ROBIN or LEAST_OUTSTANDING.
+            max_failures: Consecutive transport errors after which a host
+                is ejected from the pool.
+            ejection_period: Seconds an ejected host is left out of the
+                rotation before it is tried again.
 
         Returns:
             A GlassClient that can be used as an async context manager.
@@ -132,6 +487,20 @@ class GlassClient:
             async with await GlassClient.new(host="127.0.0.1", port=8080) as client:
                 result = await client.searchSymbol(request)
 
+            # Pooled connections to several local servers:
+            async with await GlassClient.new(
+                hosts=[("127.0.0.1", 8080), ("127.0.0.1", 8081)],
+                channels_per_host=4,
+                balancing=LEAST_OUTSTANDING,
+            ) as client:
+                result = await client.searchSymbol(request)
+
+            # Caching revision-pinned responses:
+            cache = ResponseCache(max_size=50000, ttl=3600)
+            async with await GlassClient.new(cache=cache) as client:
+                ...
+                print(cache.hits, cache.misses)
+
             # With custom params:
             from servicerouter.py3 import ClientParams
             params = ClientParams().setSingleHost(ipAddr="127.0.0.1", port=8080)
@@ -148,25 +517,25 @@ class GlassClient:
                 "Cannot specify both params and host/port. Use one or the other."
             )
 
-        if get_sr_client is not None:
-            if params is None:
-                params = ClientParams()
-
-            if client_id is not None:
-                params.setClientId(client_id)
-
-            if host is not None and port is not None:
-                params.setSingleHost(ipAddr=host, port=port)
-
-            service_context = get_sr_client(
-                GlassService,
-                tier=tier,
-                params=params,
+        if hosts is not None:
+            if host is not None or params is not None:
+                raise ValueError(
+                    "Cannot specify hosts together with host/port or params."
+                )
+            service_context = _ServicePool(
+                [
+                    (host_port, _service_context(tier, *host_port, None, client_id))
+                    for host_port in hosts
+                    for _ in range(channels_per_host)
+                ],
+                balancing=balancing,
+                max_failures=max_failures,
+                ejection_period=ejection_period,
             )
         else:
-            service_context = get_client(GlassService, tier)
+            service_context = _service_context(tier, host, port, params, client_id)
 
-        return GlassClient(service_context)
+        return GlassClient(service_context, cache)
 
     async def __aenter__(self) -> "GlassClient":
         self._service = await self._service_context.__aenter__()
@@ -186,8 +555,13 @@ class GlassClient:
         options: Optional[RequestOptions] = None,
     ) -> DocumentSymbolListXResult:
         """Get document symbols with extended information."""
-        return await self._service.documentSymbolListX(
-            request, _with_client_info(options)
+        return await self._cached(
+            "documentSymbolListX",
+            request,
+            options,
+            lambda: self._service.documentSymbolListX(
+                request, _with_client_info(options)
+            ),
         )
 
     async def documentSymbolIndex(
@@ -216,7 +590,12 @@ class GlassClient:
         options: Optional[RequestOptions] = None,
     ) -> SymbolDescription:
         """Describe a symbol."""
-        return await self._service.describeSymbol(symbol, _with_client_info(options))
+        return await self._cached(
+            "describeSymbol",
+            symbol,
+            options,
+            lambda: self._service.describeSymbol(symbol, _with_client_info(options)),
+        )
 
     async def symbolLocation(
         self,
@@ -291,3 +670,72 @@ class GlassClient:
     ) -> USRSymbolDefinition:
         """Get USR to definition."""
         return await self._service.usrToDefinition(request, _with_client_info(options))
+
+    async def describe_many(
+        self,
+        symbols: Iterable[str],
+        options: Optional[RequestOptions] = None,
+        concurrency: int = DEFAULT_BATCH_CONCURRENCY,
+    ) -> List[SymbolDescription]:
+        """Describe many symbols, returning results in input order."""
+        return await _gather_bounded(
+            lambda symbol: self.describeSymbol(symbol, options),
+            symbols,
+            concurrency,
+        )
+
+    async def symbol_location_many(
+        self,
+        symbols: Iterable[str],
+        options: Optional[RequestOptions] = None,
+        concurrency: int = DEFAULT_BATCH_CONCURRENCY,
+    ) -> List[SymbolLocation]:
+        """Get the locations of many symbols, in input order."""
+        return await _gather_bounded(
+            lambda symbol: self.symbolLocation(symbol, options),
+            symbols,
+            concurrency,
+        )
+
+    async def find_reference_ranges_many(
+        self,
+        symbols: Iterable[str],
+        options: Optional[RequestOptions] = None,
+        concurrency: int = DEFAULT_BATCH_CONCURRENCY,
+    ) -> List[Sequence[LocationRange]]:
+        """Find reference ranges for many symbols, in input order."""
+        return await _gather_bounded(
+            lambda symbol: self.findReferenceRanges(symbol, options),
+            symbols,
+            concurrency,
+        )
+
+    async def reference_range_pages(
+        self,
+        symbol: str,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        options: Optional[RequestOptions] = None,
+    ) -> AsyncIterator[Sequence[LocationRange]]:
+        """Find reference ranges for a symbol, one page at a time."""
+        async for page in _pages(
+            lambda opts: self.findReferenceRanges(symbol, opts),
+            len,
+            page_size,
+            options,
+        ):
+            yield page
+
+    async def search_symbol_pages(
+        self,
+        request: SymbolSearchRequest,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        options: Optional[RequestOptions] = None,
+    ) -> AsyncIterator[SymbolSearchResult]:
+        """Search for symbols, one page of results at a time."""
+        async for page in _pages(
+            lambda opts: self.searchSymbol(request, opts),
+            lambda result: len(result.symbols),
+            page_size,
+            options,
+        ):
+            yield page
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+
+"""
+Unit tests for the batching, caching, pooling and paging helpers of the
+py3 GlassClient. No Glass server is needed: the services are fakes.
+"""
+
+import asyncio
+import unittest
+from typing import Any, Dict, List, Optional, Tuple
+from unittest import mock
+
+from glean.glass.client.py3 import (
+    _gather_bounded,
+    _pages,
+    _ServicePool,
+    GlassClient,
+    LEAST_OUTSTANDING,
+    ResponseCache,
+    ROUND_ROBIN,
+)
+from glean.glass.thrift_types import ClientInfo, RequestOptions
+from thrift.python.exceptions import TransportError, TransportErrorType
+
+
+def transport_error() -> TransportError:
+    return TransportError(TransportErrorType.UNKNOWN, "host down", 0, 0)
+
+
+class GatherBoundedTest(unittest.IsolatedAsyncioTestCase):
+    async def test_results_in_order_with_duplicates_shared(self) -> None:
+        calls: List[str] = []
+
+        async def call(key: str) -> str:
+            calls.append(key)
+            await asyncio.sleep(0)
+            return key.upper()
+
+        results = await _gather_bounded(call, ["b", "a", "b", "c", "a"], 2)
+        self.assertEqual(results, ["B", "A", "B", "C", "A"])
+        self.assertEqual(sorted(calls), ["a", "b", "c"])
+
+    async def test_concurrency_is_bounded(self) -> None:
+        outstanding = 0
+        most = 0
+
+        async def call(key: str) -> str:
+            nonlocal outstanding, most
+            outstanding += 1
+            most = max(most, outstanding)
+            await asyncio.sleep(0.001)
+            outstanding -= 1
+            return key
+
+        keys = [str(i) for i in range(20)]
+        self.assertEqual(await _gather_bounded(call, keys, 3), keys)
+        self.assertEqual(most, 3)
+
+    async def test_rejects_zero_concurrency(self) -> None:
+        async def call(key: str) -> str:
+            return key
+
+        with self.assertRaises(ValueError):
+            await _gather_bounded(call, ["a"], 0)
+
+
+class ResponseCacheTest(unittest.TestCase):
+    def test_evicts_least_recently_used(self) -> None:
+        cache = ResponseCache(max_size=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        self.assertEqual(cache.get("a"), (True, 1))
+        cache.put("c", 3)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get("b"), (False, None))
+        self.assertEqual(cache.get("a"), (True, 1))
+        self.assertEqual(cache.get("c"), (True, 3))
+        self.assertEqual((cache.hits, cache.misses), (3, 1))
+
+    def test_entries_expire(self) -> None:
+        now = [100.0]
+        with mock.patch("time.monotonic", lambda: now[0]):
+            cache = ResponseCache(max_size=10, ttl=5)
+            cache.put("a", 1)
+            now[0] += 4
+            self.assertEqual(cache.get("a"), (True, 1))
+            now[0] += 2
+            self.assertEqual(cache.get("a"), (False, None))
+            self.assertEqual(len(cache), 0)
+
+    def test_rejects_empty_cache(self) -> None:
+        with self.assertRaises(ValueError):
+            ResponseCache(max_size=0)
+
+
+class FakeService:
+    def __init__(self) -> None:
+        self.calls: List[str] = []
+        self.failing = False
+
+    async def describeSymbol(self, symbol: str, options: Any) -> str:
+        self.calls.append(symbol)
+        if self.failing:
+            raise transport_error()
+        return symbol
+
+
+class FakeContext:
+    def __init__(self, service: FakeService) -> None:
+        self.service = service
+        self.exited = False
+
+    async def __aenter__(self) -> FakeService:
+        return self.service
+
+    async def __aexit__(self, *args: Any) -> None:
+        self.exited = True
+
+
+class ServicePoolTest(unittest.IsolatedAsyncioTestCase):
+    def pool(
+        self, hosts: int, balancing: str = ROUND_ROBIN
+    ) -> Tuple[_ServicePool, List[FakeService]]:
+        services = [FakeService() for _ in range(hosts)]
+        pool = _ServicePool(
+            [
+                (("host", port), FakeContext(service))
+                for port, service in enumerate(services)
+            ],
+            balancing=balancing,
+            max_failures=2,
+            ejection_period=30.0,
+        )
+        return pool, services
+
+    async def test_round_robin(self) -> None:
+        pool, services = self.pool(3)
+        async with pool:
+            for i in range(6):
+                await pool.describeSymbol(str(i), None)
+        self.assertEqual(
+            [s.calls for s in services], [["0", "3"], ["1", "4"], ["2", "5"]]
+        )
+
+    async def test_least_outstanding(self) -> None:
+        pool, services = self.pool(2, LEAST_OUTSTANDING)
+        gate = asyncio.Event()
+
+        async def slow(symbol: str, options: Any) -> str:
+            services[0].calls.append(symbol)
+            await gate.wait()
+            return symbol
+
+        services[0].describeSymbol = slow
+        async with pool:
+            first = asyncio.ensure_future(pool.describeSymbol("slow", None))
+            await asyncio.sleep(0)
+            # the first host is busy, so the others go to the second
+            for i in range(3):
+                await pool.describeSymbol(str(i), None)
+            gate.set()
+            await first
+        self.assertEqual(services[0].calls, ["slow"])
+        self.assertEqual(services[1].calls, ["0", "1", "2"])
+
+    async def test_failing_host_is_ejected(self) -> None:
+        now = [0.0]
+        with mock.patch("time.monotonic", lambda: now[0]):
+            pool, services = self.pool(2)
+            services[0].failing = True
+            async with pool:
+                for _ in range(4):
+                    try:
+                        await pool.describeSymbol("x", None)
+                    except TransportError:
+                        pass
+                self.assertEqual(pool.ejected_hosts(), [("host", 0)])
+                services[1].calls.clear()
+                for i in range(3):
+                    await pool.describeSymbol(str(i), None)
+                self.assertEqual(services[1].calls, ["0", "1", "2"])
+                # the host is tried again once the ejection period is over
+                now[0] += 31
+                self.assertEqual(pool.ejected_hosts(), [])
+                services[0].failing = False
+                failed = len(services[0].calls)
+                await pool.describeSymbol("a", None)
+                await pool.describeSymbol("b", None)
+                self.assertEqual(len(services[0].calls), failed + 1)
+
+    async def test_all_hosts_ejected(self) -> None:
+        pool, services = self.pool(2)
+        for service in services:
+            service.failing = True
+        async with pool:
+            for _ in range(4):
+                with self.assertRaises(TransportError):
+                    await pool.describeSymbol("x", None)
+            self.assertEqual(len(pool.ejected_hosts()), 2)
+            # requests are still spread over the hosts
+            services[0].failing = services[1].failing = False
+            await pool.describeSymbol("a", None)
+            await pool.describeSymbol("b", None)
+        self.assertEqual([s.calls[-1] for s in services], ["a", "b"])
+
+    async def test_contexts_are_exited(self) -> None:
+        services = [FakeService() for _ in range(2)]
+        contexts = [FakeContext(service) for service in services]
+        pool = _ServicePool(
+            [(("host", i), c) for i, c in enumerate(contexts)],
+            ROUND_ROBIN,
+            2,
+            30.0,
+        )
+        async with pool:
+            pass
+        self.assertTrue(all(c.exited for c in contexts))
+
+
+class PagesTest(unittest.IsolatedAsyncioTestCase):
+    async def collect(
+        self, results: List[int], page_size: int
+    ) -> Tuple[List[List[int]], List[Tuple[Optional[int], Optional[int]]]]:
+        requests: List[Tuple[Optional[int], Optional[int]]] = []
+
+        async def fetch(options: RequestOptions) -> List[int]:
+            requests.append((options.offset, options.limit))
+            start = options.offset
+            # the server may return fewer results than asked for
+            return results[start : start + min(options.limit, 2)]
+
+        pages = [page async for page in _pages(fetch, len, page_size, None)]
+        return pages, requests
+
+    async def test_stops_at_empty_page(self) -> None:
+        pages, requests = await self.collect(list(range(5)), 3)
+        self.assertEqual(pages, [[0, 1], [2, 3], [4]])
+        self.assertEqual(requests, [(0, 3), (2, 3), (4, 3), (5, 3)])
+
+    async def test_no_results(self) -> None:
+        pages, requests = await self.collect([], 3)
+        self.assertEqual(pages, [])
+        self.assertEqual(requests, [(0, 3)])
+
+    async def test_keeps_options(self) -> None:
+        seen: List[RequestOptions] = []
+
+        async def fetch(options: RequestOptions) -> List[int]:
+            seen.append(options)
+            return []
+
+        options = RequestOptions(revision="abc")
+        async for _ in _pages(fetch, len, 10, options):
+            pass
+        self.assertEqual(seen[0].revision, "abc")
+
+    async def test_rejects_empty_pages(self) -> None:
+        async def fetch(options: RequestOptions) -> List[int]:
+            return []
+
+        with self.assertRaises(ValueError):
+            async for _ in _pages(fetch, len, 0, None):
+                pass
+
+
+class CachedClientTest(unittest.IsolatedAsyncioTestCase):
+    async def test_caches_revision_pinned_requests(self) -> None:
+        service = FakeService()
+        cache = ResponseCache()
+        client = GlassClient(FakeContext(service), cache)
+        info = ClientInfo(name="test")
+        pinned = RequestOptions(revision="abc", client_info=info)
+        latest = RequestOptions(client_info=info)
+        results: Dict[str, Any] = {}
+        async with client:
+            for _ in range(2):
+                results["pinned"] = await client.describeSymbol("s", pinned)
+                results["latest"] = await client.describeSymbol("s", latest)
+        self.assertEqual(results, {"pinned": "s", "latest": "s"})
+        self.assertEqual(len(service.calls), 3)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -187,6 +187,13 @@ struct RequestOptions {
 
   // Information about who is making the call
   9: optional ClientInfo client_info;
+
+  // skip this many results. Used with limit to page through the results
+  // of findReferenceRanges and searchSymbol. Pages are stable for a given
+  // revision, except for searches with sortResults set. Each page is
+  // computed by fetching all the results up to its end, so deep paging
+  // is expensive: walking n pages costs O(n^2).
+  10: optional i32 offset;
 }
 
 struct FeatureFlags {
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+Pre-generate Glass snapshots for the files of a Glean DB.
+
+Calls documentSymbolListX for every file, with a bounded number of
+requests outstanding, and writes the results to a local snapshot store
+(see local_snapshots.py) for glass-server --snapshot-dir to serve.
+
+The files are read from a list with one repository path per line,
+optionally followed by a tab and the SHA-1 of the file contents. With
+--checkout the digests of the files listed without one are computed
+from a checkout of the revision. Only these digests are recorded:
+files without one are always computed, never reused.
+
+Snapshots are requested for exactly the given revision, so a result
+for a nearby revision is never stored under it.
+
+Progress is appended to <root>/<repo>/<revision>.state as JSON lines
+{"path": ..., "digest": ...}, so an interrupted run picks up where it
+stopped. With --base-revision, files whose digest matches the one
+recorded for the base revision reuse its snapshot instead of being
+computed again.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import sys
+from typing import Dict, Iterable, Iterator, Optional, TextIO, Tuple
+
+from glean.glass.client.py3 import DEFAULT_BATCH_CONCURRENCY, GlassClient
+from glean.glass.thrift_types import DocumentSymbolsRequest, RequestOptions
+from glean.glass.tools.local_snapshots import LocalSnapshotStore
+from thrift.python.serializer import Protocol, serialize
+
+
+def state_path(store: LocalSnapshotStore, repo: str, revision: str) -> str:
+    return store.revision_dir(repo, revision) + ".state"
+
+
+def read_state(path: str) -> Dict[str, str]:
+    """
+    The digest of every file recorded in a state file. A line cut short
+    by a crash is ignored.
+    """
+    state = {}
+    try:
+        with open(path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                state[entry["path"]] = entry["digest"]
+    except FileNotFoundError:
+        pass
+    return state
+
+
+def read_files(f: TextIO) -> Iterator[Tuple[str, Optional[str]]]:
+    """
+    (path, digest) for every line of a file list, with None for the
+    files listed without a digest.
+    """
+    for line in f:
+        line = line.rstrip("\n")
+        if not line:
+            continue
+        path, _, digest = line.partition("\t")
+        yield path, digest or None
+
+
+def file_digest(file: str) -> Optional[str]:
+    h = hashlib.sha1()
+    try:
+        with open(file, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+    except OSError:
+        return None
+    return h.hexdigest()
+
+
+async def generate(
+    client: GlassClient,
+    store: LocalSnapshotStore,
+    repo: str,
+    revision: str,
+    files: Iterable[Tuple[str, Optional[str]]],
+    concurrency: int = DEFAULT_BATCH_CONCURRENCY,
+    base_revision: Optional[str] = None,
+    level: int = 6,
+    checkout: Optional[str] = None,
+) -> Tuple[int, int, int]:
+    """
+    Generates the snapshots of files at revision. Returns the number of
+    snapshots computed, reused from base_revision, and skipped because
+    an earlier run already wrote them. Files listed without a digest are
+    hashed from checkout, if given. Fails if Glass can't answer for
+    exactly this revision.
+    """
+    if concurrency < 1:
+        raise ValueError("concurrency must be at least 1")
+
+    state_file = state_path(store, repo, revision)
+    done = read_state(state_file)
+    base = {}
+    if base_revision is not None:
+        base = read_state(state_path(store, repo, base_revision))
+    options = RequestOptions(revision=revision, exact_revision=True)
+    computed = reused = skipped = 0
+    os.makedirs(os.path.dirname(state_file), exist_ok=True)
+
+    with open(state_file, "a") as state:
+
+        def record(path: str, digest: Optional[str]) -> None:
+            state.write(json.dumps({"path": path, "digest": digest or ""}) + "\n")
+            state.flush()
+
+        async def worker(it: Iterator[Tuple[str, Optional[str]]]) -> None:
+            nonlocal computed, reused, skipped
+            # the workers share one iterator, so each file is taken once
+            for path, digest in it:
+                if path in done:
+                    skipped += 1
+                    continue
+                if digest is None and checkout is not None:
+                    # hashing reads the whole file, so keep it off the
+                    # event loop
+                    digest = await asyncio.to_thread(
+                        file_digest, os.path.join(checkout, path)
+                    )
+                if (
+                    digest is not None
+                    and base_revision is not None
+                    and base.get(path) == digest
+                    and await asyncio.to_thread(
+                        store.reuse, repo, revision, base_revision, path
+                    )
+                ):
+                    record(path, digest)
+                    reused += 1
+                    continue
+                result = await client.documentSymbolListX(
+                    DocumentSymbolsRequest(repository=repo, filepath=path),
+                    options,
+                )
+                if result.revision != revision:
+                    raise RuntimeError(
+                        f"{path}: got revision {result.revision}, "
+                        f"not {revision}"
+                    )
+                data = serialize(result, Protocol.COMPACT)
+                await asyncio.to_thread(store.put, repo, revision, path, data, level)
+                record(path, digest)
+                computed += 1
+
+        it = iter(files)
+        await asyncio.gather(*(worker(it) for _ in range(concurrency)))
+
+    return computed, reused, skipped
+
+
+async def run(args: argparse.Namespace) -> None:
+    store = LocalSnapshotStore(args.root)
+    if args.files == "-":
+        f = sys.stdin
+    else:
+        f = open(args.files)
+    try:
+        async with await GlassClient.new(
+            tier=args.tier, host=args.host, port=args.port
+        ) as client:
+            computed, reused, skipped = await generate(
+                client,
+                store,
+                args.repo,
+                args.revision,
+                read_files(f),
+                args.jobs,
+                args.base_revision,
+                args.level,
+                args.checkout,
+            )
+    finally:
+        if f is not sys.stdin:
+            f.close()
+    if args.generation is not None:
+        store.set_generation(args.repo, args.revision, args.generation)
+
+    print(f"computed {computed} snapshots, reused {reused}, {skipped} already done")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate Glass snapshots")
+    parser.add_argument("--root", required=True, help="the snapshot store directory")
+    parser.add_argument("--repo", required=True, help="the repository name")
+    parser.add_argument("--revision", required=True, help="the revision")
+    parser.add_argument(
+        "--generation", type=int, help="the SCM generation of the revision"
+    )
+    parser.add_argument(
+        "--files",
+        required=True,
+        help='file listing "path[<TAB>sha1]" per line ("-" for stdin)',
+    )
+    parser.add_argument(
+        "--checkout", help="checkout of the revision to compute digests from"
+    )
+    parser.add_argument(
+        "--base-revision",
+        help="reuse the snapshots of this revision for unchanged files",
+    )
+    parser.add_argument("--tier", default="glean.glass", help="the Glass tier")
+    parser.add_argument("--host", help="Glass host (bypasses service router)")
+    parser.add_argument("--port", type=int, help="Glass port (requires --host)")
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=DEFAULT_BATCH_CONCURRENCY,
+        help="requests outstanding at once",
+    )
+    parser.add_argument(
+        "--level", type=int, default=6, help="zlib compression level (1-9)"
+    )
+    args = parser.parse_args()
+
+    if args.port is not None and args.host is None:
+        parser.error("--port requires --host")
+
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
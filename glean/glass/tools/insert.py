@@ -6,40 +6,159 @@
 # LICENSE file in the root directory of this source tree.
 
 import argparse
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from itertools import islice
+from typing import Iterable, Iterator, List, Set, Tuple
 
+from glean.glass.tools.local_snapshots import from_dir, from_manifest
 from libfb.py import db_locator
 
+# MEDIUMBLOB
+MAX_SNAPSHOT_SIZE = 16 * 1024 * 1024 - 1
+
+add_snapshot = (
+    "INSERT INTO snapshot (repo, revision, file, snapshot) VALUES (%s, %s, %s, %s)"
+)
+
+
+def batches(
+    snapshots: Iterable[Tuple[str, str]], size: int
+) -> Iterator[List[Tuple[str, str]]]:
+    it = iter(snapshots)
+    while batch := list(islice(it, size)):
+        yield batch
+
+
+def insert_bulk(
+    locator: db_locator.Locator,
+    repo: str,
+    revision: str,
+    snapshots: Iterable[Tuple[str, str]],
+    batch_size: int,
+    jobs: int,
+) -> Tuple[int, List[str]]:
+    """
+    Inserts snapshots with one executemany per batch, reading them on a
+    pool of workers that each hold a connection.
+    Returns the number of rows inserted and the files that were too big.
+    """
+    local = threading.local()
+    lock = threading.Lock()
+    connections = []
+    too_big = []
+
+    def connection():
+        if not hasattr(local, "conn"):
+            local.conn = locator.create_connection()
+            with lock:
+                connections.append(local.conn)
+        return local.conn
+
+    def insert_batch(batch: List[Tuple[str, str]]) -> int:
+        rows = []
+        for path, file in batch:
+            with open(file, "rb") as f:
+                snapshot = f.read()
+            if len(snapshot) > MAX_SNAPSHOT_SIZE:
+                with lock:
+                    too_big.append(file)
+                continue
+            rows.append((repo, revision, path, snapshot))
+        if not rows:
+            return 0
+        conn = connection()
+        cursor = conn.cursor()
+        try:
+            cursor.executemany(add_snapshot, rows)
+            conn.commit()
+        finally:
+            cursor.close()
+        return len(rows)
+
+    inserted = 0
+    try:
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            # submit batches as workers become free, rather than all of
+            # them at once as pool.map would, to bound the batches queued
+            pending: Set[Future[int]] = set()
+            for batch in batches(snapshots, batch_size):
+                if len(pending) >= 2 * jobs:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    inserted += sum(f.result() for f in done)
+                pending.add(pool.submit(insert_batch, batch))
+            inserted += sum(f.result() for f in wait(pending).done)
+    finally:
+        for conn in connections:
+            conn.close()
+    return inserted, too_big
+
 
 def main():
     parser = argparse.ArgumentParser(description="Insert snapshot into database")
     parser.add_argument("--tier", required=True, help="the xdb tier")
     parser.add_argument("--repo", required=True, help="the repository name")
     parser.add_argument("--revision", required=True, help="the revision number")
-    parser.add_argument("--file", required=True, help="the filename")
+    parser.add_argument("--file", help="the filename")
     parser.add_argument("--snapshot", help="snapshot data (for testing)")
     parser.add_argument("--snapshot-file", help="the snapshot data file path")
+    parser.add_argument(
+        "--from-dir",
+        help="bulk mode: directory mirroring the repository with one snapshot "
+        "per file",
+    )
+    parser.add_argument(
+        "--manifest",
+        help='bulk mode: JSON lines of {"path": ..., "file": ...} to insert',
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=100, help="rows per bulk transaction"
+    )
+    parser.add_argument("--jobs", type=int, default=8, help="bulk insert workers")
     args = parser.parse_args()
 
     locator = db_locator.Locator(tier_name=args.tier, role="scriptrw")
     locator.do_not_send_autocommit_query()
-    conn = locator.create_connection()
-    cursor = conn.cursor()
+
+    if args.from_dir and args.manifest:
+        parser.error("You cannot specify both --from-dir and --manifest")
+
+    if args.from_dir or args.manifest:
+        if args.file or args.snapshot or args.snapshot_file:
+            parser.error("Bulk mode does not take --file or --snapshot(-file)")
+        if args.from_dir:
+            snapshots = from_dir(args.from_dir)
+        else:
+            snapshots = from_manifest(args.manifest)
+        inserted, too_big = insert_bulk(
+            locator,
+            args.repo,
+            args.revision,
+            snapshots,
+            args.batch_size,
+            args.jobs,
+        )
+        print(f"inserted {inserted} snapshots")
+        for file in too_big:
+            print(f"skipped {file}: larger than {MAX_SNAPSHOT_SIZE} bytes")
+        return
+
+    if not args.file:
+        parser.error("You must specify --file, or --from-dir/--manifest")
 
     if args.snapshot and args.snapshot_file:
         parser.error("You cannot specify both --snapshot and --snapshot-file")
 
     if args.snapshot:
-        snapshot = args.snapshot
+        snapshot = args.snapshot.encode()
     elif args.snapshot_file:
         with open(args.snapshot_file, "rb") as f:
             snapshot = f.read()
     else:
         parser.error("You must specify either --snapshot or --snapshot-file")
 
-    add_snapshot = (
-        "INSERT INTO snapshot (repo, revision, file, snapshot) VALUES (%s, %s, %s, %s)"
-    )
-
+    conn = locator.create_connection()
+    cursor = conn.cursor()
     cursor.execute(add_snapshot, (args.repo, args.revision, args.file, snapshot))
     print(cursor.fetchall())
 
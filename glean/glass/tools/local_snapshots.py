@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+Build a local snapshot store for Glass (glass-server --snapshot-dir).
+
+A store is a directory laid out as
+
+  <root>/<repo>/<revision>/<path>.snapshot
+  <root>/<repo>/<revision>.generation    (optional)
+
+where each .snapshot file is a zlib-compressed DocumentSymbolListXResult
+serialized with the Thrift compact protocol, and the .generation file
+holds the SCM generation of the revision, used to answer requests for
+revisions that have no snapshot of their own.
+
+Snapshots are loaded from a directory that mirrors the repository (one
+serialized result per source file) or from a manifest of JSON lines
+{"path": <repo path>, "file": <serialized result>}.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator, Optional, Tuple
+
+SUFFIX = ".snapshot"
+
+
+class LocalSnapshotStore:
+    def __init__(self, root: str) -> None:
+        self.root = root
+
+    def revision_dir(self, repo: str, revision: str) -> str:
+        return os.path.join(self.root, repo, revision)
+
+    def snapshot_path(self, repo: str, revision: str, path: str) -> str:
+        parts = path.split("/")
+        if os.path.isabs(path) or ".." in parts:
+            raise ValueError(f"invalid repository path: {path}")
+        return os.path.join(self.revision_dir(repo, revision), *parts) + SUFFIX
+
+    def put(
+        self, repo: str, revision: str, path: str, snapshot: bytes, level: int = 6
+    ) -> int:
+        """
+        Stores a serialized snapshot, returning its compressed size.
+        """
+        target = self.snapshot_path(repo, revision, path)
+        data = zlib.compress(snapshot, level)
+        _write_atomically(target, data)
+        return len(data)
+
+    def get(self, repo: str, revision: str, path: str) -> Optional[bytes]:
+        try:
+            with open(self.snapshot_path(repo, revision, path), "rb") as f:
+                return zlib.decompress(f.read())
+        except FileNotFoundError:
+            return None
+
+    def reuse(self, repo: str, revision: str, base: str, path: str) -> bool:
+        """
+        Makes the snapshot of path at revision base also the snapshot at
+        revision, for files that did not change between the two. Returns
+        False if base has no snapshot of path.
+        """
+        source = self.snapshot_path(repo, base, path)
+        target = self.snapshot_path(repo, revision, path)
+        if not os.path.exists(source):
+            return False
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp = target + ".tmp"
+        try:
+            os.link(source, tmp)
+        except OSError:
+            shutil.copyfile(source, tmp)
+        os.replace(tmp, target)
+        return True
+
+    def set_generation(self, repo: str, revision: str, generation: int) -> None:
+        _write_atomically(
+            self.revision_dir(repo, revision) + ".generation",
+            f"{generation}\n".encode(),
+        )
+
+
+def _write_atomically(target: str, data: bytes) -> None:
+    # Glass may be reading the store, so never expose a partial file
+    directory = os.path.dirname(target)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, target)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def from_dir(directory: str) -> Iterator[Tuple[str, str]]:
+    """
+    (repo path, file) for every file under directory.
+    """
+    for dirpath, _, filenames in os.walk(directory):
+        for filename in filenames:
+            file = os.path.join(dirpath, filename)
+            path = os.path.relpath(file, directory).replace(os.sep, "/")
+            yield path, file
+
+
+def from_manifest(manifest: str) -> Iterator[Tuple[str, str]]:
+    with open(manifest) as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                yield entry["path"], entry["file"]
+
+
+def load(
+    store: LocalSnapshotStore,
+    repo: str,
+    revision: str,
+    snapshots: Iterable[Tuple[str, str]],
+    jobs: int,
+    level: int,
+) -> Tuple[int, int, int]:
+    """
+    Loads snapshots in parallel. Returns the number of snapshots and
+    their total size before and after compression.
+    """
+
+    def load_one(entry: Tuple[str, str]) -> Tuple[int, int]:
+        path, file = entry
+        with open(file, "rb") as f:
+            snapshot = f.read()
+        return len(snapshot), store.put(repo, revision, path, snapshot, level)
+
+    count = raw = compressed = 0
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        for size, stored in pool.map(load_one, snapshots):
+            count += 1
+            raw += size
+            compressed += stored
+    return count, raw, compressed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load snapshots into a local store")
+    parser.add_argument("--root", required=True, help="the snapshot store directory")
+    parser.add_argument("--repo", required=True, help="the repository name")
+    parser.add_argument("--revision", required=True, help="the revision")
+    parser.add_argument(
+        "--generation", type=int, help="the SCM generation of the revision"
+    )
+    parser.add_argument(
+        "--from-dir",
+        help="directory mirroring the repository with one snapshot per file",
+    )
+    parser.add_argument(
+        "--manifest", help='JSON lines of {"path": ..., "file": ...} to load'
+    )
+    parser.add_argument(
+        "--jobs", type=int, default=os.cpu_count() or 1, help="parallel workers"
+    )
+    parser.add_argument(
+        "--level", type=int, default=6, help="zlib compression level (1-9)"
+    )
+    args = parser.parse_args()
+
+    if (args.from_dir is None) == (args.manifest is None):
+        parser.error("You must specify exactly one of --from-dir or --manifest")
+
+    if args.from_dir is not None:
+        snapshots = from_dir(args.from_dir)
+    else:
+        snapshots = from_manifest(args.manifest)
+
+    store = LocalSnapshotStore(args.root)
+    count, raw, compressed = load(
+        store, args.repo, args.revision, snapshots, args.jobs, args.level
+    )
+    if args.generation is not None:
+        store.set_generation(args.repo, args.revision, args.generation)
+
+    print(f"loaded {count} snapshots, {raw} bytes compressed to {compressed}")
+
+
+if __name__ == "__main__":
+    main()
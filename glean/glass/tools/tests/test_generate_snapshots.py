@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+Unit tests for generate_snapshots.py, with a fake Glass client.
+"""
+
+import hashlib
+import io
+import os
+import tempfile
+import unittest
+from typing import List, Optional
+
+from glean.glass.thrift_types import (
+    DocumentSymbolListXResult,
+    DocumentSymbolsRequest,
+    RequestOptions,
+)
+from glean.glass.tools.generate_snapshots import (
+    generate,
+    read_files,
+    read_state,
+    state_path,
+)
+from glean.glass.tools.local_snapshots import LocalSnapshotStore
+
+
+class FakeGlass:
+    def __init__(self, revision: Optional[str] = None) -> None:
+        # the revision Glass answers for, by default the one asked for
+        self.revision = revision
+        self.requests: List[str] = []
+        self.options: List[RequestOptions] = []
+
+    async def documentSymbolListX(
+        self, request: DocumentSymbolsRequest, options: RequestOptions
+    ) -> DocumentSymbolListXResult:
+        self.requests.append(request.filepath)
+        self.options.append(options)
+        return DocumentSymbolListXResult(revision=self.revision or options.revision)
+
+
+def sha1(data: bytes) -> str:
+    return hashlib.sha1(data).hexdigest()
+
+
+class GenerateSnapshotsTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = tmp.name
+        self.store = LocalSnapshotStore(os.path.join(tmp.name, "store"))
+
+    def test_read_files(self) -> None:
+        files = io.StringIO("a.py\tabc\nb.py\n\nc.py\t\n")
+        self.assertEqual(
+            list(read_files(files)), [("a.py", "abc"), ("b.py", None), ("c.py", None)]
+        )
+
+    async def test_generates_every_file(self) -> None:
+        glass = FakeGlass()
+        files = [("a.py", "1"), ("b.py", None), ("c.py", "3")]
+        result = await generate(glass, self.store, "repo", "rev", files, concurrency=2)
+        self.assertEqual(result, (3, 0, 0))
+        self.assertEqual(sorted(glass.requests), ["a.py", "b.py", "c.py"])
+        self.assertTrue(
+            all(o.revision == "rev" and o.exact_revision for o in glass.options)
+        )
+        for path, _ in files:
+            self.assertIsNotNone(self.store.get("repo", "rev", path))
+        self.assertEqual(
+            read_state(state_path(self.store, "repo", "rev")),
+            {"a.py": "1", "b.py": "", "c.py": "3"},
+        )
+
+    async def test_resumes_from_the_state_file(self) -> None:
+        files = [("a.py", "1"), ("b.py", "2"), ("c.py", "3")]
+        await generate(FakeGlass(), self.store, "repo", "rev", files[:2])
+        # a line cut short by a crash is ignored
+        with open(state_path(self.store, "repo", "rev"), "a") as f:
+            f.write('{"path": "c.p')
+
+        glass = FakeGlass()
+        result = await generate(glass, self.store, "repo", "rev", files)
+        self.assertEqual(result, (1, 0, 2))
+        self.assertEqual(glass.requests, ["c.py"])
+
+    async def test_reuses_unchanged_files_of_the_base_revision(self) -> None:
+        await generate(
+            FakeGlass(),
+            self.store,
+            "repo",
+            "base",
+            [("same.py", "1"), ("changed.py", "2"), ("unknown.py", None)],
+        )
+        glass = FakeGlass()
+        result = await generate(
+            glass,
+            self.store,
+            "repo",
+            "rev",
+            [("same.py", "1"), ("changed.py", "3"), ("unknown.py", None)],
+            base_revision="base",
+        )
+        self.assertEqual(result, (2, 1, 0))
+        # files without a digest are never reused
+        self.assertEqual(sorted(glass.requests), ["changed.py", "unknown.py"])
+        self.assertEqual(
+            self.store.get("repo", "rev", "same.py"),
+            self.store.get("repo", "base", "same.py"),
+        )
+
+    async def test_hashes_files_from_the_checkout(self) -> None:
+        checkout = os.path.join(self.tmp, "checkout")
+        os.makedirs(checkout)
+        with open(os.path.join(checkout, "a.py"), "wb") as f:
+            f.write(b"contents")
+        await generate(
+            FakeGlass(),
+            self.store,
+            "repo",
+            "rev",
+            [("a.py", None), ("missing.py", None)],
+            checkout=checkout,
+        )
+        self.assertEqual(
+            read_state(state_path(self.store, "repo", "rev")),
+            {"a.py": sha1(b"contents"), "missing.py": ""},
+        )
+
+    async def test_fails_for_another_revision(self) -> None:
+        with self.assertRaises(RuntimeError):
+            await generate(
+                FakeGlass(revision="nearby"),
+                self.store,
+                "repo",
+                "rev",
+                [("a.py", "1")],
+            )
+        self.assertIsNone(self.store.get("repo", "rev", "a.py"))
+        self.assertEqual(read_state(state_path(self.store, "repo", "rev")), {})
+
+    async def test_rejects_zero_concurrency(self) -> None:
+        with self.assertRaises(ValueError):
+            await generate(FakeGlass(), self.store, "repo", "rev", [], concurrency=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+Unit tests for the bulk mode of insert.py, against a fake database.
+"""
+
+import os
+import tempfile
+import threading
+import unittest
+from typing import Any, List, Tuple
+from unittest import mock
+
+from glean.glass.tools import insert
+
+
+class FakeCursor:
+    def __init__(self, db: "FakeLocator") -> None:
+        self.db = db
+
+    def executemany(self, statement: str, rows: List[Tuple[Any, ...]]) -> None:
+        self.db.statements.append(statement)
+        with self.db.lock:
+            self.db.batches.append(rows)
+
+    def close(self) -> None:
+        pass
+
+
+class FakeConnection:
+    def __init__(self, db: "FakeLocator") -> None:
+        self.db = db
+        self.commits = 0
+        self.closed = False
+
+    def cursor(self) -> FakeCursor:
+        return FakeCursor(self.db)
+
+    def commit(self) -> None:
+        self.commits += 1
+
+    def close(self) -> None:
+        self.closed = True
+
+
+class FakeLocator:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.connections: List[FakeConnection] = []
+        self.batches: List[List[Tuple[Any, ...]]] = []
+        self.statements: List[str] = []
+
+    def create_connection(self) -> FakeConnection:
+        conn = FakeConnection(self)
+        with self.lock:
+            self.connections.append(conn)
+        return conn
+
+
+class InsertBulkTest(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = tmp.name
+
+    def snapshots(self, n: int) -> List[Tuple[str, str]]:
+        snapshots = []
+        for i in range(n):
+            file = os.path.join(self.tmp, f"{i}.snapshot")
+            with open(file, "wb") as f:
+                f.write(b"x" * i)
+            snapshots.append((f"src/{i}.py", file))
+        return snapshots
+
+    def test_batches(self) -> None:
+        self.assertEqual(
+            list(insert.batches(range(7), 3)), [[0, 1, 2], [3, 4, 5], [6]]
+        )
+        self.assertEqual(list(insert.batches([], 3)), [])
+
+    def test_inserts_every_snapshot_in_batches(self) -> None:
+        db = FakeLocator()
+        inserted, too_big = insert.insert_bulk(
+            db, "repo", "rev", self.snapshots(10), batch_size=3, jobs=2
+        )
+        self.assertEqual((inserted, too_big), (10, []))
+        self.assertEqual(sorted(len(b) for b in db.batches), [1, 3, 3, 3])
+        self.assertEqual(set(db.statements), {insert.add_snapshot})
+        rows = sorted(row for batch in db.batches for row in batch)
+        self.assertEqual(rows[0], ("repo", "rev", "src/0.py", b""))
+        self.assertEqual(rows[-1], ("repo", "rev", "src/9.py", b"x" * 9))
+        # one connection per worker at most, each committed and closed
+        self.assertLessEqual(len(db.connections), 2)
+        self.assertEqual(sum(c.commits for c in db.connections), 4)
+        self.assertTrue(all(c.closed for c in db.connections))
+
+    def test_skips_snapshots_that_are_too_big(self) -> None:
+        db = FakeLocator()
+        snapshots = self.snapshots(6)
+        with mock.patch.object(insert, "MAX_SNAPSHOT_SIZE", 3):
+            inserted, too_big = insert.insert_bulk(
+                db, "repo", "rev", snapshots, batch_size=2, jobs=1
+            )
+        self.assertEqual(inserted, 4)
+        self.assertEqual(sorted(too_big), [file for _, file in snapshots[4:]])
+        # the last batch had nothing to insert
+        self.assertEqual(len(db.batches), 2)
+
+    def test_bounds_queued_batches(self) -> None:
+        read = 0
+
+        def snapshots():
+            nonlocal read
+            for snapshot in self.snapshots(50):
+                read += 1
+                yield snapshot
+
+        db = FakeLocator()
+        gate = threading.Event()
+        original = FakeCursor.executemany
+
+        def executemany(cursor, statement, rows):
+            gate.wait()
+            original(cursor, statement, rows)
+
+        # block the workers for a while, and see how far the reading of
+        # the snapshots got
+        read_while_blocked = []
+
+        def release():
+            read_while_blocked.append(read)
+            gate.set()
+
+        timer = threading.Timer(0.2, release)
+        timer.start()
+        with mock.patch.object(FakeCursor, "executemany", executemany):
+            inserted, _ = insert.insert_bulk(
+                db, "repo", "rev", snapshots(), batch_size=1, jobs=2
+            )
+        timer.join()
+        self.assertEqual(inserted, 50)
+        # 2 * jobs batches queued, and the next one waiting to be
+        self.assertEqual(read_while_blocked, [5])
+
+    def test_closes_connections_on_failure(self) -> None:
+        db = FakeLocator()
+
+        def fail(cursor, statement, rows):
+            raise RuntimeError("insert failed")
+
+        with mock.patch.object(FakeCursor, "executemany", fail):
+            with self.assertRaises(RuntimeError):
+                insert.insert_bulk(
+                    db, "repo", "rev", self.snapshots(4), batch_size=2, jobs=2
+                )
+        self.assertTrue(db.connections)
+        self.assertTrue(all(c.closed for c in db.connections))
+
+
+if __name__ == "__main__":
+    unittest.main()
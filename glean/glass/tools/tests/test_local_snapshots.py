@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+Unit tests for the local Glass snapshot store.
+"""
+
+import json
+import os
+import tempfile
+import unittest
+
+from glean.glass.tools.local_snapshots import (
+    from_dir,
+    from_manifest,
+    load,
+    LocalSnapshotStore,
+)
+
+
+class LocalSnapshotStoreTest(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = tmp.name
+        self.store = LocalSnapshotStore(os.path.join(tmp.name, "store"))
+
+    def test_put_and_get(self) -> None:
+        snapshot = b"snapshot " * 100
+        size = self.store.put("repo", "rev", "a/b.cpp", snapshot)
+        path = self.store.snapshot_path("repo", "rev", "a/b.cpp")
+        self.assertEqual(
+            path, os.path.join(self.store.root, "repo", "rev", "a", "b.cpp.snapshot")
+        )
+        # stored compressed
+        self.assertEqual(os.path.getsize(path), size)
+        self.assertLess(size, len(snapshot))
+        self.assertEqual(self.store.get("repo", "rev", "a/b.cpp"), snapshot)
+        self.assertIsNone(self.store.get("repo", "rev", "a/c.cpp"))
+        # no temporary files are left behind
+        self.assertEqual(os.listdir(os.path.dirname(path)), ["b.cpp.snapshot"])
+
+    def test_rejects_paths_outside_the_store(self) -> None:
+        for path in ["/etc/passwd", "../x", "a/../../x"]:
+            with self.assertRaises(ValueError):
+                self.store.snapshot_path("repo", "rev", path)
+
+    def test_reuse(self) -> None:
+        self.store.put("repo", "base", "f.py", b"data")
+        self.assertTrue(self.store.reuse("repo", "new", "base", "f.py"))
+        self.assertEqual(self.store.get("repo", "new", "f.py"), b"data")
+        self.assertFalse(self.store.reuse("repo", "new", "base", "g.py"))
+        self.assertIsNone(self.store.get("repo", "new", "g.py"))
+
+    def test_set_generation(self) -> None:
+        self.store.set_generation("repo", "rev", 42)
+        with open(self.store.revision_dir("repo", "rev") + ".generation") as f:
+            self.assertEqual(f.read(), "42\n")
+
+    def test_load(self) -> None:
+        source = os.path.join(self.tmp, "source")
+        os.makedirs(os.path.join(source, "dir"))
+        files = {"top.py": b"top", "dir/nested.py": b"nested"}
+        for path, data in files.items():
+            with open(os.path.join(source, path), "wb") as f:
+                f.write(data)
+
+        snapshots = sorted(from_dir(source))
+        self.assertEqual(
+            snapshots,
+            sorted((path, os.path.join(source, path)) for path in files),
+        )
+        count, raw, _ = load(self.store, "repo", "rev", snapshots, jobs=2, level=1)
+        self.assertEqual((count, raw), (2, 9))
+        for path, data in files.items():
+            self.assertEqual(self.store.get("repo", "rev", path), data)
+
+        manifest = os.path.join(self.tmp, "manifest")
+        with open(manifest, "w") as f:
+            for path, file in snapshots:
+                f.write(json.dumps({"path": path, "file": file}) + "\n")
+            f.write("\n")
+        self.assertEqual(list(from_manifest(manifest)), snapshots)
+
+
+if __name__ == "__main__":
+    unittest.main()
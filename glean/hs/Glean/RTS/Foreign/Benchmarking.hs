@@ -18,8 +18,11 @@ module Glean.RTS.Foreign.Benchmarking
   , lookupEachByKey
   , seekToEach
   , seekCount
+  , seekPrefix
   ) where
 
+import Control.Exception (mask_)
+import Data.ByteString (ByteString)
 import qualified Data.Vector.Storable as V
 import Foreign.C.String
 import Foreign.C.Types
@@ -31,7 +34,7 @@ import Util.FFI
 import Glean.FFI
 import Glean.RTS.Foreign.Define (Define(..), CanDefine(..))
 import Glean.RTS.Foreign.Lookup (Lookup(..), CanLookup(..))
-import Glean.RTS.Types (Pid(..))
+import Glean.RTS.Types (Fid(..), Pid(..))
 
 newtype FactBlock = FactBlock (ForeignPtr FactBlock)
 
@@ -108,6 +111,19 @@ seekCount look pids =
     pids_ptr
     (fromIntegral $ V.length pids)
 
+-- | Seek to the facts of a 'Pid' whose keys start with a prefix, and
+-- return their IDs in the order of their keys.
+seekPrefix :: CanLookup a => a -> Pid -> ByteString -> IO (V.Vector Fid)
+seekPrefix look pid prefix =
+  withLookup look $ \look_ptr ->
+  unsafeWithBytes prefix $ \prefix_ptr prefix_size -> mask_ $ do
+    (ids_ptr, ids_count) <- invoke $ glean_benchmarking_seek_prefix
+      look_ptr
+      pid
+      prefix_ptr
+      prefix_size
+    unsafeMallocedVector ids_ptr ids_count
+
 foreign import ccall safe glean_benchmarking_factblock_create
   :: Ptr Lookup
   -> Ptr (Ptr FactBlock)
@@ -161,3 +177,12 @@ foreign import ccall safe glean_benchmarking_seek_count
   -> CSize
   -> Ptr CSize
   -> IO CString
+
+foreign import ccall safe glean_benchmarking_seek_prefix
+  :: Ptr Lookup
+  -> Pid
+  -> Ptr ()
+  -> CSize
+  -> Ptr (Ptr Fid)
+  -> Ptr CSize
+  -> IO CString
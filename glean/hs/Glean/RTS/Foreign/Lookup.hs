@@ -14,19 +14,21 @@ module Glean.RTS.Foreign.Lookup
   , startingId
   , firstFreeId
   , lookupFact
+  , sampleIds
   , withSnapshot
 ) where
 
-import Control.Exception (bracket)
+import Control.Exception (bracket, mask_)
 import Data.Int
 import Data.Text
+import qualified Data.Vector.Storable as V
 import Foreign.C
 import Foreign.Ptr
 
 import Util.FFI
 
 import Glean.FFI
-import Glean.RTS.Types (Fid(..))
+import Glean.RTS.Types (Fid(..), Pid(..))
 import qualified Glean.Types as Thrift
 
 -- | A reference to a thing we can look up facts in
@@ -75,6 +77,18 @@ lookupFact look fid =
             <$> unsafeMallocedByteString key_ptr key_size
             <*> unsafeMallocedByteString val_ptr val_size
 
+-- | The IDs of the first facts of a predicate in key order, at most
+-- the given number of them. Taking the facts in key order rather than
+-- ID order gives a cheap sample of where the predicate's facts are.
+sampleIds :: CanLookup a => a -> Pid -> Int -> IO (V.Vector Fid)
+sampleIds look pid max_ids =
+  withLookup look $ \look_ptr -> mask_ $ do
+    (ids_ptr, ids_count) <- invoke $ glean_lookup_sample_ids
+      look_ptr
+      pid
+      (fromIntegral (max 0 max_ids))
+    unsafeMallocedVector ids_ptr ids_count
+
 -- | Restrict the Lookup to facts up to the specified fact id
 withSnapshot :: CanLookup a => a -> Fid -> (Lookup -> IO b) -> IO b
 withSnapshot base boundary f =
@@ -98,6 +112,14 @@ foreign import ccall unsafe glean_lookup_starting_id
 foreign import ccall unsafe glean_lookup_first_free_id
   :: Ptr Lookup -> Ptr Fid -> IO CString
 
+foreign import ccall safe glean_lookup_sample_ids
+  :: Ptr Lookup
+  -> Pid
+  -> CSize
+  -> Ptr (Ptr Fid)
+  -> Ptr CSize
+  -> IO CString
+
 foreign import ccall safe glean_lookup_fact
   :: Ptr Lookup
   -> Fid
@@ -8,6 +8,7 @@
 
 module Glean.RTS.Foreign.LookupCache
  ( LookupCache, new, clear, withCache, ReplacementPolicy(..)
+ , setCapacity, Usage(..), readUsage
  , Stats, StatValues, Stat(..)
  , isCounter, getStat, newStats, readStatsAndResetCounters
  , countFailuresAsMisses
@@ -22,7 +23,9 @@ import Data.Word
 import Foreign.C.String
 import Foreign.C.Types
 import Foreign.ForeignPtr
+import Foreign.Marshal.Alloc
 import Foreign.Ptr
+import Foreign.Storable
 
 import Util.FFI
 
@@ -31,8 +34,8 @@ import Glean.RTS.Foreign.Lookup
 
 -- NOTE: This must be kept in sync with the ReplacementPolicy in rts/cache.h
 data ReplacementPolicy
-  = LRU  -- evict least-recently-used entries
-  | FIFO -- evict the oldest entries. Faster with many concurrent clients
+  = LRU  -- evict least-recently-used entries (approximately)
+  | FIFO -- evict the oldest entries. Hits don't update the cache
   deriving(Eq,Ord,Enum,Bounded,Show)
 
 newtype LookupCache = LookupCache (ForeignPtr LookupCache)
@@ -150,15 +153,50 @@ countFailuresAsMisses stats@(StatValues vec) = StatValues $
     , (fromEnum FactById_misses, getStat stats FactById_failures)
     ]
 
-new :: Word64 -> Int -> Stats -> IO LookupCache
-new capacity shards stats =
+-- | A cache holding facts of at most the given total size in bytes. Facts
+-- that haven't been used for the given number of seconds are evicted even
+-- if the cache isn't full, unless it is 0.
+new :: Word64 -> Word64 -> Stats -> IO LookupCache
+new capacity max_idle_seconds stats =
   with stats $ construct . invoke . glean_lookupcache_new
     (fromIntegral capacity)
-    (fromIntegral shards)
+    max_idle_seconds
 
+-- | Evict all facts, freeing their memory
 clear :: LookupCache -> IO ()
 clear cache = with cache $ invoke . glean_lookupcache_clear
 
+-- | Change the capacity of the cache, evicting facts if it is now too big
+setCapacity :: LookupCache -> Word64 -> IO ()
+setCapacity cache capacity = with cache $ \p ->
+  invoke $ glean_lookupcache_set_capacity p (fromIntegral capacity)
+
+-- | How much a single cache is used (unlike 'Stats', which may be shared
+-- between caches)
+data Usage = Usage
+  { usageBytes :: !Word64 -- ^ size of the cached facts
+  , usageCapacity :: !Word64
+  , usageHits :: !Word64 -- ^ hits since the last 'readUsage'
+  , usageMisses :: !Word64 -- ^ misses since the last 'readUsage'
+  }
+  deriving(Show)
+
+-- | Obtain an approximate snapshot of the usage of the cache and reset
+-- the hits and misses.
+readUsage :: LookupCache -> IO Usage
+readUsage cache =
+  with cache $ \p ->
+  alloca $ \pbytes ->
+  alloca $ \pcapacity ->
+  alloca $ \phits ->
+  alloca $ \pmisses -> do
+    glean_lookupcache_read_usage p pbytes pcapacity phits pmisses
+    Usage
+      <$> peek pbytes
+      <*> peek pcapacity
+      <*> peek phits
+      <*> peek pmisses
+
 foreign import ccall unsafe glean_lookupcache_stats_new
   :: Ptr (Ptr Stats) -> IO CString
 foreign import ccall unsafe "&glean_lookupcache_stats_free"
@@ -169,7 +207,7 @@ foreign import ccall safe glean_lookupcache_stats_read_and_reset_counters
 
 foreign import ccall unsafe glean_lookupcache_new
   :: CSize
-  -> CSize
+  -> Word64
   -> Ptr Stats
   -> Ptr (Ptr LookupCache)
   -> IO CString
@@ -177,6 +215,15 @@ foreign import ccall unsafe "&glean_lookupcache_free" glean_lookupcache_free
   :: Destroy LookupCache
 foreign import ccall safe glean_lookupcache_clear
   :: Ptr LookupCache -> IO ()
+foreign import ccall safe glean_lookupcache_set_capacity
+  :: Ptr LookupCache -> CSize -> IO CString
+foreign import ccall safe glean_lookupcache_read_usage
+  :: Ptr LookupCache
+  -> Ptr Word64
+  -> Ptr Word64
+  -> Ptr Word64
+  -> Ptr Word64
+  -> IO ()
 
 foreign import ccall unsafe glean_lookupcache_anchor_new
   :: Ptr Lookup
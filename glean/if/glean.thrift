@@ -384,6 +384,13 @@ struct FinalizeResponse {}
 
 struct FinishDatabaseResponse {}
 
+// The state of a part of a query that runs in parallel (see
+// UserQueryOptions.parallelism)
+struct UserQueryPartition {
+  1: binary continuation;
+  2: i64 nextId;
+}
+
 struct UserQueryCont {
   3: binary continuation;
   4: i64 nextId;
@@ -392,6 +399,13 @@ struct UserQueryCont {
   7: optional binary returnType; // angle return type
   8: list<i64> pids; // pids to expand in the results
   // 9: deprecated
+  // query stream, see UserQueryOptions.stream
+  10: optional i64 stream;
+  // parts of a parallel query that haven't finished, which all resume
+  // in parallel. The continuation is then empty.
+  11: list<UserQueryPartition> partitions;
+  // for a stream, the number of the page to fetch, counting from 0
+  12: optional i64 streamPage;
 }
 
 enum QuerySyntax {
@@ -465,6 +479,25 @@ struct UserQueryOptions {
 
   // if true, the query will be compiled, but no facts will be retrieved
   15: bool just_check = false;
+
+  // Keep the query running on the server between pages of results.
+  // The server computes the next page while the client processes
+  // the current one, and the continuation refers to the running
+  // query instead of carrying its state, so fetching the next page
+  // doesn't restart the query. The continuation must be sent to the
+  // same server, and expires if it isn't used for a while (see
+  // query_stream_idle_s in the server config). Streams are not
+  // supported with store_derived_facts.
+  16: bool stream = false;
+
+  // Run the query on up to this many threads. The facts searched by
+  // the outermost statement of the query are split into ranges, and
+  // the query runs for each range at the same time; the limits on
+  // results and bytes are shared between the ranges. Queries that
+  // can't be split, streams (see stream) and queries that store
+  // derived facts run on one thread. The server may use fewer threads
+  // (see query_max_parallelism in the server config).
+  17: i32 parallelism = 1;
 }
 
 struct QueryDebugOptions {
@@ -631,6 +664,12 @@ union DerivationStatus {
   2: DerivationComplete complete;
 } (hs.nonempty)
 
+// The value of a query parameter, see UserQuery.parameters
+union QueryParameter {
+  1: string string_value;
+  2: Nat nat_value;
+} (hs.nonempty)
+
 struct UserQuery {
   1: string predicate; // DEPRECATED
 
@@ -659,6 +698,13 @@ struct UserQuery {
   // Specifies the version of the schema used to resolve the query. If
   // omitted, use the schema specified by the DB.
   8: optional SchemaId schema_id;
+
+  // Values for the parameters of a prepared query. A parameter is
+  // written $name in the query (name starts with a lowercase letter)
+  // and stands for a string or nat literal. The server compiles the
+  // query once for all values of its parameters, so queries that
+  // differ only in their parameter values share a compiled plan.
+  9: map<string, QueryParameter> parameters = {};
 }
 
 struct UserQueryBatch {
@@ -721,6 +767,9 @@ struct UserQueryStats {
   // whether the query performs full predicate scans
   12: optional i64 result_bytes;
   // query results size in bytes
+  13: bool cached = false;
+  // the results were served from the server's result cache, so the
+  // query wasn't compiled or executed
 }
 
 # Results in Glean's internal binary representation
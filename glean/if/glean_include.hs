@@ -52,6 +52,7 @@ instance Prelude.Semigroup UserQueryStats where
       , userQueryStats_codegen_time_ns = codegen_time_ns1
       , userQueryStats_full_scans = full_scans1
       , userQueryStats_result_bytes = result_bytes1
+      , userQueryStats_cached = cached1
       }
     UserQueryStats
       { userQueryStats_num_facts = num_facts2
@@ -65,6 +66,7 @@ instance Prelude.Semigroup UserQueryStats where
       , userQueryStats_codegen_time_ns = codegen_time_ns2
       , userQueryStats_full_scans = full_scans2
       , userQueryStats_result_bytes = result_bytes2
+      , userQueryStats_cached = cached2
       }
     = UserQueryStats
       { userQueryStats_num_facts = num_facts1 Prelude.+ num_facts2
@@ -88,6 +90,7 @@ instance Prelude.Semigroup UserQueryStats where
           List.nub (full_scans1 <> full_scans2)
       , userQueryStats_result_bytes =
           fMaybe (Prelude.+) result_bytes1 result_bytes2
+      , userQueryStats_cached = cached1 Prelude.&& cached2
       }
       where
       fMaybe _ Prelude.Nothing a = a
@@ -12,9 +12,13 @@
 
 #include <rocksdb/filter_policy.h>
 #include <rocksdb/slice_transform.h>
+#include <rocksdb/sst_file_writer.h>
 #include <rocksdb/statistics.h>
 #include <rocksdb/table.h>
 
+#include <algorithm>
+#include <unordered_map>
+
 #ifdef GLEAN_FACEBOOK
 #include "glean/facebook/rocksdb/rocksdb.h"
 #endif
@@ -126,9 +130,21 @@ ContainerImpl::ContainerImpl(
     const std::string& path,
     Mode m,
     bool cache_index_and_filter_blocks,
-    folly::Optional<std::shared_ptr<Cache>> cache) {
+    folly::Optional<std::shared_ptr<Cache>> cache,
+    const CompressionProfile& compression,
+    size_t key_prefix_bytes_)
+    : key_prefix_bytes(key_prefix_bytes_) {
   mode = m;
 
+  // the profile was checked by checkCompression when the storage was
+  // set up
+  recompress.resize(Family::count());
+  for (const auto& [name, type] : compression) {
+    if (auto family = Family::family(name)) {
+      recompress[family->index] = type;
+    }
+  }
+
   if (mode == Mode::Create) {
     options.error_if_exists = true;
     options.create_if_missing = true;
@@ -194,9 +210,7 @@ ContainerImpl::ContainerImpl(
   for (const auto& name : names) {
     if (name != rocksdb::kDefaultColumnFamilyName) {
       if (auto family = Family::family(name)) {
-        rocksdb::ColumnFamilyOptions opts(options);
-        family->options(opts);
-        existing.emplace_back(name, opts);
+        existing.emplace_back(name, familyOptions(*family));
         ptrs.push_back(&families[family->index]);
       } else {
         rts::error("Unknown column family '{}'", name);
@@ -237,9 +251,8 @@ ContainerImpl::ContainerImpl(
         continue;
       }
 
-      rocksdb::ColumnFamilyOptions opts(options);
-      family->options(opts);
-      check(db->CreateColumnFamily(opts, family->name, &families[i]));
+      check(db->CreateColumnFamily(
+          familyOptions(*family), family->name, &families[i]));
     }
   }
 }
@@ -276,12 +289,69 @@ rocksdb::ColumnFamilyHandle* ContainerImpl::family(const Family& family) const {
   return families[family.index];
 }
 
+rocksdb::ColumnFamilyOptions ContainerImpl::familyOptions(
+    const Family& family) const {
+  rocksdb::ColumnFamilyOptions opts(options);
+  family.options(opts);
+  if (&family == &Family::keys && key_prefix_bytes > 0) {
+    // Seeks for a particular key prefix, such as a name, can skip the
+    // files that don't have any key starting with it. Shorter keys are
+    // their own prefix.
+    opts.prefix_extractor.reset(
+        rocksdb::NewCappedPrefixTransform(keyPrefixSize()));
+  }
+  return opts;
+}
+
+uint64_t ContainerImpl::familySize(rocksdb::ColumnFamilyHandle* handle) const {
+  rocksdb::ColumnFamilyMetaData meta;
+  db->GetColumnFamilyMetaData(handle, &meta);
+  return meta.size;
+}
+
 void ContainerImpl::writeData(folly::ByteRange key, folly::ByteRange value) {
   requireOpen();
   check(db->Put(writeOptions, family(Family::meta), slice(key), slice(value)));
 }
 
+namespace {
+
+// Mutable options that make compactions write a column family with the
+// given compression
+std::unordered_map<std::string, std::string> compressionOptions(
+    Compression compression) {
+  auto both = [](const char* type) {
+    return std::unordered_map<std::string, std::string>{
+        {"compression", type},
+        {"bottommost_compression", type},
+    };
+  };
+  switch (compression) {
+    case Compression::LZ4:
+      return both("kLZ4Compression");
+    case Compression::ZSTD:
+      return both("kZSTD");
+    case Compression::ZSTD_DICTIONARY: {
+      // Train a dictionary on samples of each file in the bottommost
+      // level, where compaction leaves all the data. Entries are small
+      // and similar, so they compress much better with a dictionary
+      // than on their own.
+      auto opts = both("kZSTD");
+      opts["bottommost_compression_opts"] =
+          "{max_dict_bytes=65536;zstd_max_train_bytes=6553600;enabled=true}";
+      return opts;
+    }
+    case Compression::NONE:
+      return both("kNoCompression");
+  }
+  rts::error("unknown compression {}", static_cast<int>(compression));
+}
+
+} // namespace
+
 void ContainerImpl::optimize(bool compact) {
+  uint64_t total_before = 0;
+  uint64_t total_after = 0;
   for (uint32_t i = 0; i < families.size(); i++) {
     auto family = Family::family(i);
     auto handle = families[i];
@@ -296,20 +366,40 @@ void ContainerImpl::optimize(bool compact) {
         // delete the contents of this column family
         check(db->DropColumnFamily(handle));
         db->DestroyColumnFamilyHandle(handle);
-        rocksdb::ColumnFamilyOptions opts(options);
-        family->options(opts);
-        check(db->CreateColumnFamily(opts, family->name, &handle));
+        check(db->CreateColumnFamily(
+            familyOptions(*family), family->name, &handle));
         families[i] = handle;
       }
       if (compact) {
         const auto nlevels = db->NumberLevels(handle);
         if (nlevels != 2) {
           rocksdb::CompactRangeOptions copts;
+          auto compression = recompress[i];
+          uint64_t before = 0;
+          if (compression) {
+            before = familySize(handle);
+            check(db->SetOptions(handle, compressionOptions(*compression)));
+            // rewrite the files that are already in the bottommost level,
+            // which compaction would otherwise leave alone
+            copts.bottommost_level_compaction =
+                rocksdb::BottommostLevelCompaction::kForce;
+          }
           check(db->CompactRange(copts, handle, nullptr, nullptr));
+          if (compression) {
+            auto after = familySize(handle);
+            LOG(INFO) << "rocksdb: recompressed " << family->name << ": "
+                      << before << " -> " << after << " bytes";
+            total_before += before;
+            total_after += after;
+          }
         }
       }
     }
   }
+  if (total_before > 0) {
+    LOG(INFO) << "rocksdb: recompressed column families: " << total_before
+              << " -> " << total_after << " bytes";
+  }
 }
 
 std::unique_ptr<Database> ContainerImpl::openDatabase(
@@ -341,6 +431,56 @@ void ContainerImpl::backup(const std::string& path) {
   check(backupEngine(path, false)->CreateNewBackup(db.get(), flush));
 }
 
+void ContainerImpl::exportFiles(const std::string& path) {
+  requireOpen();
+  // Files are cut at about the size compaction would make them, so
+  // that reading one doesn't have to load a huge index.
+  constexpr uint64_t kFileSize = 256 << 20;
+  auto env = rocksdb::Env::Default();
+  check(env->CreateDirIfMissing(path));
+  for (size_t i = 0; i < families.size(); ++i) {
+    auto family = Family::family(i);
+    auto handle = families[i];
+    if (!handle) {
+      continue;
+    }
+    // The files are written with the family's current options, so they
+    // keep its compression and prefix extractor.
+    rocksdb::Options opts(db->GetDBOptions(), db->GetOptions(handle));
+    auto dir = path + "/" + family->name;
+    check(env->CreateDirIfMissing(dir));
+
+    rocksdb::ReadOptions read;
+    read.total_order_seek = true;
+    read.fill_cache = false;
+    std::unique_ptr<rocksdb::Iterator> iter(db->NewIterator(read, handle));
+    if (!iter) {
+      rts::error("rocksdb: couldn't allocate iterator");
+    }
+
+    std::unique_ptr<rocksdb::SstFileWriter> writer;
+    size_t files = 0;
+    for (iter->SeekToFirst(); iter->Valid(); iter->Next()) {
+      if (!writer) {
+        writer = std::make_unique<rocksdb::SstFileWriter>(
+            rocksdb::EnvOptions(), opts, handle);
+        check(writer->Open(folly::sformat("{}/{:06}.sst", dir, files++)));
+      }
+      check(writer->Put(iter->key(), iter->value()));
+      if (writer->FileSize() >= kFileSize) {
+        check(writer->Finish());
+        writer.reset();
+      }
+    }
+    check(iter->status());
+    if (writer) {
+      check(writer->Finish());
+    }
+    VLOG(1) << "rocksdb: exported " << family->name << " as " << files
+            << " files";
+  }
+}
+
 } // namespace impl
 
 void restore(const std::string& target, const std::string& source) {
@@ -348,6 +488,53 @@ void restore(const std::string& target, const std::string& source) {
       impl::backupEngine(source)->RestoreDBFromLatestBackup(target, target));
 }
 
+void exportFiles(Container& container, const std::string& path) {
+  auto rocks = dynamic_cast<impl::ContainerImpl*>(&container);
+  if (!rocks) {
+    rts::error("rocksdb: can't export files from another kind of DB");
+  }
+  rocks->exportFiles(path);
+}
+
+void ingest(const std::string& target, const std::string& source, bool create) {
+  using impl::Family;
+  impl::ContainerImpl container(
+      target,
+      create ? Mode::Create : Mode::ReadWrite,
+      false,
+      folly::none,
+      {},
+      0);
+  auto env = rocksdb::Env::Default();
+  for (size_t i = 0; i < Family::count(); ++i) {
+    auto family = Family::family(i);
+    auto dir = source + "/" + family->name;
+    if (!env->FileExists(dir).ok()) {
+      continue;
+    }
+    std::vector<std::string> names;
+    impl::check(env->GetChildren(dir, &names));
+    std::sort(names.begin(), names.end());
+    std::vector<std::string> files;
+    for (const auto& name : names) {
+      if (folly::StringPiece(name).endsWith(".sst")) {
+        files.push_back(dir + "/" + name);
+      }
+    }
+    if (files.empty()) {
+      continue;
+    }
+    // The files of a family don't overlap, so they all go straight to
+    // the bottommost level, and nothing needs to be compacted.
+    rocksdb::IngestExternalFileOptions opts;
+    opts.move_files = true;
+    opts.verify_checksums_before_ingest = true;
+    impl::check(container.db->IngestExternalFile(
+        container.family(*family), files, opts));
+  }
+  container.close();
+}
+
 } // namespace rocks
 } // namespace glean
 } // namespace facebook
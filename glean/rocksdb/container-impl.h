@@ -133,6 +133,14 @@ struct ContainerImpl final : Container {
   std::vector<rocksdb::ColumnFamilyHandle*> families;
   std::shared_ptr<rocksdb::Statistics> statistics;
 
+  // How to recompress each family when the DB is compacted, by family
+  // index. Families without one stay as they are.
+  std::vector<folly::Optional<Compression>> recompress;
+
+  // The bloom filters of the keys family hold the predicate and this
+  // many bytes of the key of each fact, as well as the whole key.
+  size_t key_prefix_bytes = 0;
+
   using Family = impl::Family;
   using Iterator = impl::Iterator;
 
@@ -140,7 +148,9 @@ struct ContainerImpl final : Container {
       const std::string& path,
       Mode m,
       bool cache_index_and_filter_blocks,
-      folly::Optional<std::shared_ptr<Cache>> cache);
+      folly::Optional<std::shared_ptr<Cache>> cache,
+      const CompressionProfile& compression,
+      size_t key_prefix_bytes);
 
   ContainerImpl(const ContainerImpl&) = delete;
   ContainerImpl(ContainerImpl&& other) = default;
@@ -156,6 +166,9 @@ struct ContainerImpl final : Container {
   void requireOpen() const;
 
   void backup(const std::string& path) override;
+
+  // See rocks::exportFiles
+  void exportFiles(const std::string& path);
   std::unique_ptr<Database>
       openDatabase(Id start, rts::UsetId first_unit_id, int32_t version) &&
       override;
@@ -171,6 +184,17 @@ struct ContainerImpl final : Container {
 
   rocksdb::ColumnFamilyHandle* family(const Family& family) const;
 
+  rocksdb::ColumnFamilyOptions familyOptions(const Family& family) const;
+
+  // Length of the prefixes of the keys family in the bloom filters. A
+  // seek for a shorter prefix can't use them.
+  size_t keyPrefixSize() const {
+    return sizeof(Id::word_type) + key_prefix_bytes;
+  }
+
+  // Total size of the SST files of a column family
+  uint64_t familySize(rocksdb::ColumnFamilyHandle* handle) const;
+
   Iterator read(const Family& f) {
     return Iterator(db.get(), family(f));
   }
@@ -249,6 +249,9 @@ struct SeekIterator final : rts::FactIterator {
     // both upper_bound_slice_ and options_ need to be alive for the duration
     // of the iteration
     options_.iterate_upper_bound = &upper_bound_slice_;
+    // The bloom filters only have prefixes of a fixed length, so a seek
+    // for a shorter prefix has to look in every file.
+    options_.total_order_seek = prefix_size < db->container_.keyPrefixSize();
     iter_.reset(db->container_.db->NewIterator(
         options_, db->container_.family(Family::keys)));
     if (iter_) {
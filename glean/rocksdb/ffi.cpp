@@ -21,6 +21,23 @@ namespace facebook {
 namespace glean {
 namespace rocks {
 namespace c {
+
+namespace {
+
+rocks::CompressionProfile compressionProfile(
+    const char** families,
+    const int* types,
+    size_t count) {
+  rocks::CompressionProfile compression;
+  for (size_t i = 0; i < count; ++i) {
+    compression.emplace_back(
+        families[i], static_cast<rocks::Compression>(types[i]));
+  }
+  return compression;
+}
+
+} // namespace
+
 extern "C" {
 
 struct SharedCache {
@@ -43,22 +60,40 @@ size_t glean_rocksdb_cache_capacity(SharedCache* cache) {
   return 0;
 }
 
+const char* glean_rocksdb_check_compression(
+    const char** compression_families,
+    const int* compression_types,
+    size_t compression_count) {
+  return ffi::wrap([=] {
+    rocks::checkCompression(compressionProfile(
+        compression_families, compression_types, compression_count));
+  });
+}
+
 const char* glean_rocksdb_container_open(
     const char* path,
     int mode,
     bool cache_index_and_filter_blocks,
     SharedCache* cache,
+    const char** compression_families,
+    const int* compression_types,
+    size_t compression_count,
+    size_t key_prefix_bytes,
     Container** container) {
   return ffi::wrap([=] {
     folly::Optional<std::shared_ptr<rocks::Cache>> cache_ptr;
     if (cache) {
       cache_ptr = cache->value;
     }
+    auto compression = compressionProfile(
+        compression_families, compression_types, compression_count);
     *container = rocks::open(
                      path,
                      static_cast<rocks::Mode>(mode),
                      cache_index_and_filter_blocks,
-                     std::move(cache_ptr))
+                     std::move(cache_ptr),
+                     compression,
+                     key_prefix_bytes)
                      .release();
   });
 }
@@ -79,6 +114,17 @@ const char* glean_rocksdb_container_open_database(
 const char* glean_rocksdb_restore(const char* target, const char* source) {
   return ffi::wrap([=] { facebook::glean::rocks::restore(target, source); });
 }
+
+const char* glean_rocksdb_container_export_files(
+    Container* container,
+    const char* path) {
+  return ffi::wrap([=] { rocks::exportFiles(*container, path); });
+}
+
+const char*
+glean_rocksdb_ingest(const char* target, const char* source, bool create) {
+  return ffi::wrap([=] { rocks::ingest(target, source, create); });
+}
 }
 } // namespace c
 } // namespace rocks
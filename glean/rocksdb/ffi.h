@@ -34,11 +34,20 @@ const char* glean_rocksdb_new_cache(size_t capacity, SharedCache** cache);
 void glean_rocksdb_free_cache(SharedCache* cache);
 size_t glean_rocksdb_cache_capacity(SharedCache* cache);
 
+const char* glean_rocksdb_check_compression(
+    const char** compression_families,
+    const int* compression_types,
+    size_t compression_count);
+
 const char* glean_rocksdb_container_open(
     const char* path,
     int mode,
     bool cache_index_and_filter_blocks,
     SharedCache* cache,
+    const char** compression_families,
+    const int* compression_types,
+    size_t compression_count,
+    size_t key_prefix_bytes,
     Container** container);
 
 const char* glean_rocksdb_container_open_database(
@@ -50,6 +59,13 @@ const char* glean_rocksdb_container_open_database(
 
 const char* glean_rocksdb_restore(const char* target, const char* source);
 
+const char* glean_rocksdb_container_export_files(
+    Container* container,
+    const char* path);
+
+const char*
+glean_rocksdb_ingest(const char* target, const char* source, bool create);
+
 #ifdef __cplusplus
 }
 }
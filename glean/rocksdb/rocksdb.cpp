@@ -8,12 +8,25 @@
 
 #include "glean/rocksdb/rocksdb.h"
 #include <rocksdb/advanced_cache.h>
+#include <util/compression.h>
 #include "glean/rocksdb/container-impl.h"
 
 namespace facebook {
 namespace glean {
 namespace rocks {
 
+void checkCompression(const CompressionProfile& compression) {
+  for (const auto& [name, type] : compression) {
+    if (!impl::Family::family(name)) {
+      rts::error("Unknown column family '{}'", name);
+    }
+    if ((type == Compression::ZSTD || type == Compression::ZSTD_DICTIONARY) &&
+        !rocksdb::ZSTD_Supported()) {
+      rts::error("rocksdb was built without ZSTD, needed for '{}'", name);
+    }
+  }
+}
+
 std::shared_ptr<Cache> newCache(size_t capacity) {
   return rocksdb::NewLRUCache(capacity);
 }
@@ -29,9 +42,16 @@ std::unique_ptr<Container> open(
     const std::string& path,
     Mode mode,
     bool cache_index_and_filter_blocks,
-    folly::Optional<std::shared_ptr<Cache>> cache) {
+    folly::Optional<std::shared_ptr<Cache>> cache,
+    const CompressionProfile& compression,
+    size_t key_prefix_bytes) {
   return std::make_unique<impl::ContainerImpl>(
-      path, mode, cache_index_and_filter_blocks, std::move(cache));
+      path,
+      mode,
+      cache_index_and_filter_blocks,
+      std::move(cache),
+      compression,
+      key_prefix_bytes);
 }
 
 } // namespace rocks
@@ -33,6 +33,23 @@ using rts::Pid;
 
 using Cache = ::rocksdb::Cache;
 
+// How to compress a column family when the DB is compacted at the end
+// of writing (see Container::optimize). The values are those of
+// RocksDBCompression in server_config.thrift.
+enum class Compression : int {
+  LZ4 = 0,
+  ZSTD = 1,
+  ZSTD_DICTIONARY = 2,
+  NONE = 3,
+};
+
+// Compression of column families by name. The others keep LZ4.
+using CompressionProfile = std::vector<std::pair<std::string, Compression>>;
+
+// Fail if a compression profile names a column family that doesn't
+// exist, or a compression that RocksDB was built without.
+void checkCompression(const CompressionProfile& compression);
+
 std::shared_ptr<Cache> newCache(size_t capacity);
 size_t getCacheCapacity(const std::shared_ptr<Cache>& cache);
 
@@ -40,10 +57,23 @@ std::unique_ptr<Container> open(
     const std::string& path,
     Mode mode,
     bool cache_index_and_filter_blocks,
-    folly::Optional<std::shared_ptr<Cache>> cache);
+    folly::Optional<std::shared_ptr<Cache>> cache,
+    const CompressionProfile& compression = {},
+    size_t key_prefix_bytes = 0);
 
 void restore(const std::string& target, const std::string& source);
 
+// Write the contents of a RocksDB container as sorted SST files, in a
+// directory for each column family under path. The container should
+// have been optimized, so the files are as compact as the DB.
+void exportFiles(Container& container, const std::string& path);
+
+// Add the files written by exportFiles to the database at target, by
+// moving them into place without rewriting them. The database is
+// created if create is true. A column family whose directory is missing
+// from source is left as it is.
+void ingest(const std::string& target, const std::string& source, bool create);
+
 } // namespace rocks
 } // namespace glean
 } // namespace facebook
@@ -93,4 +93,26 @@ const char* glean_benchmarking_seek_count(
   });
 }
 
+const char* glean_benchmarking_seek_prefix(
+    Lookup* lookup,
+    int64_t pid,
+    const void* prefix,
+    size_t prefix_size,
+    glean_fact_id_t** ids,
+    size_t* ids_count) {
+  return ffi::wrap([=] {
+    std::vector<glean_fact_id_t> found;
+    auto iter = lookup->seek(
+        Pid::fromThrift(pid),
+        {static_cast<const unsigned char*>(prefix), prefix_size});
+    while (auto ref = iter->get(FactIterator::Demand::KeyOnly)) {
+      found.push_back(ref.id.toThrift());
+      iter->next();
+    }
+    auto arr = ffi::malloc_array<glean_fact_id_t>(found.size());
+    std::copy(found.begin(), found.end(), arr.get());
+    arr.release_to(ids, ids_count);
+  });
+}
+
 } // namespace facebook::glean::rts::benchmarking::c
@@ -63,6 +63,14 @@ const char* glean_benchmarking_seek_count(
     size_t pids_count,
     size_t* count);
 
+const char* glean_benchmarking_seek_prefix(
+    Lookup* lookup,
+    int64_t pid,
+    const void* prefix,
+    size_t prefix_size,
+    glean_fact_id_t** ids,
+    size_t* ids_count);
+
 #ifdef __cplusplus
 }
 }
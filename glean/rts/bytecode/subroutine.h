@@ -8,6 +8,8 @@
 
 #pragma once
 
+#include <memory>
+#include <new>
 #include <string>
 #include <vector>
 
@@ -100,6 +102,22 @@ struct Subroutine {
       return std::forward<F>(f)(*guard.ptr);
     }
 
+    struct Deleter {
+      void operator()(Activation* activation) const {
+        activation->~Activation();
+        ::operator delete(activation);
+      }
+    };
+    using unique_ptr = std::unique_ptr<Activation, Deleter>;
+
+    /// Allocate an activation on the heap, for an activation which must
+    /// outlive the current scope (cf. 'with'), such as a query which is
+    /// suspended after each page of results and then resumed in place.
+    static unique_ptr create(const Subroutine& sub, void* context) {
+      return unique_ptr(
+          new (::operator new(byteSize(sub))) Activation(sub, context));
+    }
+
     /// Set up the activation to start executing the subroutine.
     void start() {
       restart(0, sub.constants.begin(), sub.constants.end());
@@ -8,8 +8,6 @@
 
 #include "glean/rts/cache.h"
 
-#include <folly/concurrency/CacheLocality.h>
-
 namespace facebook {
 namespace glean {
 namespace rts {
@@ -34,39 +32,30 @@ std::vector<uint64_t> LookupCache::Stats::readAndResetCounters() {
 }
 
 LookupCache::Storage::~Storage() {
-  facts.erase_and_dispose(facts.begin(), facts.end(), Fact::destroy);
+  for (auto fact : ring) {
+    Fact::destroy(fact);
+  }
 }
 
 const Fact* LookupCache::Storage::push_back(Fact::unique_ptr fact) {
-  facts.push_back(*fact);
+  ring.push_back(fact.get());
   bytes += fact->size();
-  ++count;
   return fact.release();
 }
 
-Fact::unique_ptr LookupCache::Storage::release(const Fact* fact) {
+Fact::unique_ptr LookupCache::Storage::pop() {
+  assert(!ring.empty());
+  const auto fact = ring.front();
   assert(bytes >= fact->size());
-  assert(count > 0);
+  ring.pop_front();
   bytes -= fact->size();
-  --count;
-  facts.erase(facts.iterator_to(*fact));
   return Fact::unique_ptr(const_cast<Fact*>(fact));
 }
 
-void LookupCache::Storage::splice_to(
-    Fact::intrusive_list& list,
-    Fact::intrusive_list::iterator pos,
-    LookupCache::Storage::Range range) {
-  assert(bytes >= range.bytes);
-  assert(count >= range.count);
-  list.splice(pos, facts, range.start, range.pos);
-  bytes -= range.bytes;
-  count -= range.count;
-}
-
-void LookupCache::Storage::touch(const Fact* fact) {
-  facts.erase(facts.iterator_to(*fact));
-  facts.push_back(const_cast<Fact&>(*fact));
+void LookupCache::Storage::skip() {
+  assert(!ring.empty());
+  ring.push_back(ring.front());
+  ring.pop_front();
 }
 
 namespace {
@@ -83,12 +72,7 @@ enum Tag : unsigned int {
 LookupCache::LookupCache(
     const Options& opts,
     std::shared_ptr<LookupCache::Stats> s)
-    : options(opts), touched(opts.shards), stats(std::move(s)) {
-  for (auto& t : touched) {
-    t.facts = std::make_unique<std::atomic<const Fact*>[]>(
-        options.touched_buffer_size);
-  }
-}
+    : options(opts), stats(std::move(s)) {}
 
 LookupCache::~LookupCache() {
   if (stats) {
@@ -100,14 +84,56 @@ LookupCache::~LookupCache() {
 }
 
 void LookupCache::clear() {
-  storage.withLock([&](const auto& rstorage) {
-    // NOTE: we don't seem to be able to this in the destructor because
-    // something in ThreadCachedInt triggers ASAN
-    stats->values[Stats::factBytes] -= rstorage.factBytes();
-    stats->values[Stats::factCount] -= rstorage.factCount();
-    // TODO
-    // *this = LookupCache(base, capacity, stats);
+  std::unique_lock<folly::SharedMutex> delete_write;
+  Dead dead;
+  performUpdate([&](Index& windex, Storage& wstorage) {
+    windex.ids.clear();
+    windex.keys.clear();
+    while (wstorage.hand()) {
+      dead.push_back(wstorage.pop());
+    }
+    if (!dead.empty()) {
+      delete_write = std::unique_lock(windex.delete_lock);
+    }
+  });
+  dead.clear();
+}
+
+void LookupCache::evictIdle() {
+  std::unique_lock<folly::SharedMutex> delete_write;
+  Dead dead;
+  performUpdate([&](Index& windex, Storage& wstorage) {
+    sweep(windex, wstorage, dead);
+    if (!dead.empty()) {
+      delete_write = std::unique_lock(windex.delete_lock);
+    }
+  });
+  dead.clear();
+}
+
+void LookupCache::setCapacity(size_t capacity) {
+  std::unique_lock<folly::SharedMutex> delete_write;
+  Dead dead;
+  performUpdate([&](Index& windex, Storage& wstorage) {
+    options.capacity = capacity;
+    evict(windex, wstorage, capacity, dead);
+    if (!dead.empty()) {
+      delete_write = std::unique_lock(windex.delete_lock);
+    }
+  });
+  dead.clear();
+}
+
+LookupCache::Usage LookupCache::readUsage() {
+  Usage usage;
+  storage.withLock([&](auto& wstorage) {
+    usage.bytes = wstorage.factBytes();
+    // options.capacity only changes while both index and storage are locked
+    usage.capacity = options.capacity;
   });
+  usage.hits = hits.readFullAndReset();
+  usage.misses = misses.readFullAndReset();
+  return usage;
 }
 
 Id LookupCache::Anchor::idByKey(Pid type, folly::ByteRange key) {
@@ -117,7 +143,7 @@ Id LookupCache::Anchor::idByKey(Pid type, folly::ByteRange key) {
       const auto fact = *i;
       const auto id = fact->id();
       if (replacementPolicy == ReplacementPolicy::LRU) {
-        cache->touch(std::move(rindex), fact);
+        fact->mark();
       }
       return id;
     } else {
@@ -127,11 +153,13 @@ Id LookupCache::Anchor::idByKey(Pid type, folly::ByteRange key) {
 
   if (cached) {
     ++cache->stats->values[Stats::idByKey_hits];
+    ++cache->hits;
     return cached;
   }
 
   if (const auto id = base->idByKey(type, key)) {
     ++cache->stats->values[Stats::idByKey_misses];
+    ++cache->misses;
     cache->insert(Fact::create({id, type, Fact::Clause::fromKey(key)}, KEY));
     return id;
   } else {
@@ -147,7 +175,7 @@ Pid LookupCache::Anchor::typeById(Id id) {
       const auto fact = *i;
       const auto ty = fact->type();
       if (replacementPolicy == ReplacementPolicy::LRU) {
-        cache->touch(std::move(rindex), fact);
+        fact->mark();
       }
       return ty;
     } else {
@@ -157,9 +185,11 @@ Pid LookupCache::Anchor::typeById(Id id) {
 
   if (cached) {
     ++cache->stats->values[Stats::typeById_hits];
+    ++cache->hits;
     return cached;
   } else if (auto type = base->typeById(id)) {
     ++cache->stats->values[Stats::typeById_misses];
+    ++cache->misses;
     cache->insert(Fact::create({id, type, {}}, TYPE));
     return type;
   } else {
@@ -175,18 +205,17 @@ bool LookupCache::Anchor::factById(
     const auto i = rindex->ids.find(id);
     if (i != rindex->ids.end() && (*i)->tag() == FULL) {
       const auto fact = *i;
-      // It is imporant to call f after we (i.e., touch) have released the read
-      // lock (since f might use the cache). However, fact needs to exist until
-      // after we've called f. Grabbing a read lock for delete_lock makes sure
-      // no facts will be deleted until we're done.
+      // It is imporant to call f after we have released the read lock (since
+      // f might use the cache). However, fact needs to exist until after
+      // we've called f. Grabbing a read lock for delete_lock makes sure no
+      // facts will be deleted until we're done.
       //
       // We might consider finer-grained locking if this becomes an issue.
       std::shared_lock dont_delete(rindex->delete_lock);
       if (replacementPolicy == ReplacementPolicy::LRU) {
-        cache->touch(std::move(rindex), fact);
-      } else {
-        rindex.unlock();
+        fact->mark();
       }
+      rindex.unlock();
       f(fact->type(), fact->clause());
       return true;
     } else {
@@ -196,6 +225,7 @@ bool LookupCache::Anchor::factById(
 
   if (cached) {
     ++cache->stats->values[Stats::factById_hits];
+    ++cache->hits;
     return true;
   }
 
@@ -205,6 +235,7 @@ bool LookupCache::Anchor::factById(
   });
   if (fact) {
     ++cache->stats->values[Stats::factById_misses];
+    ++cache->misses;
     f(fact->type(), fact->clause());
     // FIXME: probably do this before f
     cache->insert(std::move(fact));
@@ -243,7 +274,7 @@ std::unique_ptr<FactIterator> LookupCache::Anchor::seekWithinSection(
 
 void LookupCache::insert(Fact::unique_ptr owned) {
   std::unique_lock<folly::SharedMutex> delete_write;
-  Fact::intrusive_list dead;
+  Dead dead;
   performUpdate([&](Index& windex, Storage& wstorage) {
     insertOne(windex, wstorage, std::move(owned), dead);
     if (!dead.empty()) {
@@ -252,22 +283,27 @@ void LookupCache::insert(Fact::unique_ptr owned) {
   });
   // Perform the actual deletions after we've released all locks on the index
   // and storage.
-  if (!dead.empty()) {
-    dead.erase_and_dispose(dead.begin(), dead.end(), Fact::destroy);
-  }
+  dead.clear();
 }
 
 void LookupCache::insertOne(
     Index& windex,
     Storage& wstorage,
     Fact::unique_ptr owned,
-    Fact::intrusive_list& dead) {
+    Dead& dead) {
   const auto size = owned->size();
 
   if (size > options.capacity) {
     return;
   }
 
+  if (options.max_idle.count() > 0) {
+    const auto now = std::chrono::steady_clock::now();
+    if (now - wstorage.last_sweep >= options.max_idle) {
+      sweep(windex, wstorage, dead);
+    }
+  }
+
   // check if we already have a fact with this id in the cache
   const Fact* existing = nullptr;
   {
@@ -282,46 +318,27 @@ void LookupCache::insertOne(
     return;
   }
 
-  if (existing || wstorage.factBytes() + size > options.capacity) {
-    // Do deferred LRU operations if we're going to evict or replace. We need
-    // to do this even when replacing because the hit buffers might reference
-    // the fact we're going to delete.
-    //
-    // NOTE: drain is "lossy" but in this case, we're running under a
-    // write lock for the index so there will be no concurrent drainers
-    // and we'll have had a memory barrier before - so drain isn't
-    // actually lossy here.
-    //
-    // This doesn't preserve LRU order as we process shards one by one,
-    // i.e., hits within one shard a processes in chronological order
-    // but we lose ordering across shards. It possible to fix this at the cost
-    // of some performance but probably not worth doing.
-    for (auto& t : touched) {
-      drain(wstorage, t);
-    }
-
-    if (existing) {
-      if (owned->tag() == KEY) {
-        ++stats->values[Stats::idByKey_deletes];
-      } else {
-        ++stats->values[Stats::factById_deletes];
-      }
-      deleteFromIndex(windex, existing);
-      // TODO: defer this, see comments in evict
-      auto fact = wstorage.release(existing);
-      dead.push_back(*fact);
-      // dead assumed ownership of the fact
-      (void)fact.release();
+  if (existing) {
+    if (owned->tag() == KEY) {
+      ++stats->values[Stats::idByKey_deletes];
+    } else {
+      ++stats->values[Stats::factById_deletes];
     }
+    // The existing fact stays in the storage, and counts towards the
+    // capacity, until the clock hand reaches it. Finding it in the ring now
+    // would take linear time.
+    deleteFromIndex(windex, existing);
+  }
 
-    if (wstorage.factBytes() + size > options.capacity) {
-      // shrink cache to ~90% of capacity
-      const auto wanted =
-          options.capacity * 0.9 > size ? options.capacity * 0.9 - size : 0;
-      evict(windex, wstorage, wanted, dead);
-    }
+  if (wstorage.factBytes() + size > options.capacity) {
+    // shrink cache to ~90% of capacity
+    const auto wanted =
+        options.capacity * 0.9 > size ? options.capacity * 0.9 - size : 0;
+    evict(windex, wstorage, wanted, dead);
   }
 
+  // New facts start out marked so they survive at least one sweep.
+  owned->mark();
   const auto fact = wstorage.push_back(std::move(owned));
 
   // For 'insert' (but not 'BulkStorage') we could unlock the storage here. It
@@ -341,62 +358,55 @@ void LookupCache::deleteFromIndex(Index& index, const Fact* fact) {
   }
 }
 
+bool LookupCache::isIndexed(const Index& index, const Fact* fact) {
+  const auto i = index.ids.find(fact->id());
+  return i != index.ids.end() && *i == fact;
+}
+
+bool LookupCache::tick(Index& index, Storage& storage, Dead& dead) {
+  const auto fact = storage.hand();
+  const auto indexed = isIndexed(index, fact);
+  if (indexed && fact->marked()) {
+    fact->unmark();
+    storage.skip();
+    return false;
+  } else {
+    if (indexed) {
+      deleteFromIndex(index, fact);
+    }
+    dead.push_back(storage.pop());
+    return true;
+  }
+}
+
 void LookupCache::evict(
     LookupCache::Index& index,
     LookupCache::Storage& storage,
     size_t target,
-    Fact::intrusive_list& dead) {
-  auto range = storage.start();
-  while (storage.factBytes() - range.factBytes() > target && !range.empty()) {
-    deleteFromIndex(index, range.next());
+    Dead& dead) {
+  // This terminates because every fact the hand passes is either evicted or
+  // unmarked, so it evicts everything after at most two revolutions.
+  while (storage.factBytes() > target && storage.hand()) {
+    tick(index, storage, dead);
   }
-  storage.splice_to(dead, dead.end(), range);
 }
 
-void LookupCache::touch(
-    LookupCache::SyncIndex::RLockedPtr rindex,
-    const Fact* fact) {
-  if (options.shards > 0) {
-    auto& t = touched[folly::AccessSpreader<>::cachedCurrent(options.shards)];
-
-    // This is intentionally very lossy
-    auto k = t.next.load(std::memory_order_acquire);
-    if (k < options.touched_buffer_size) {
-      // yes, we might overwrite a previous store
-      t.facts[k].store(fact, std::memory_order_release);
-      // yes, there might have been other stores here in the meantime
-      t.next.store(k + 1, std::memory_order_release);
-    } else {
-      rindex.unlock();
-      if (auto wstorage = storage.tryLock()) {
-        // Only drain our shard - as in 'insert', this loses LRU ordering across
-        // shards.
-        drain(*wstorage, t);
-      }
-    }
-  } else {
-    storage.withLock([&](auto& wstorage) { wstorage.touch(fact); });
-  }
-}
-
-void LookupCache::drain(Storage& storage, Touched& t) {
-  // There might be calls to touch (but not to drain!) running concurrently to
-  // this. It's ok to lose those. The only invariant we rely on is that the
-  // Touched buffer has been filled up to n.
-  const auto n = t.next.load(std::memory_order_acquire);
-  for (size_t i = 0; i < n; ++i) {
-    storage.touch(t.facts[i].load(std::memory_order_acquire));
+void LookupCache::sweep(
+    LookupCache::Index& index,
+    LookupCache::Storage& storage,
+    Dead& dead) {
+  for (auto n = storage.factCount(); n > 0; --n) {
+    tick(index, storage, dead);
   }
-  // yes, we might lose recorded hits here
-  t.next.store(0, std::memory_order_release);
+  storage.last_sweep = std::chrono::steady_clock::now();
 }
 
 void LookupCache::Inserter::insert(Fact::Ref fact) {
-  Fact::intrusive_list dead;
+  Dead dead;
   cache.insertOne(index, storage, Fact::create(fact, FULL), dead);
   if (!dead.empty()) {
     std::unique_lock delete_write(index.delete_lock);
-    dead.erase_and_dispose(dead.begin(), dead.end(), Fact::destroy);
+    dead.clear();
   }
 }
 
@@ -11,7 +11,8 @@
 #include <folly/SharedMutex.h>
 #include <folly/Synchronized.h>
 #include <folly/ThreadCachedInt.h>
-#include <folly/system/HardwareConcurrency.h>
+#include <chrono>
+#include <deque>
 #include <vector>
 
 #include "glean/rts/factset.h"
@@ -21,7 +22,7 @@ namespace facebook {
 namespace glean {
 namespace rts {
 
-/// An LRU fact cache for speeding up point lookups (and only those) during
+/// A fact cache for speeding up point lookups (and only those) during
 /// writes. It only loads as much data as has been requested by the client which
 /// means that for any given fact, it can store either only its type (via
 /// typeById), its type and key (via idByKey) or everything (via factById).
@@ -34,23 +35,26 @@ namespace rts {
 ///
 /// The cache can be used concurrently by multiple threads and is supposed to
 /// scale at least a little bit for hits. The hash maps are guarded by
-/// a read-write, write-priority lock and the LRU list by a mutex. Crucially,
-/// we don't update the LRU list on every access. Rather, we record all
-/// accesses in append-only, lossy buffers sharded by threads (cf. the Touched
-/// structure below). These get drained (in a not-really-LRU order) when we
-/// need to evict or when they become full. This (hopefully) minimises
-/// contention for read-only accesses. This is quite similar to what, e.g.,
-/// Java's Caffeine library does.
+/// a read-write, write-priority lock and the eviction order by a mutex.
+///
+/// Facts are evicted with the CLOCK algorithm, which approximates LRU. The
+/// facts are kept in a ring in insertion order and a hit only sets the mark
+/// of the fact (see Fact::mark), which is an atomic operation that needs no
+/// lock beyond the read lock for the index. To make room, the clock hand
+/// moves around the ring, evicting unmarked facts and clearing the mark of
+/// marked facts, which thereby get a second chance. Compared to an LRU list
+/// this saves the two pointers per fact of a doubly linked list (the ring
+/// costs one) and hits never contend on a lock.
+///
+/// If Options::max_idle is set, the hand also sweeps the whole ring once per
+/// max_idle, evicting every fact that hasn't been used since the previous
+/// sweep. Facts that are idle for between one and two periods are therefore
+/// evicted even if the cache isn't full.
 ///
-/// TODO: Switch to a variant of the Clock algorithm or something similar which
-///       lets us avoid a doubly linked list (which costs 2 pointers per fact).
-/// TODO: We probably want to remove facts which haven't been used for some time
-///       even if the cache isn't full.
 /// TODO: Say we cache the result of idByKey but then only ever do typeById
 ///       afterwards. This will keep the cache entry alive and we will never
 ///       get rid of the key even though it's not needed. We'll see how much
 ///       of a problem this is.
-/// TODO: We want to share one capacity between all db caches.
 struct LookupCache {
  public:
   // A Stats object can be shared between different caches which will accumulate
@@ -102,12 +106,9 @@ struct LookupCache {
     /// Max capacity
     size_t capacity;
 
-    /// Number of shards for Touched buffer - should typically be number of
-    /// threads.
-    size_t shards = folly::available_concurrency();
-
-    /// How many hits to record locally before draining them to global buffer.
-    size_t touched_buffer_size = 64 * 1024;
+    /// Evict facts which haven't been used for this long even if the cache
+    /// isn't full. Zero means never.
+    std::chrono::seconds max_idle = std::chrono::seconds::zero();
   };
 
   LookupCache(const Options& opts, std::shared_ptr<Stats> s);
@@ -117,14 +118,36 @@ struct LookupCache {
   LookupCache& operator=(const LookupCache&) = delete;
   LookupCache& operator=(LookupCache&&) = delete;
 
-  // Clear statistics
+  // Evict all facts
   void clear();
 
+  // Evict all facts which haven't been used since the last sweep, regardless
+  // of max_idle. This normally happens automatically on insert.
+  void evictIdle();
+
+  // Change the capacity, evicting facts if the cache is now too big. This is
+  // how the server divides one memory budget between the caches of all
+  // databases.
+  void setCapacity(size_t capacity);
+
+  // How much this cache is used, for deciding its share of a memory budget.
+  // Unlike Stats, which may be shared between caches, these belong to this
+  // cache only.
+  struct Usage {
+    size_t bytes; // size of the cached facts
+    size_t capacity;
+    uint64_t hits; // hits and misses since the last readUsage
+    uint64_t misses;
+  };
+
+  // Obtain an approximate snapshot of the usage and reset hits and misses.
+  Usage readUsage();
+
   // LookupCache paired with a base Lookup for looking up facts
   struct Anchor : Lookup {
     enum class ReplacementPolicy {
-      LRU, // evict least-recently-used entries
-      FIFO // evict the oldest entries. Faster with many concurrent clients.
+      LRU, // evict least-recently-used entries (approximately, see above)
+      FIFO // evict the oldest entries. Hits don't mark facts.
     };
     Anchor(
         Lookup* b,
@@ -213,77 +236,36 @@ struct LookupCache {
     Storage& operator=(const Storage&) = delete;
     ~Storage();
 
-    using iterator = Fact::intrusive_list::iterator;
-
-    iterator begin() {
-      return facts.begin();
-    }
-    iterator end() {
-      return facts.end();
-    }
-
     size_t factBytes() const {
       return bytes;
     }
     size_t factCount() const {
-      return count;
+      return ring.size();
     }
 
+    // Add a fact behind the clock hand, i.e., where it will be considered for
+    // eviction last.
     const Fact* push_back(Fact::unique_ptr fact);
-    Fact::unique_ptr release(const Fact* fact);
-    void touch(const Fact* fact);
-
-    class Range {
-     public:
-      const Fact* FOLLY_NULLABLE next() {
-        if (pos != finish) {
-          const auto fact = &*pos;
-          bytes += fact->size();
-          ++count;
-          ++pos;
-          return fact;
-        } else {
-          return nullptr;
-        }
-      }
-
-      bool empty() const {
-        return pos == finish;
-      }
-
-      size_t factBytes() const {
-        return bytes;
-      }
-      size_t factCount() const {
-        return count;
-      }
-
-     private:
-      Range(iterator s, iterator e)
-          : start(s), pos(s), finish(e), bytes(0), count(0) {}
-
-      friend class Storage;
-
-      iterator start;
-      iterator pos;
-      iterator finish;
-      size_t bytes;
-      size_t count;
-    };
 
-    Range start() {
-      return Range(begin(), end());
+    // The fact under the clock hand
+    const Fact* FOLLY_NULLABLE hand() const {
+      return ring.empty() ? nullptr : ring.front();
     }
 
-    void splice_to(
-        Fact::intrusive_list& list,
-        Fact::intrusive_list::iterator pos,
-        Range range);
+    // Remove the fact under the clock hand and advance the hand.
+    Fact::unique_ptr pop();
+
+    // Keep the fact under the clock hand and advance the hand.
+    void skip();
+
+    // When the last idle sweep happened
+    std::chrono::steady_clock::time_point last_sweep =
+        std::chrono::steady_clock::now();
 
    private:
-    Fact::intrusive_list facts;
+    // The facts in clock order - the front is under the hand
+    std::deque<const Fact*> ring;
     size_t bytes = 0;
-    size_t count = 0;
   };
   using SyncStorage = folly::Synchronized<Storage, std::mutex>;
   SyncStorage storage; // fact storage guarded by mutex
@@ -291,18 +273,12 @@ struct LookupCache {
   // NOTE: locking order is always Index then Storage, never the other way
   // round.
 
-  // Container for recording cache hits. This is intentionally very lossy as it
-  // can be written to by multiple threads without synchronisation.
-  struct alignas(folly::hardware_destructive_interference_size) Touched {
-    // Make things atomic for the unlikely case we're ever going to be running
-    // on something other than x86_64.
-    std::unique_ptr<std::atomic<const Fact*>[]> facts;
-    std::atomic<size_t> next{0};
-  };
-  std::vector<Touched> touched; // cache hits sharded by thread
-
   std::shared_ptr<Stats> stats; // statistics
 
+  // hits and misses of this cache, for Usage
+  folly::ThreadCachedInt<uint64_t> hits;
+  folly::ThreadCachedInt<uint64_t> misses;
+
   // Execute a function which updates the cache and updates statistics.
   template <typename F>
   inline void performUpdate(F&& f) {
@@ -328,31 +304,39 @@ struct LookupCache {
   // Insert a new fact into the cache.
   void insert(Fact::unique_ptr);
 
+  // Facts removed from the cache. They can only be freed while holding the
+  // delete_lock exclusively and should be freed after releasing the locks on
+  // the index and storage.
+  using Dead = std::vector<Fact::unique_ptr>;
+
   // Insert a new fact into the locked cache and move all evicted facts into
   // 'dead'.
   void insertOne(
       Index& index,
       Storage& storage,
       Fact::unique_ptr,
-      Fact::intrusive_list& dead);
+      Dead& dead);
 
   // Delete a fact from the locked index but not from the storage
   static void deleteFromIndex(Index& index, const Fact* fact);
 
-  // Record a hit on a particular fact. Note that the ownership of the read
-  // lock is passed to touch which will release it.
-  void touch(SyncIndex::RLockedPtr, const Fact*);
+  // Is the fact in the index? Facts which have been replaced by a fact with
+  // more data stay in the storage until the clock hand reaches them.
+  static bool isIndexed(const Index& index, const Fact* fact);
+
+  // Evict the fact under the clock hand if it is unmarked or no longer
+  // indexed and clear its mark otherwise, then advance the hand. Returns
+  // true if the fact was evicted.
+  static bool tick(Index& index, Storage& storage, Dead& dead);
 
   // Evict facts from the cache until we've freed up at least target bytes and
   // move evicted facts into 'dead'.
-  static void evict(
-      Index& index,
-      Storage& storage,
-      size_t target,
-      Fact::intrusive_list& dead);
+  static void
+  evict(Index& index, Storage& storage, size_t target, Dead& dead);
 
-  // Drain hits recorded in 'touched', updating the storage as necessary.
-  static void drain(Storage& storage, Touched& touched);
+  // Move the clock hand once around the ring, evicting the facts which
+  // haven't been used since the previous sweep.
+  static void sweep(Index& index, Storage& storage, Dead& dead);
 
   struct Inserter : Store {
     LookupCache& cache;
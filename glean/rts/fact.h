@@ -11,7 +11,7 @@
 #include "glean/rts/binary.h"
 #include "glean/rts/id.h"
 
-#include <boost/intrusive/list.hpp>
+#include <atomic>
 
 namespace facebook {
 namespace glean {
@@ -108,7 +108,9 @@ class Fact {
 
   Clause clause() const {
     return {
-        reinterpret_cast<const unsigned char*>(this + 1), key_size, value_size};
+        reinterpret_cast<const unsigned char*>(this + 1),
+        key_size(),
+        value_size};
   }
 
   Ref ref() const {
@@ -124,12 +126,31 @@ class Fact {
   }
 
   unsigned int tag() const {
-    return tag_;
+    return header.load(std::memory_order_relaxed) & TAG_MASK;
+  }
+
+  /// A flag which the owner of a fact can set and clear even while other
+  /// threads are reading the fact. The LookupCache uses it to record that a
+  /// fact has been accessed. It isn't part of the fact's value: it is ignored
+  /// by comparisons and is initially clear.
+  bool marked() const {
+    return header.load(std::memory_order_relaxed) & MARK;
+  }
+
+  void mark() const {
+    // avoid writing to a shared cache line if we can
+    if (!marked()) {
+      header.fetch_or(MARK, std::memory_order_relaxed);
+    }
+  }
+
+  void unmark() const {
+    header.fetch_and(~MARK, std::memory_order_relaxed);
   }
 
   bool operator==(const Fact& other) const {
     return id_ == other.id_ && type_ == other.type_ &&
-        key_size == other.key_size && value_size == other.value_size &&
+        key_size() == other.key_size() && value_size == other.value_size &&
         key() == other.key() && value() == other.value() &&
         tag() == other.tag();
   }
@@ -143,7 +164,7 @@ class Fact {
   }
 
   size_t size() const {
-    return size(key_size, value_size);
+    return size(key_size(), value_size);
   }
 
   void serialize(binary::Output& output) const {
@@ -171,14 +192,15 @@ class Fact {
 
   static unique_ptr create(Ref ref, unsigned int tag = 0) {
     // this should be checked earlier hence just an assert here
-    assert(ref.clause.key_size <= 0xFFFFFFF);
+    assert(ref.clause.key_size <= MAX_KEY_SIZE);
+    assert(tag <= TAG_MASK);
     const auto size = ref.clause.size();
     Fact* fact = static_cast<Fact*>(::operator new(sizeof(Fact) + size));
     new (fact) Fact();
     fact->id_ = ref.id;
     fact->type_ = ref.type;
-    fact->key_size = ref.clause.key_size;
-    fact->tag_ = tag;
+    fact->header.store(
+        (ref.clause.key_size << KEY_SHIFT) | tag, std::memory_order_relaxed);
     fact->value_size = ref.clause.value_size;
     // memcpy(p, 0, 0) is undefined behaviour according to the C standard,
     // apparently, and this gets flagged in debug mode
@@ -197,24 +219,26 @@ class Fact {
   Fact& operator=(const Fact&) = delete;
   Fact& operator=(Fact&&) = delete;
 
-  boost::intrusive::list_member_hook<> list_hook;
+  uint32_t key_size() const {
+    return header.load(std::memory_order_relaxed) >> KEY_SHIFT;
+  }
+
+  // The tag (bits 0-2), the mark (bit 3) and the key size (bits 4-31) share
+  // one word. Only the mark ever changes, but that can happen concurrently
+  // with reads so all accesses are atomic. std::atomic<uint32_t> has the same
+  // size as uint32_t so this doesn't make the fact any bigger.
+  static constexpr uint32_t TAG_MASK = 0x7;
+  static constexpr uint32_t MARK = 0x8;
+  static constexpr uint32_t KEY_SHIFT = 4;
+
   Id id_;
   Pid type_;
-  struct {
-    unsigned int tag_ : 4;
-    unsigned int key_size : 28;
-  };
+  mutable std::atomic<uint32_t> header;
   uint32_t value_size;
-
- public:
-  using intrusive_list = boost::intrusive::list<
-      Fact,
-      boost::intrusive::member_hook<
-          Fact,
-          boost::intrusive::list_member_hook<>,
-          &Fact::list_hook>>;
 };
 
+static_assert(sizeof(Fact) == 24, "Fact should only hold id, type and sizes");
+
 } // namespace rts
 } // namespace glean
 } // namespace facebook
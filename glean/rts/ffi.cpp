@@ -183,12 +183,13 @@ void glean_lookupcache_stats_read_and_reset_counters(
 
 const char* glean_lookupcache_new(
     size_t capacity,
-    size_t shards,
+    uint64_t max_idle_seconds,
     SharedLookupCacheStats* stats,
     LookupCache** cache) {
   return ffi::wrap([=] {
-    *cache =
-        new LookupCache(LookupCache::Options{capacity, shards}, stats->value);
+    *cache = new LookupCache(
+        LookupCache::Options{capacity, std::chrono::seconds(max_idle_seconds)},
+        stats->value);
   });
 }
 
@@ -200,6 +201,25 @@ const char* glean_lookupcache_clear(LookupCache* cache) {
   return ffi::wrap([=] { cache->clear(); });
 }
 
+const char* glean_lookupcache_set_capacity(
+    LookupCache* cache,
+    size_t capacity) {
+  return ffi::wrap([=] { cache->setCapacity(capacity); });
+}
+
+void glean_lookupcache_read_usage(
+    LookupCache* cache,
+    uint64_t* bytes,
+    uint64_t* capacity,
+    uint64_t* hits,
+    uint64_t* misses) {
+  const auto usage = cache->readUsage();
+  *bytes = usage.bytes;
+  *capacity = usage.capacity;
+  *hits = usage.hits;
+  *misses = usage.misses;
+}
+
 const char* glean_lookupcache_anchor_new(
     Lookup* base,
     LookupCache* cache,
@@ -266,6 +286,68 @@ const char* glean_query_execute_compiled(
   });
 }
 
+const char* glean_query_stream_new(
+    Inventory* inventory,
+    Define* facts,
+    DefineOwnership* ownership,
+    SharedSubroutine* sub,
+    uint64_t pid,
+    SharedSubroutine* traverse,
+    uint64_t max_set_size,
+    uint64_t depth,
+    uint64_t* expand_pids,
+    uint64_t num_expand_pids,
+    uint64_t want_stats,
+    QueryStream** stream) {
+  return ffi::wrap([=]() {
+    std::unordered_set<Pid, folly::hasher<Pid>> expandPids;
+    if (expand_pids) {
+      expandPids = std::unordered_set<Pid, folly::hasher<Pid>>(
+          reinterpret_cast<Pid*>(expand_pids),
+          reinterpret_cast<Pid*>(expand_pids) + num_expand_pids);
+    }
+    *stream = streamQuery(
+                  *inventory,
+                  *facts,
+                  ownership,
+                  sub->value,
+                  Pid::fromWord(pid),
+                  traverse ? traverse->value : nullptr,
+                  max_set_size == 0 ? folly::none
+                                    : folly::Optional<uint64_t>(max_set_size),
+                  static_cast<Depth>(depth),
+                  std::move(expandPids),
+                  want_stats)
+                  .release();
+  });
+}
+
+void glean_query_stream_free(QueryStream* stream) {
+  ffi::free_(stream);
+}
+
+const char* glean_query_stream_next(
+    QueryStream* stream,
+    uint64_t max_results,
+    uint64_t max_bytes,
+    uint64_t max_time_ms,
+    QueryResults** presults,
+    int* done) {
+  return ffi::wrap([=]() {
+    *presults =
+        stream
+            ->next(
+                max_results == 0 ? folly::none
+                                 : folly::Optional<uint64_t>(max_results),
+                max_bytes == 0 ? folly::none
+                               : folly::Optional<uint64_t>(max_bytes),
+                max_time_ms == 0 ? folly::none
+                                 : folly::Optional<uint64_t>(max_time_ms))
+            .release();
+    *done = stream->done();
+  });
+}
+
 const char* glean_query_restart_compiled(
     Inventory* inventory,
     Define* facts,
@@ -325,6 +407,29 @@ const char* glean_lookup_first_free_id(Lookup* lookup, int64_t* id) {
   return ffi::wrap([=] { *id = lookup->firstFreeId().toThrift(); });
 }
 
+const char* glean_lookup_sample_ids(
+    Lookup* lookup,
+    int64_t pid,
+    size_t max,
+    glean_fact_id_t** ids,
+    size_t* count) {
+  return ffi::wrap([=] {
+    std::vector<glean_fact_id_t> found;
+    auto iter = lookup->seek(Pid::fromThrift(pid), {});
+    while (found.size() < max) {
+      auto ref = iter->get(FactIterator::Demand::KeyOnly);
+      if (!ref) {
+        break;
+      }
+      found.push_back(ref.id.toThrift());
+      iter->next();
+    }
+    auto arr = ffi::malloc_array<glean_fact_id_t>(found.size());
+    std::copy(found.begin(), found.end(), arr.get());
+    arr.release_to(ids, count);
+  });
+}
+
 const char* glean_lookup_fact(
     Lookup* lookup,
     int64_t id,
@@ -50,6 +50,7 @@ typedef struct LookupCache LookupCache;
 typedef struct Predicate Predicate;
 typedef struct Substitution Substitution;
 typedef struct QueryResults QueryResults;
+typedef struct QueryStream QueryStream;
 typedef struct OwnershipUnitIterator OwnershipUnitIterator;
 typedef struct DerivedFactOwnershipIterator DerivedFactOwnershipIterator;
 typedef struct Ownership Ownership;
@@ -155,11 +156,20 @@ void glean_lookupcache_stats_read_and_reset_counters(
 
 const char* glean_lookupcache_new(
     size_t capacity,
-    size_t shards,
+    uint64_t max_idle_seconds,
     SharedLookupCacheStats* stats,
     LookupCache** cache);
 void glean_lookupcache_free(LookupCache* cache);
 const char* glean_lookupcache_clear(LookupCache* cache);
+const char* glean_lookupcache_set_capacity(
+    LookupCache* cache,
+    size_t capacity);
+void glean_lookupcache_read_usage(
+    LookupCache* cache,
+    uint64_t* bytes,
+    uint64_t* capacity,
+    uint64_t* hits,
+    uint64_t* misses);
 
 const char* glean_lookupcache_anchor_new(
     Lookup* base,
@@ -201,11 +211,44 @@ const char* glean_query_restart_compiled(
     uint64_t want_stats,
     QueryResults** results);
 
+const char* glean_query_stream_new(
+    Inventory* inventory,
+    Define* facts,
+    DefineOwnership* ownership,
+    SharedSubroutine* sub,
+    uint64_t pid,
+    SharedSubroutine* traverse,
+    uint64_t max_set_size,
+    uint64_t recursive,
+    uint64_t* expand_pids,
+    uint64_t num_expand_pids,
+    uint64_t want_stats,
+    QueryStream** stream);
+
+void glean_query_stream_free(QueryStream* stream);
+
+const char* glean_query_stream_next(
+    QueryStream* stream,
+    uint64_t max_results,
+    uint64_t max_bytes,
+    uint64_t max_time_ms,
+    QueryResults** results,
+    int* done);
+
 void glean_lookup_free(Lookup* lookup);
 
 const char* glean_lookup_starting_id(Lookup* lookup, int64_t* id);
 const char* glean_lookup_first_free_id(Lookup* lookup, int64_t* id);
 
+// The IDs of the first facts of a predicate in key order, at most max
+// of them
+const char* glean_lookup_sample_ids(
+    Lookup* lookup,
+    int64_t pid,
+    size_t max,
+    glean_fact_id_t** ids,
+    size_t* count);
+
 const char* glean_lookup_fact(
     Lookup* lookup,
     int64_t id,
@@ -8,6 +8,7 @@
 
 #include <atomic>
 #include <chrono>
+#include <utility>
 
 #include <folly/Chrono.h>
 #include <folly/stop_watch.h>
@@ -200,6 +201,17 @@ struct QueryExecutor : SetOps {
   //
   std::unique_ptr<QueryResults> finish(folly::Optional<SerializedCont> cont);
 
+  //
+  // Start collecting the next page of results after finish(), when the
+  // query is resumed in place (see QueryStream).
+  //
+  void nextPage();
+
+  //
+  // Set the time limit for executing the query (or the next page)
+  //
+  void setTimeout(folly::Optional<uint64_t> maxTime);
+
   // ------------------------------------------------------------
   // Below here: query state
 
@@ -529,6 +541,84 @@ std::unique_ptr<QueryResults> QueryExecutor::finish(
   return res;
 }
 
+void QueryExecutor::nextPage() {
+  // The vectors have been moved from, which leaves them in a valid but
+  // unspecified state. Results are deduplicated within a page only, as
+  // with restartQuery, so that a stream's memory is bounded by its page
+  // size rather than by the total number of results.
+  results_added.clear();
+  result_ids.clear();
+  result_pids.clear();
+  result_keys.clear();
+  result_values.clear();
+  nested_results_added.clear();
+  nested_result_ids.clear();
+  nested_result_pids.clear();
+  nested_result_keys.clear();
+  nested_result_values.clear();
+  stats.clear();
+  result_bytes = 0;
+  watch.reset();
+}
+
+void QueryExecutor::setTimeout(folly::Optional<uint64_t> maxTime) {
+  // coarse_steady_clock is around 1ms granularity which is enough for us.
+  timeout = Clock::now();
+  if (maxTime) {
+    timeout += std::chrono::milliseconds{*maxTime};
+    check_timeout = CHECK_TIMEOUT_INTERVAL;
+  } else {
+    check_timeout = UINT64_MAX;
+  }
+}
+
+// The system calls available to the query subroutine
+auto querySysCalls(QueryExecutor& q) {
+  // IF YOU BREAK BACKWARD COMPATIBILITY HERE, BUMP version IN
+  // Glean.Bytecode.Generate.Instruction
+  //
+  // IF YOU ALSO BREAK FORWARD COMPATIBILITY, BUMP lowestSupportedVersion AS
+  // WELL
+
+  return syscalls<
+      &QueryExecutor::seek,
+      &QueryExecutor::seekWithinSection,
+      &QueryExecutor::currentSeek,
+      &QueryExecutor::endSeek,
+      &QueryExecutor::next,
+      &QueryExecutor::lookupKeyValue,
+      &QueryExecutor::result,
+      &QueryExecutor::resultWithPid,
+      &QueryExecutor::newDerivedFact,
+      &QueryExecutor::firstFreeId,
+      &QueryExecutor::newSet,
+      &QueryExecutor::insertOutputSet,
+      &QueryExecutor::setToArray,
+      &QueryExecutor::freeSet,
+      &QueryExecutor::newWordSet,
+      &QueryExecutor::insertWordSet,
+      &QueryExecutor::wordSetToArray,
+      &QueryExecutor::byteSetToByteArray,
+      &QueryExecutor::freeWordSet>(q);
+}
+
+// Supply the arguments of the query subroutine, returning a pointer to the
+// max_results and max_bytes registers.
+template <typename Context>
+uint64_t* queryArgs(
+    Subroutine::Activation& activation,
+    const Context& context,
+    uint64_t max_results,
+    uint64_t max_bytes) {
+  auto args = activation.args();
+  args = std::copy(context.handlers_begin(), context.handlers_end(), args);
+  *args++ = 0; // unused
+  uint64_t* limits = args;
+  *args++ = max_results;
+  *args++ = max_bytes;
+  return limits;
+}
+
 std::unique_ptr<QueryResults> executeQuery(
     Inventory& inventory,
     Define& facts,
@@ -558,45 +648,13 @@ std::unique_ptr<QueryResults> executeQuery(
       std::move(iters),
       maxSetSize ? *maxSetSize : UINT64_MAX);
 
-  // coarse_steady_clock is around 1ms granularity which is enough for us.
-  q.timeout = Clock::now();
   q.start_time = Clock::now();
-  if (maxTime) {
-    q.timeout += std::chrono::milliseconds{*maxTime};
-    q.check_timeout = CHECK_TIMEOUT_INTERVAL;
-  } else {
-    q.check_timeout = UINT64_MAX;
-  }
+  q.setTimeout(maxTime);
 
   auto max_results = maxResults ? *maxResults : UINT64_MAX;
   auto max_bytes = maxBytes ? *maxBytes : UINT64_MAX;
 
-  // IF YOU BREAK BACKWARD COMPATIBILITY HERE, BUMP version IN
-  // Glean.Bytecode.Generate.Instruction
-  //
-  // IF YOU ALSO BREAK FORWARD COMPATIBILITY, BUMP lowestSupportedVersion AS
-  // WELL
-
-  const auto context_ = syscalls<
-      &QueryExecutor::seek,
-      &QueryExecutor::seekWithinSection,
-      &QueryExecutor::currentSeek,
-      &QueryExecutor::endSeek,
-      &QueryExecutor::next,
-      &QueryExecutor::lookupKeyValue,
-      &QueryExecutor::result,
-      &QueryExecutor::resultWithPid,
-      &QueryExecutor::newDerivedFact,
-      &QueryExecutor::firstFreeId,
-      &QueryExecutor::newSet,
-      &QueryExecutor::insertOutputSet,
-      &QueryExecutor::setToArray,
-      &QueryExecutor::freeSet,
-      &QueryExecutor::newWordSet,
-      &QueryExecutor::insertWordSet,
-      &QueryExecutor::wordSetToArray,
-      &QueryExecutor::byteSetToByteArray,
-      &QueryExecutor::freeWordSet>(q);
+  const auto context_ = querySysCalls(q);
 
   folly::Optional<SerializedCont> cont;
   Subroutine::Activation::with(
@@ -607,24 +665,98 @@ std::unique_ptr<QueryResults> executeQuery(
           activation.start();
         }
 
-        auto args = activation.args();
-        args =
-            std::copy(context_.handlers_begin(), context_.handlers_end(), args);
-        *args++ = 0; // unused
-        *args++ = reinterpret_cast<uint64_t>(max_results);
-        uint64_t* max_bytes_p = args;
-        *args++ = reinterpret_cast<uint64_t>(max_bytes);
+        uint64_t* limits =
+            queryArgs(activation, context_, max_results, max_bytes);
 
         activation.execute();
         if (activation.suspended()) {
           cont = q.queryCont(activation);
         }
 
-        q.result_bytes = max_bytes - *max_bytes_p;
+        q.result_bytes = max_bytes - limits[1];
       });
 
   return q.finish(std::move(cont));
 }
+
+struct QueryStreamImpl final : QueryStream {
+  QueryStreamImpl(
+      Inventory& inventory,
+      Define& facts,
+      DefineOwnership* ownership,
+      std::shared_ptr<Subroutine> s,
+      Pid pid,
+      std::shared_ptr<Subroutine> traverse,
+      folly::Optional<uint64_t> maxSetSize,
+      Depth depth,
+      std::unordered_set<Pid, folly::hasher<Pid>> pids,
+      bool wantStats)
+      : sub(std::move(s)),
+        expandPids(std::move(pids)),
+        q(inventory,
+          facts,
+          ownership,
+          *sub,
+          pid,
+          std::move(traverse),
+          depth,
+          expandPids,
+          wantStats,
+          {},
+          maxSetSize ? *maxSetSize : UINT64_MAX),
+        context(querySysCalls(q)),
+        activation(
+            Subroutine::Activation::create(*sub, context.contextptr())) {
+    q.start_time = Clock::now();
+    activation->start();
+    limits = queryArgs(*activation, context, 0, 0);
+  }
+
+  std::unique_ptr<QueryResults> next(
+      folly::Optional<uint64_t> maxResults,
+      folly::Optional<uint64_t> maxBytes,
+      folly::Optional<uint64_t> maxTime) override {
+    if (finished) {
+      error("query stream has already finished");
+    }
+    q.setTimeout(maxTime);
+    const auto max_bytes = maxBytes ? *maxBytes : UINT64_MAX;
+    limits[0] = maxResults ? *maxResults : UINT64_MAX;
+    limits[1] = max_bytes;
+
+    // Resume where the previous page suspended the query
+    activation->execute();
+
+    folly::Optional<QueryExecutor::SerializedCont> cont;
+    if (!activation->suspended()) {
+      finished = true;
+    } else if (q.interrupted()) {
+      // Every attempt to continue would be interrupted again, so hand the
+      // state over for restartQuery.
+      cont = q.queryCont(*activation);
+      finished = true;
+    }
+
+    q.result_bytes = max_bytes - limits[1];
+    auto results = q.finish(std::move(cont));
+    q.nextPage();
+    return results;
+  }
+
+  bool done() const override {
+    return finished;
+  }
+
+  std::shared_ptr<Subroutine> sub;
+  std::unordered_set<Pid, folly::hasher<Pid>> expandPids;
+  QueryExecutor q;
+  // the activation refers to this, so it must live as long
+  decltype(querySysCalls(std::declval<QueryExecutor&>())) context;
+  Subroutine::Activation::unique_ptr activation;
+  uint64_t* limits; // max_results and max_bytes in the activation's frame
+  bool finished = false;
+};
+
 } // namespace
 
 void interruptRunningQueries() {
@@ -776,6 +908,30 @@ std::unique_ptr<QueryResults> executeQuery(
       {});
 }
 
+std::unique_ptr<QueryStream> streamQuery(
+    Inventory& inventory,
+    Define& facts,
+    DefineOwnership* ownership,
+    std::shared_ptr<Subroutine> sub,
+    Pid pid,
+    std::shared_ptr<Subroutine> traverse,
+    folly::Optional<uint64_t> maxSetSize,
+    Depth depth,
+    std::unordered_set<Pid, folly::hasher<Pid>> expandPids,
+    bool wantStats) {
+  return std::make_unique<QueryStreamImpl>(
+      inventory,
+      facts,
+      ownership,
+      std::move(sub),
+      pid,
+      std::move(traverse),
+      maxSetSize,
+      depth,
+      std::move(expandPids),
+      wantStats);
+}
+
 } // namespace rts
 } // namespace glean
 } // namespace facebook
@@ -70,6 +70,38 @@ std::unique_ptr<QueryResults> restartQuery(
     void* serializedCont,
     uint64_t serializedContLen);
 
+/// A query which produces its results one page at a time. The executor, its
+/// fact iterators and the suspended bytecode activation stay alive between
+/// pages, so unlike restartQuery, the next page doesn't need to deserialize a
+/// continuation and seek the fact iterators again. The Inventory, Define and
+/// DefineOwnership must outlive the QueryStream.
+struct QueryStream {
+  virtual ~QueryStream() = default;
+
+  /// Run the query until it has produced the next page of results, finished
+  /// or run out of time. The results have a continuation (for restartQuery)
+  /// only if the query was interrupted, which also ends the stream.
+  virtual std::unique_ptr<QueryResults> next(
+      folly::Optional<uint64_t> maxResults,
+      folly::Optional<uint64_t> maxBytes,
+      folly::Optional<uint64_t> maxTime) = 0;
+
+  /// Has the query produced its last page?
+  virtual bool done() const = 0;
+};
+
+std::unique_ptr<QueryStream> streamQuery(
+    Inventory& inventory,
+    Define& facts,
+    DefineOwnership* ownership,
+    std::shared_ptr<Subroutine> sub,
+    Pid pid,
+    std::shared_ptr<Subroutine> traverse,
+    folly::Optional<uint64_t> maxSetSize,
+    Depth depth,
+    std::unordered_set<Pid, folly::hasher<Pid>> expandPids,
+    bool wantStats);
+
 void interruptRunningQueries();
 } // namespace rts
 } // namespace glean
@@ -7,7 +7,11 @@
  */
 
 #include <gtest/gtest.h>
+#include <chrono>
+#include <list>
+#include <random>
 #include <thread>
+#include <unordered_map>
 
 #include "glean/rts/cache.h"
 
@@ -127,17 +131,15 @@ struct CacheTest : testing::Test {
     base = std::make_unique<Base>(std::forward<Base>(b));
     LookupCache::Options opts;
     opts.capacity = 5 * 1024;
-    opts.touched_buffer_size = 128;
     init(opts);
     cache = std::make_unique<LookupCache>(opts, stats);
     lookup = std::make_unique<LookupCache::Anchor>(cache->anchor(base.get()));
   }
 
-  void typeById_miss(size_t miss, size_t shards);
+  void typeById_miss(size_t miss);
 
   TrackingLookup* setupTracking(
       size_t capacity = 10 * 1024,
-      size_t shards = 1,
       bool returnEmpty = false) {
     auto tracking = std::make_unique<TrackingLookup>();
     tracking->returnEmpty = returnEmpty;
@@ -146,8 +148,6 @@ struct CacheTest : testing::Test {
     base = std::move(tracking);
     LookupCache::Options opts;
     opts.capacity = capacity;
-    opts.shards = shards;
-    opts.touched_buffer_size = 128;
     cache = std::make_unique<LookupCache>(opts, stats);
     lookup = std::make_unique<LookupCache::Anchor>(cache->anchor(trackPtr));
     return trackPtr;
@@ -178,8 +178,8 @@ void concurrently(F&& f) {
   }
 }
 
-void CacheTest::typeById_miss(size_t miss, size_t shards) {
-  setup(ConstantLookup(), [&](auto& opts) { opts.shards = shards; });
+void CacheTest::typeById_miss(size_t miss) {
+  setup(ConstantLookup(), [](auto&) {});
 
   constexpr size_t N = 10000;
   concurrently([&](size_t t) {
@@ -190,43 +190,17 @@ void CacheTest::typeById_miss(size_t miss, size_t shards) {
   });
 }
 
-TEST_F(CacheTest, typeById_miss_100_8) {
-  typeById_miss(10, 8);
+TEST_F(CacheTest, typeById_miss_100) {
+  typeById_miss(10);
 }
-TEST_F(CacheTest, typeById_miss_90_8) {
-  typeById_miss(9, 8);
+TEST_F(CacheTest, typeById_miss_90) {
+  typeById_miss(9);
 }
-TEST_F(CacheTest, typeById_miss_50_8) {
-  typeById_miss(5, 8);
+TEST_F(CacheTest, typeById_miss_50) {
+  typeById_miss(5);
 }
-TEST_F(CacheTest, typeById_miss_10_8) {
-  typeById_miss(1, 8);
-}
-
-TEST_F(CacheTest, typeById_miss_100_2) {
-  typeById_miss(10, 2);
-}
-TEST_F(CacheTest, typeById_miss_90_2) {
-  typeById_miss(9, 2);
-}
-TEST_F(CacheTest, typeById_miss_50_2) {
-  typeById_miss(5, 2);
-}
-TEST_F(CacheTest, typeById_miss_10_2) {
-  typeById_miss(1, 2);
-}
-
-TEST_F(CacheTest, typeById_miss_100_0) {
-  typeById_miss(10, 0);
-}
-TEST_F(CacheTest, typeById_miss_90_0) {
-  typeById_miss(9, 0);
-}
-TEST_F(CacheTest, typeById_miss_50_0) {
-  typeById_miss(5, 0);
-}
-TEST_F(CacheTest, typeById_miss_10_0) {
-  typeById_miss(1, 0);
+TEST_F(CacheTest, typeById_miss_10) {
+  typeById_miss(1);
 }
 
 TEST_F(CacheTest, upgrade) {
@@ -291,7 +265,7 @@ TEST_F(CacheTest, TypeByIdHitRecordsStats) {
 }
 
 TEST_F(CacheTest, TypeByIdFailureRecordsStats) {
-  setupTracking(10 * 1024, 1, true);
+  setupTracking(10 * 1024, true);
   auto type = lookup->typeById(Id::lowest());
   EXPECT_EQ(type, Pid::invalid());
   auto s = stats->read();
@@ -318,7 +292,7 @@ TEST_F(CacheTest, FactByIdMissAndHitRecordsStats) {
 }
 
 TEST_F(CacheTest, FactByIdFailureRecordsStats) {
-  setupTracking(10 * 1024, 1, true);
+  setupTracking(10 * 1024, true);
   bool found = lookup->factById(Id::lowest(), [](Pid, Fact::Clause) {});
   EXPECT_FALSE(found);
   auto s = stats->read();
@@ -341,7 +315,7 @@ TEST_F(CacheTest, IdByKeyMissAndHitRecordsStats) {
 }
 
 TEST_F(CacheTest, IdByKeyFailureRecordsStats) {
-  setupTracking(10 * 1024, 1, true);
+  setupTracking(10 * 1024, true);
   unsigned char keyData[] = "testkey";
   folly::ByteRange key(keyData, 7);
   auto id = lookup->idByKey(Pid::lowest(), key);
@@ -446,12 +420,191 @@ TEST_F(CacheTest, FactTooLargeForCacheIsNotInserted) {
   EXPECT_EQ(s[LookupCache::Stats::typeById_misses], 2);
 }
 
-TEST_F(CacheTest, ZeroShardsUsesDirectTouch) {
-  setupTracking(10 * 1024, 0);
+TEST_F(CacheTest, MarkedFactsGetSecondChance) {
+  // room for exactly 10 facts with just a type
+  auto* trackPtr = setupTracking(10 * Fact::size(0, 0));
+  for (size_t i = 0; i < 10; ++i) {
+    lookup->typeById(Id::lowest() + i);
+  }
+  // evicts 0 and 1 to get down to 90% of capacity, everything else is
+  // unmarked now
+  lookup->typeById(Id::lowest() + 10);
+  // mark 2
+  lookup->typeById(Id::lowest() + 2);
+  lookup->typeById(Id::lowest() + 11);
+  // 2 gets a second chance, 3 and 4 are evicted
+  lookup->typeById(Id::lowest() + 12);
+  EXPECT_EQ(trackPtr->typeByIdCalls, 13);
+
+  lookup->typeById(Id::lowest() + 2);
+  lookup->typeById(Id::lowest() + 5);
+  EXPECT_EQ(trackPtr->typeByIdCalls, 13);
+  lookup->typeById(Id::lowest() + 3);
+  EXPECT_EQ(trackPtr->typeByIdCalls, 14);
+  auto s = stats->read();
+  EXPECT_EQ(s[LookupCache::Stats::factCount], 10);
+  EXPECT_EQ(s[LookupCache::Stats::factBytes], 10 * Fact::size(0, 0));
+}
+
+TEST_F(CacheTest, EvictIdleEvictsUnusedFacts) {
+  auto* trackPtr = setupTracking();
+  for (size_t i = 0; i < 10; ++i) {
+    lookup->typeById(Id::lowest() + i);
+  }
+  // new facts survive the first sweep
+  cache->evictIdle();
+  EXPECT_EQ(stats->read()[LookupCache::Stats::factCount], 10);
+  for (size_t i = 0; i < 5; ++i) {
+    lookup->typeById(Id::lowest() + i);
+  }
+  cache->evictIdle();
+  auto s = stats->read();
+  EXPECT_EQ(s[LookupCache::Stats::factCount], 5);
+  EXPECT_EQ(s[LookupCache::Stats::factBytes], 5 * Fact::size(0, 0));
+  EXPECT_EQ(trackPtr->typeByIdCalls, 10);
   lookup->typeById(Id::lowest());
-  auto type = lookup->typeById(Id::lowest());
-  EXPECT_EQ(type, Pid::lowest());
+  EXPECT_EQ(trackPtr->typeByIdCalls, 10);
+  lookup->typeById(Id::lowest() + 9);
+  EXPECT_EQ(trackPtr->typeByIdCalls, 11);
+}
+
+TEST_F(CacheTest, EvictIdleEvictsReplacedFacts) {
+  setupTracking();
+  lookup->typeById(Id::lowest());
+  lookup->factById(Id::lowest(), [](Pid, Fact::Clause) {});
+  // the fact with just the type stays until the hand reaches it
+  EXPECT_EQ(stats->read()[LookupCache::Stats::factCount], 2);
+  cache->evictIdle();
+  EXPECT_EQ(stats->read()[LookupCache::Stats::factCount], 1);
+  bool found = lookup->factById(Id::lowest(), [](Pid, Fact::Clause) {});
+  EXPECT_TRUE(found);
+  EXPECT_EQ(stats->read()[LookupCache::Stats::factById_hits], 1);
+}
+
+TEST_F(CacheTest, ClearEvictsEverything) {
+  auto* trackPtr = setupTracking();
+  for (size_t i = 0; i < 10; ++i) {
+    lookup->factById(Id::lowest() + i, [](Pid, Fact::Clause) {});
+  }
+  cache->clear();
   auto s = stats->read();
-  EXPECT_EQ(s[LookupCache::Stats::typeById_hits], 1);
-  EXPECT_EQ(s[LookupCache::Stats::typeById_misses], 1);
+  EXPECT_EQ(s[LookupCache::Stats::factCount], 0);
+  EXPECT_EQ(s[LookupCache::Stats::factBytes], 0);
+  lookup->factById(Id::lowest(), [](Pid, Fact::Clause) {});
+  EXPECT_EQ(trackPtr->factByIdCalls, 11);
+}
+
+TEST_F(CacheTest, SetCapacityEvicts) {
+  setupTracking();
+  for (size_t i = 0; i < 20; ++i) {
+    lookup->typeById(Id::lowest() + i);
+  }
+  cache->setCapacity(256);
+  EXPECT_LE(cache->readUsage().bytes, 256);
+  EXPECT_EQ(cache->readUsage().capacity, 256);
+  for (size_t i = 20; i < 40; ++i) {
+    lookup->typeById(Id::lowest() + i);
+  }
+  EXPECT_LE(stats->read()[LookupCache::Stats::factBytes], 256);
+}
+
+TEST_F(CacheTest, ReadUsageCountsHitsAndMisses) {
+  setupTracking();
+  lookup->typeById(Id::lowest());
+  lookup->typeById(Id::lowest());
+  lookup->typeById(Id::lowest() + 1);
+  auto usage = cache->readUsage();
+  EXPECT_EQ(usage.hits, 1);
+  EXPECT_EQ(usage.misses, 2);
+  EXPECT_GT(usage.bytes, 0);
+  usage = cache->readUsage();
+  EXPECT_EQ(usage.hits, 0);
+  EXPECT_EQ(usage.misses, 0);
+}
+
+namespace {
+
+// A skewed trace of fact ids, where low ids are much more popular
+std::vector<Id> skewedTrace(size_t ids, size_t length) {
+  std::mt19937 gen(42);
+  std::uniform_real_distribution<double> uniform(0, 1);
+  std::vector<Id> trace;
+  trace.reserve(length);
+  for (size_t i = 0; i < length; ++i) {
+    const auto u = uniform(gen);
+    trace.push_back(Id::lowest() + static_cast<size_t>(ids * u * u * u));
+  }
+  return trace;
+}
+
+// The hit rate of an exact LRU cache holding 'capacity' facts
+double lruHitRate(const std::vector<Id>& trace, size_t capacity) {
+  std::list<Id> order;
+  std::unordered_map<Id, std::list<Id>::iterator, folly::hasher<Id>> cached;
+  size_t hits = 0;
+  for (auto id : trace) {
+    auto i = cached.find(id);
+    if (i != cached.end()) {
+      ++hits;
+      order.splice(order.end(), order, i->second);
+    } else {
+      cached.emplace(id, order.insert(order.end(), id));
+      if (cached.size() > capacity) {
+        cached.erase(order.front());
+        order.pop_front();
+      }
+    }
+  }
+  return static_cast<double>(hits) / trace.size();
+}
+
+} // namespace
+
+// Compares the CLOCK policy with the exact LRU order which the cache used to
+// approximate with a linked list, and reports the time per lookup. For
+// numbers that mean something, run this in an optimised build.
+TEST_F(CacheTest, ClockBenchmark) {
+  constexpr size_t FACTS = 1000;
+  const auto trace = skewedTrace(10 * FACTS, 200 * FACTS);
+  setupTracking(FACTS * Fact::size(0, 0));
+
+  const auto start = std::chrono::steady_clock::now();
+  for (auto id : trace) {
+    lookup->typeById(id);
+  }
+  const std::chrono::duration<double, std::nano> elapsed =
+      std::chrono::steady_clock::now() - start;
+
+  auto s = stats->read();
+  const auto clock =
+      static_cast<double>(s[LookupCache::Stats::typeById_hits]) / trace.size();
+  const auto lru = lruHitRate(trace, FACTS);
+  RecordProperty("clock_hit_rate", std::to_string(clock));
+  RecordProperty("lru_hit_rate", std::to_string(lru));
+  RecordProperty(
+      "ns_per_lookup", std::to_string(elapsed.count() / trace.size()));
+
+  // CLOCK only approximates LRU, and evicts down to 90% of the capacity
+  EXPECT_GT(clock, lru - 0.05);
+
+  // concurrent hits don't take any exclusive locks
+  setup(ConstantLookup(), [&](auto& opts) {
+    opts.capacity = FACTS * Fact::size(0, 0);
+  });
+  for (size_t i = 0; i < FACTS / 2; ++i) {
+    lookup->typeById(Id::lowest() + i);
+  }
+  const auto hits_start = std::chrono::steady_clock::now();
+  concurrently([&](size_t t) {
+    for (size_t i = 0; i < 100 * FACTS; ++i) {
+      lookup->typeById(Id::lowest() + (t * 7 + i) % (FACTS / 2));
+    }
+  });
+  const std::chrono::duration<double, std::nano> hits_elapsed =
+      std::chrono::steady_clock::now() - hits_start;
+  RecordProperty(
+      "ns_per_concurrent_hit",
+      std::to_string(hits_elapsed.count() / (8 * 100 * FACTS)));
+  EXPECT_EQ(
+      stats->read()[LookupCache::Stats::typeById_hits], 8 * 100 * FACTS);
 }
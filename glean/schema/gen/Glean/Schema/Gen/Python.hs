@@ -33,12 +33,19 @@ genSchemaPy
   -> Maybe Oncall
   -> [(FilePath,Text)]
 genSchemaPy _version preddefs typedefs oncall =
-  ( "py" </> "TARGETS", genTargets declsPerNamespace extraImports oncall):
+  ( "py" </> "TARGETS",
+    genTargets declsPerNamespace extraImports withDummies oncall):
   ( "py" </> "glean_schema_predicate.py", -- base class shared between schemas
   Text.unlines
   [ "# \x40generated"
   , "# To regenerate this file run fbcode//glean/schema/gen/sync"
-  , "from typing import Generic, Optional, TypeVar"
+  , "import ast"
+  , "import functools"
+  , "import importlib"
+  , "import json"
+  , "import sys"
+  , "from typing import (Callable, Dict, Generic, List, Optional, Sequence,"
+  , "  Tuple, TypeVar)"
   , "from thrift.py3.types import Struct"
   , ""
   , "# Pyre expects a Fact to be bound to a Struct in GleanClient. For our " <>
@@ -87,17 +94,196 @@ genSchemaPy _version preddefs typedefs oncall =
   , "  " <> " be None. Used in generated Glean schema predicates to"
   , "  " <> " explicitly handle optional parameters in query definitions."
   , "  " <> "\"\"\""
-  , "  " <> "just: T | None = None"
+  , "  " <> "__slots__ = (\"just\",)"
+  , "  " <> "just: T | None"
   , "  " <> "def __init__(self, just: T | None = None) -> None:"
   , "    " <> "self.just = just"
   , "  " <> "def get(self) -> Optional[T]:"
   , "    " <> "return self.just"
+  , ""
+  , "# A field of a build_angle call: its Angle name (None for a predicate"
+  , "# without a record key) and the expression given for it"
+  , "AngleField = Tuple[Optional[str], Optional[ast.expr]]"
+  , ""
+  , "# The largest nat"
+  , "_MAX_NAT = 2 ** 64 - 1"
+  , ""
+  , "# Values used to find where a field's value is in its rendering"
+  , "_STRING_MARKER = \"\\x00glean-angle-literal\\x00\""
+  , "_NAT_MARKER = 18446744073709551557"
+  , ""
+  , "class _AngleTemplate:"
+  , "  " <> "\"\"\"Query of one build_angle call site and argument shape."
+  , ""
+  , "  " <> "Each item is one of: a field given as a constant, rendered"
+  , "  " <> "when the template is built; a (prefix, index, suffix) hole for"
+  , "  " <> "a field bound to a string or nat, which is filled in with the"
+  , "  " <> "quoted value on each call; or the index of a field that is"
+  , "  " <> "rendered on each call."
+  , "  " <> "\"\"\""
+  , "  " <> "__slots__ = (\"predicate\", \"record\", \"items\", \"text\")"
+  , ""
+  , "  " <> "def __init__("
+  , "    " <> "self,"
+  , "    " <> "predicate: str,"
+  , "    " <> "record: bool,"
+  , "    " <> "items: Sequence[object],"
+  , "  " <> ") -> None:"
+  , "    " <> "self.predicate = predicate"
+  , "    " <> "self.record = record"
+  , "    " <> "self.items = items"
+  , "    " <> "# without holes or dynamic fields, every call gets the same text"
+  , "    " <> "fixed = [item for item in items if type(item) is str]"
+  , "    " <> "self.text: Optional[str] = ("
+  , "      " <> "self.join(fixed) if len(fixed) == len(items) else None)"
+  , ""
+  , "  " <> "def join(self, values: Sequence[str]) -> str:"
+  , "    " <> "if not values:"
+  , "      " <> "return self.predicate + \" _\""
+  , "    " <> "if self.record:"
+  , "      " <> "return self.predicate + \" { \" + \", \".join(values) + \" }\""
+  , "    " <> "return self.predicate + \" \" + values[0]"
+  , ""
+  , "  " <> "def render("
+  , "    " <> "self,"
+  , "    " <> "env: Dict[str, object],"
+  , "    " <> "fields: Sequence[AngleField],"
+  , "    " <> "render: Callable[..., str],"
+  , "  " <> ") -> str:"
+  , "    " <> "if self.text is not None:"
+  , "      " <> "return self.text"
+  , "    " <> "values = []"
+  , "    " <> "for item in self.items:"
+  , "      " <> "if type(item) is str:"
+  , "        " <> "values.append(item)"
+  , "      " <> "elif type(item) is tuple:"
+  , "        " <> "prefix, i, suffix = item"
+  , "        " <> "value = _literal(env[fields[i][1].id])"
+  , "        " <> "values.append(prefix + value + suffix)"
+  , "      " <> "else:"
+  , "        " <> "name, node = fields[item]"
+  , "        " <> "value = render(env, node, name)"
+  , "        " <> "if value != \"\":"
+  , "          " <> "values.append(value)"
+  , "    " <> "return self.join(values)"
+  , ""
+  , "def _literal(value: object) -> str:"
+  , "  " <> "if type(value) is str:"
+  , "    " <> "return json.dumps(value)"
+  , "  " <> "return str(value)"
+  , ""
+  , "def _shape(env: Dict[str, object], node: Optional[ast.expr]) -> object:"
+  , "  " <> "# the type of a literal that can be a hole, otherwise None"
+  , "  " <> "if type(node) is ast.Name:"
+  , "    " <> "value = env.get(node.id)"
+  , "    " <> "kind = type(value)"
+  , "    " <> "if kind is str or (kind is int and 0 <= value <= _MAX_NAT):"
+  , "      " <> "return kind"
+  , "  " <> "return None"
+  , ""
+  , "@functools.lru_cache(maxsize=4096)"
+  , "def _angle_template("
+  , "  " <> "predicate: str,"
+  , "  " <> "record: bool,"
+  , "  " <> "fields: Tuple[AngleField, ...],"
+  , "  " <> "shape: Tuple[object, ...],"
+  , "  " <> "render: Callable[..., str],"
+  , ") -> _AngleTemplate:"
+  , "  " <> "items = []"
+  , "  " <> "for i, ((name, node), kind) in enumerate(zip(fields, shape)):"
+  , "    " <> "if node is None or type(node) is ast.Constant:"
+  , "      " <> "value = render({}, node, name)"
+  , "      " <> "if value != \"\":"
+  , "        " <> "items.append(value)"
+  , "      " <> "continue"
+  , "    " <> "if kind is not None:"
+  , "      " <> "marker = _STRING_MARKER if kind is str else _NAT_MARKER"
+  , "      " <> "text = render({node.id: marker}, node, name)"
+  , "      " <> "parts = text.split(_literal(marker))"
+  , "      " <> "if len(parts) == 2:"
+  , "        " <> "items.append((parts[0], i, parts[1]))"
+  , "        " <> "continue"
+  , "    " <> "items.append(i)"
+  , "  " <> "return _AngleTemplate(predicate, record, items)"
+  , ""
+  , "def angle_text("
+  , "  " <> "env: Dict[str, object],"
+  , "  " <> "predicate: str,"
+  , "  " <> "record: bool,"
+  , "  " <> "fields: Tuple[AngleField, ...],"
+  , "  " <> "render: Callable[..., str],"
+  , ") -> str:"
+  , "  " <> "\"\"\"Builds the Angle query of a build_angle call."
+  , ""
+  , "  " <> "The query comes from a template cached per call site, that is"
+  , "  " <> "the expressions given for the fields, and per shape of the"
+  , "  " <> "values they are bound to. Only the string and nat values of"
+  , "  " <> "the call are substituted into it, quoted as Angle literals."
+  , "  " <> "\"\"\""
+  , "  " <> "shape = tuple([_shape(env, node) for _, node in fields])"
+  , "  " <> "template = _angle_template("
+  , "    " <> "predicate, record, fields, shape, render)"
+  , "  " <> "return template.render(env, fields, render)"
+  , ""
+  , "def lazy_import(module: str) -> Callable[[], object]:"
+  , "  " <> "\"\"\"Returns a function that imports module on its first call.\"\"\""
+  , "  " <> "return functools.lru_cache(maxsize=None)("
+  , "    " <> "lambda: importlib.import_module(module))"
+  , ""
+  , "def lazy_attribute("
+  , "  " <> "module: str, name: str, sources: Sequence[Callable[[], object]]"
+  , ") -> object:"
+  , "  " <> "\"\"\"Implements the module __getattr__ of generated schema modules."
+  , "  " <> ""
+  , "  " <> "Looks name up in each of the sources in turn, loading them as"
+  , "  " <> "needed, and stores the result in the module so that it is only"
+  , "  " <> "resolved once."
+  , "  " <> "\"\"\""
+  , "  " <> "if not name.startswith(\"__\"):"
+  , "    " <> "for source in sources:"
+  , "      " <> "try:"
+  , "        " <> "value = getattr(source(), name)"
+  , "      " <> "except AttributeError:"
+  , "        " <> "continue"
+  , "      " <> "setattr(sys.modules[module], name, value)"
+  , "      " <> "return value"
+  , "  " <> "raise AttributeError(f\"module {module!r} has no attribute {name!r}\")"
+  , ""
+  , "def lazy_all("
+  , "  " <> "module: str,"
+  , "  " <> "sources: Sequence[Callable[[], object]],"
+  , "  " <> "names: Sequence[str],"
+  , ") -> List[str]:"
+  , "  " <> "\"\"\"Implements the __all__ of generated schema modules."
+  , "  " <> ""
+  , "  " <> "That is the public names of the module, the given names that it"
+  , "  " <> "resolves lazily and the names that each of the sources exports,"
+  , "  " <> "as a star import of the sources used to. The result is stored in"
+  , "  " <> "the module, so that it is only computed once."
+  , "  " <> "\"\"\""
+  , "  " <> "target = sys.modules[module]"
+  , "  " <> "exported = [n for n in vars(target) if not n.startswith(\"_\")]"
+  , "  " <> "exported.extend(names)"
+  , "  " <> "# namespaces may refer to each other, so a source that asks for"
+  , "  " <> "# this module's names while they are computed gets these"
+  , "  " <> "setattr(target, \"__all__\", exported)"
+  , "  " <> "for source in sources:"
+  , "    " <> "value = source()"
+  , "    " <> "public = getattr(value, \"__all__\", None)"
+  , "    " <> "if public is None:"
+  , "      " <> "public = [n for n in vars(value) if not n.startswith(\"_\")]"
+  , "    " <> "exported.extend(public)"
+  , "  " <> "result = list(dict.fromkeys(exported))"
+  , "  " <> "setattr(target, \"__all__\", result)"
+  , "  " <> "return result"
   ]) :
+  concat
   [ ("py" </>
       Text.unpack (Text.concat namespaces) <.> "py",
       Text.intercalate (newline <> newline)
-        ( header namespaces namePolicy allPreds :
-          genPredicateImports namespaces allPreds :
+        ( header :
+          genTypeCheckingImports namespaces namePolicy allPreds hasDummies :
+          genLazyResolution namespaces namePolicy allPreds hasDummies :
           genAllPredicates AngleQuery namespaces namePolicy
             "GleanSchemaPredicate" preds :
           -- InnerGleanSchemaPredicate hides Named Types from the user's outer
@@ -107,38 +293,137 @@ genSchemaPy _version preddefs typedefs oncall =
             "InnerGleanSchemaPredicate" (predsFromTypes preds types) :
           genNamedTypesAliases namePolicy types
         )
-    )
+    ) :
+    -- the dummy predicates are only imported when one is used
+    [ ("py" </> Text.unpack (dummiesModule namespaces) <.> "py",
+        Text.intercalate (newline <> newline)
+          [ header
+          , Text.unlines
+            [ "if TYPE_CHECKING:"
+            , "  from glean.schema.py." <> Text.concat namespaces <>
+                " import *"
+            ]
+          , dummies
+          ]
+      )
+    | hasDummies
+    ]
   | (namespaces, (_, preds, types)) <- schemas,
     let allPreds = preds ++ predsFromTypes preds types
+        dummies = dummiesOf preds types
+        hasDummies = not (Text.null dummies)
   ]
   where
     schemas = HashMap.toList declsPerNamespace
     predsFromTypes preds types = genNamedTypesClasses (head preds) types
+    dummiesOf preds types =
+      genDummyPredicates namePolicy "GleanSchemaPredicate" preds <>
+      genDummyPredicates namePolicy "InnerGleanSchemaPredicate"
+        (predsFromTypes preds types)
+    withDummies =
+      [ namespaces
+      | (namespaces, (_, preds, types)) <- schemas
+      , not (Text.null (dummiesOf preds types)) ]
     namePolicy = mkNamePolicy preddefs typedefs
     declsPerNamespace =
       addNamespaceDependencies $ sortDeclsByNamespace preddefs typedefs
-    genPredicateImports namespaces preds =
-      let importList = [ "    " <> return_class_name <> ","
-              | pred <- preds
-              , let ref = predicateDefRef pred
-                    predicateName = predicateRef_name ref
-                    return_class_name = returnPythonClassName predicateName
-            ] in
-      Text.unlines
-        (if null importList then
-          []
-        else
-            ("from glean.schema."
-                <> namespaceToFileName namespaces
-                <> ".types import (") :
-            importList ++
-            [")"])
     extraImports = [
       (Text.concat namespaces,
       addBuckImportsForKeys namespaces namePolicy allPreds) |
         (namespaces, (_, preds, types)) <- schemas,
         let allPreds = preds ++ predsFromTypes preds types]
 
+-- | Imports needed only by type checkers: the thrift types returned by
+-- build_angle, the dummy predicates and the modules of the namespaces
+-- this one refers to. At runtime these are loaded on demand by the
+-- module's __getattr__.
+genTypeCheckingImports
+  :: NameSpaces
+  -> NamePolicy
+  -> [ResolvedPredicateDef]
+  -> Bool
+  -> Text
+genTypeCheckingImports namespaces namePolicy preds hasDummies =
+  Text.unlines $
+  "if TYPE_CHECKING:" :
+  map ("  " <>) (if null imports then ["pass"] else imports)
+  where
+    imports =
+      addPythonImportsForKeys namespaces namePolicy preds ++
+      [ "from glean.schema.py." <> dummiesModule namespaces <> " import *"
+      | hasDummies ] ++
+      typesImport
+    importList =
+      [ "    " <> returnPythonClassName (predicateRef_name (predicateDefRef pred))
+        <> ","
+      | pred <- preds
+      ]
+    typesImport
+      | null importList = []
+      | otherwise =
+        ("from " <> typesModule namespaces <> " import (") :
+        importList ++
+        [")"]
+
+-- | Lazy loading of everything that isn't needed to define the
+-- predicate classes: the thrift types, the dummy predicates and (for
+-- compatibility) names from the namespaces this one refers to. Type
+-- checkers see _types() as returning the thrift types, so the types
+-- returned by build_angle are known. __all__ lists the names that are
+-- loaded lazily as well, so that @from ... import *@ exports them.
+genLazyResolution
+  :: NameSpaces
+  -> NamePolicy
+  -> [ResolvedPredicateDef]
+  -> Bool
+  -> Text
+genLazyResolution namespaces namePolicy preds hasDummies = Text.unlines $
+  [ "if TYPE_CHECKING:"
+  , "  import " <> typesModule namespaces <> " as _types_module"
+  , ""
+  , "  class _Types:"
+  ] ++
+  (if null names then ["    pass"] else
+    [ "    " <> name <> ": Type[_types_module." <> name <> "]"
+    | name <- names ]) ++
+  [ ""
+  , "  def _types() -> _Types: ..."
+  , "else:"
+  , "  _types = lazy_import(\"" <> typesModule namespaces <> "\")"
+  , ""
+  , "_lazy_modules = ["
+  ] ++
+  [ "  lazy_import(\"glean.schema.py." <> dummiesModule namespaces <> "\"),"
+  | hasDummies
+  ] ++
+  [ "  lazy_import(\"glean.schema.py." <> filenameToNamespace imp <> "\"),"
+  | imp <- predicateImports namespaces namePolicy preds
+  ] ++
+  [ "]"
+  , ""
+  , "_lazy_sources = [_types] + _lazy_modules"
+  , ""
+  , "def __getattr__(name: str) -> object:"
+  , "  if name == \"__all__\":"
+  , "    return lazy_all(__name__, _lazy_modules, ["
+  ] ++
+  [ "      \"" <> name <> "\"," | name <- names ] ++
+  [ "    ])"
+  , "  return lazy_attribute(__name__, name, _lazy_sources)"
+  ]
+  where
+    names =
+      [ returnPythonClassName (predicateRef_name (predicateDefRef pred))
+      | pred <- preds ]
+
+-- | The module of the dummy predicates of a namespace
+dummiesModule :: NameSpaces -> Text
+dummiesModule namespaces = "_" <> Text.concat namespaces <> "_dummies"
+
+typesModule :: NameSpaces -> Text
+typesModule namespaces =
+  "glean.schema." <> namespaceToFileName namespaces <> ".types"
+
 -- To handle SumTypes inner fields, the API creates dummy predicates as a
 -- form of syntactic sugar for the user. The dummy queries created through them
 -- do not correspond to any Angle query.
@@ -162,10 +447,7 @@ genAllPredicates predicateMode _ namePolicy parent preds = Text.unlines $
       , "  " <> "@staticmethod"
       , "  " <> "def build_angle(__env: Dict[str, R]" <> buildAngleTypes <>
         ") -> Tuple[str, Struct]:"
-      , "    " <> "query_fields = " <> angleForTypes
-      , "    " <> "return f\"" <> anglePredicateAndVersion <>
-        " { " <> queryFields <> " if query_fields else '_' }" <>
-        "\", " <> return_class_name
+      , buildAngleBody
       , ""
       , addClientMethods class_name kTy namePolicy key
       , addSumTypes
@@ -174,18 +456,31 @@ genAllPredicates predicateMode _ namePolicy parent preds = Text.unlines $
     , let ref = predicateDefRef pred
           key = predicateDefKeyType pred
           kTy = valueTy class_name APIValues namePolicy key
-          queryFields = Text.pack $ case key of
-            SumTy{} ->  "('{ ' + query_fields + ' }')"
-            RecordTy{} -> "('{ ' + query_fields + ' }')"
-            _ -> "query_fields"
-          angleForTypes = case buildAngleTypes of
-            "" -> " " <> "_"
-            _ -> valueTy class_name AngleForValues namePolicy key
+          isRecord = case key of
+            SumTy{} -> "True"
+            RecordTy{} -> "True"
+            _ -> "False"
+          buildAngleBody = case buildAngleTypes of
+            -- a predicate without fields to query matches anything
+            "" -> "    return \"" <> anglePredicateAndVersion <> " _\", " <>
+              returnClass
+            _ -> "    return angle_text(__env, \"" <>
+              anglePredicateAndVersion <> "\", " <> isRecord <> ", (" <>
+              valueTy class_name AngleFields namePolicy key <>
+              ",), angle_for), " <> returnClass
           predicateName = predicateRef_name ref
           class_name = pythonClassName predicateName
           return_class_name = returnPythonClassName predicateName
-          addSumTypes = genAllPredicates DummyQuery [Text.empty] namePolicy
-            parent $ unionDummyPreds key pred class_name
+          -- dummy predicates of top-level predicates are generated
+          -- separately by genDummyPredicates
+          addSumTypes = case predicateMode of
+            AngleQuery -> Text.empty
+            DummyQuery -> genDummyPredicates namePolicy parent [pred]
+          -- dummy predicates are defined alongside each other, real ones
+          -- return their thrift type
+          returnClass = case predicateMode of
+            AngleQuery -> "_types()." <> return_class_name
+            DummyQuery -> return_class_name
           anglePredicateAndVersion = case predicateMode of
             AngleQuery -> predicateName <> "." <>
               showt (predicateRef_version ref)
@@ -198,6 +493,19 @@ genAllPredicates predicateMode _ namePolicy parent preds = Text.unlines $
           mkEnumerator (i :: Int) val = "  " <> val <> " = " <> showt i
   ]
 
+-- | The dummy predicates for the sum type fields of the given predicates
+genDummyPredicates
+  :: NamePolicy
+  -> Text
+  -> [ResolvedPredicateDef]
+  -> Text
+genDummyPredicates namePolicy parent preds = Text.concat
+  [ genAllPredicates DummyQuery [Text.empty] namePolicy parent $
+      unionDummyPreds (predicateDefKeyType pred) pred
+        (pythonClassName (predicateRef_name (predicateDefRef pred)))
+  | pred <- preds
+  ]
+
 genNamedTypesClasses
   :: ResolvedPredicateDef
   -> [ResolvedTypeDef]
@@ -279,18 +587,20 @@ addClientMethods class_name kTy namePolicy key = methods
         "(\"this function can only be called from @angle_query\")"
       ]
 
-header :: NameSpaces -> NamePolicy -> [ResolvedPredicateDef] -> Text
-header namespaces namePolicy preds = Text.unlines $
+header :: Text
+header = Text.unlines
   [ "# \x40generated"
   , "# To regenerate this file run fbcode//glean/schema/gen/sync"
-  , "from typing import Optional, Tuple, Union, List, Dict, TypeVar"
+  , "from typing import Optional, Tuple, Type, Union, List, Dict, " <>
+    "TypeVar, TYPE_CHECKING"
   , "from thrift.py3 import Struct"
   , "from enum import Enum"
   , "import ast"
   , "from glean.schema.py.glean_schema_predicate import GleanSchemaPredicate"<>
-    " , Just, InnerGleanSchemaPredicate"
+    " , Just, InnerGleanSchemaPredicate, angle_text, " <>
+    "lazy_import, lazy_attribute, lazy_all"
   , "from glean.client.py3.angle_query import angle_for, R"
-  ] ++ addPythonImportsForKeys namespaces namePolicy preds
+  ]
 
 pythonClassName :: Text -> Text
 pythonClassName c = Text.intercalate "" $ map cap1 $ Text.split (== '.') c
@@ -307,9 +617,10 @@ namespaceToFileName n = Text.intercalate "_" n
 genTargets
   :: HashMap NameSpaces ([NameSpaces], [ResolvedPredicateDef], [ResolvedTypeDef])
   -> [(Text, [Text])]
+  -> [NameSpaces]
   -> Maybe Oncall
   -> Text
-genTargets info extraImports oncall =
+genTargets info extraImports withDummies oncall =
   Text.unlines $
      [ "# \x40generated"
      , "# to regenerate: ./glean/schema/sync"
@@ -331,11 +642,14 @@ genTargets info extraImports oncall =
     let
       namespace = underscored ns
       extra = Data.Maybe.fromMaybe [""] (lookup (Text.concat ns) extraImports)
+      dummies
+        | ns `elem` withDummies = ", \"" <> dummiesModule ns <> ".py\""
+        | otherwise = Text.empty
     in
     -- mini Python library for the module containing allPredicates
     [ "python_library("
     , "  name = \"" <> namespace <> "\","
-    , "  srcs = [\"" <> Text.concat ns <> ".py\"],"
+    , "  srcs = [\"" <> Text.concat ns <> ".py\"" <> dummies <> "],"
     , "  deps = ["
     , "    " <> "\"//glean/schema/py:glean_schema_predicate\","
     , "    " <> "\"//glean/schema/thrift:" <> namespace <> "-py3-types\","
@@ -347,7 +661,7 @@ genTargets info extraImports oncall =
     , ""
     ]
 
-data ValueTy = APIValues | ASTValues | AngleForValues
+data ValueTy = APIValues | ASTValues | AngleFields
   deriving (Eq, Show)
 
 -- | Generate a value type
@@ -358,24 +672,17 @@ valueTy predName mode namePolicy t = case t of
   _ -> if mode  == APIValues then defaultFieldName <> ": " <>
         wrapOptionalArg (baseTy predName namePolicy t)
        else if mode == ASTValues then defaultFieldName <> ": ast.Expr"
-       else " angle_for(__env, " <> defaultFieldName <> ", None" <> ")"
+       else "(None, " <> defaultFieldName <> ")"
 
   where
-    handleFields fields = case mode of
-      AngleForValues -> intercalatedFieldsWithBrackets
-      _ -> intercalatedFields
-      where
-        queryFields = map (createQueryField mode) fields
-        intercalatedFields = intercalateQueryFields queryFields
-        intercalatedFieldsWithBrackets = " \', \'.join(filter" <>
-         "(lambda x: x != '', [" <> intercalatedFields <> "]))"
+    handleFields fields = intercalateQueryFields $
+      map (createQueryField mode) fields
     createQueryField mode field = case mode of
       APIValues -> appendType $ (wrapOptionalArg .
         baseTy (predName <> "_" <> pythonVarName) namePolicy . fieldDefType)
         field
       ASTValues -> appendType "ast.Expr"
-      AngleForValues -> "angle_for(__env, " <> pythonVarName <> ", \'" <>
-       name <> "\')"
+      AngleFields -> "(\"" <> name <> "\", " <> pythonVarName <> ")"
       where
           name = fieldDefName field
           pythonVarName = from_ name
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+
+"""
+Tests for the helpers that the generated Python schema modules share, in
+the generated glean_schema_predicate.py.
+"""
+
+import ast
+import json
+import sys
+import types
+import unittest
+from typing import List, Optional
+
+from glean.schema.py.glean_schema_predicate import (
+    _angle_template,
+    angle_text,
+    lazy_all,
+    lazy_attribute,
+)
+
+
+class FakeAngleFor:
+    """Renders fields as angle_for does, recording each call."""
+
+    def __init__(self) -> None:
+        self.calls: List[Optional[ast.expr]] = []
+
+    def __call__(
+        self, env: dict, node: Optional[ast.expr], field: Optional[str]
+    ) -> str:
+        self.calls.append(node)
+        if node is None:
+            return ""
+        if isinstance(node, ast.Constant):
+            value = json.dumps(node.value)
+        elif isinstance(node, ast.Name):
+            bound = env[node.id]
+            value = json.dumps(bound) if isinstance(bound, str) else str(bound)
+        else:
+            value = "X"
+        return value if field is None else f"{field} = {value}"
+
+
+class AngleTextTest(unittest.TestCase):
+    def setUp(self) -> None:
+        _angle_template.cache_clear()
+        self.angle_for = FakeAngleFor()
+
+    def test_template_is_built_once(self) -> None:
+        fields = (
+            ("name", ast.Name(id="name")),
+            ("kind", ast.Constant(value=3)),
+            ("scope", None),
+        )
+        for name in ["a", "b", "c"]:
+            self.assertEqual(
+                angle_text(
+                    {"name": name}, "p.1", True, fields, self.angle_for
+                ),
+                f'p.1 {{ name = "{name}", kind = 3 }}',
+            )
+        info = _angle_template.cache_info()
+        self.assertEqual((info.misses, info.hits), (1, 2))
+        # each field was rendered once, when the template was built
+        self.assertEqual(len(self.angle_for.calls), 3)
+
+    def test_literals_are_quoted(self) -> None:
+        fields = ((None, ast.Name(id="x")),)
+        value = 'a "quoted"\nvalue } _'
+        self.assertEqual(
+            angle_text({"x": value}, "p.1", False, fields, self.angle_for),
+            "p.1 " + json.dumps(value),
+        )
+
+    def test_each_shape_has_a_template(self) -> None:
+        fields = (("id", ast.Name(id="x")),)
+        angle_text({"x": "a"}, "p.1", True, fields, self.angle_for)
+        self.assertEqual(
+            angle_text({"x": 5}, "p.1", True, fields, self.angle_for),
+            "p.1 { id = 5 }",
+        )
+        # a value that isn't a nat is rendered on every call
+        for _ in range(2):
+            self.assertEqual(
+                angle_text({"x": -1}, "p.1", True, fields, self.angle_for),
+                "p.1 { id = -1 }",
+            )
+        self.assertEqual(_angle_template.cache_info().misses, 3)
+
+    def test_empty_fields_are_omitted(self) -> None:
+        fields = (("a", None), ("b", ast.Call()))
+        self.assertEqual(
+            angle_text({}, "p.1", True, fields[:1], self.angle_for), "p.1 _"
+        )
+        self.assertEqual(
+            angle_text({}, "p.1", True, fields, self.angle_for),
+            "p.1 { b = X }",
+        )
+
+
+class LazyModuleTest(unittest.TestCase):
+    """A module resolving names as the generated namespace modules do."""
+
+    def setUp(self) -> None:
+        self.loads: List[str] = []
+        self.dummies = types.ModuleType("dummies")
+        self.dummies.Pred_field = type("Pred_field", (), {})
+        self.module = types.ModuleType("lazy_module_test")
+        self.module.Pred = type("Pred", (), {})
+        sys.modules[self.module.__name__] = self.module
+        self.addCleanup(sys.modules.pop, self.module.__name__)
+
+        def load_dummies() -> types.ModuleType:
+            self.loads.append("dummies")
+            return self.dummies
+
+        def load_types() -> types.SimpleNamespace:
+            self.loads.append("types")
+            return types.SimpleNamespace(Key=int, Unexported=str)
+
+        name = self.module.__name__
+
+        def getattr_(attr: str) -> object:
+            if attr == "__all__":
+                return lazy_all(name, [load_dummies], ["Key"])
+            return lazy_attribute(name, attr, [load_types, load_dummies])
+
+        self.module.__getattr__ = getattr_
+
+    def test_names_are_resolved_on_use(self) -> None:
+        self.assertEqual(self.loads, [])
+        self.assertIs(self.module.Pred_field, self.dummies.Pred_field)
+        self.assertEqual(self.loads, ["types", "dummies"])
+        # stored in the module, so only resolved once
+        self.assertIs(self.module.__dict__["Pred_field"], self.dummies.Pred_field)
+        with self.assertRaises(AttributeError):
+            self.module.Missing
+
+    def test_star_import_exports_lazy_names(self) -> None:
+        scope = {}
+        exec(f"from {self.module.__name__} import *", scope)
+        self.assertIs(scope["Pred"], self.module.Pred)
+        self.assertIs(scope["Pred_field"], self.dummies.Pred_field)
+        self.assertIs(scope["Key"], int)
+        self.assertNotIn("Unexported", scope)
+
+
+if __name__ == "__main__":
+    unittest.main()
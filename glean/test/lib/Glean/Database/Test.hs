@@ -24,6 +24,7 @@ module Glean.Database.Test
   , enableTcDebug
   , enableQueryDebug
   , enableRocksDBCache
+  , setRocksDBKeyPrefixBytes
   , withTestEnv
   , kickOffTestDB
   , waitUntilComplete
@@ -136,6 +137,11 @@ enableRocksDBCache cfg = cfg
         ServerConfig.config_db_rocksdb_cache_mb def }
   }
 
+setRocksDBKeyPrefixBytes :: Int32 -> Setting
+setRocksDBKeyPrefixBytes n cfg = cfg
+  { cfgServerConfig = cfgServerConfig cfg <&> \scfg -> scfg
+      { ServerConfig.config_db_rocksdb_key_prefix_bytes = n } }
+
 withTestEnv
   :: [Setting]
   -> (Env -> IO a)
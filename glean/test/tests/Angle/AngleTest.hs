@@ -43,6 +43,7 @@ main = withUnitTest $ withDbTests $ \dbTestCase -> testRunner $ TestList
   , TestLabel "angleIfThenElse" $ angleIfThenElse dbTestCase id
   , TestLabel "angleIfThenElse/page" $ angleIfThenElse dbTestCase (limit 1)
   , TestLabel "angleTypeTest" $ angleTypeTest dbTestCase
+  , TestLabel "angleParameters" $ angleParameterTest dbTestCase
   ]
 
 ignorePredK :: Glean.Test.KitchenSink -> Glean.Test.KitchenSink
@@ -1053,3 +1054,38 @@ angleTypeTest dbTestCase = dbTestCase $ \env repo -> do
     |]
   print r
   assertEqual "angle - inference 9" 4 (length r)
+
+angleParameterTest :: (WithDB () -> Test) -> Test
+angleParameterTest dbTestCase = dbTestCase $ \env repo -> do
+  let blob str = parameter "blob" (QueryParameter_string_value str) $
+        angle @Sys.Blob "sys.Blob $blob"
+
+  -- the same prepared query with different values
+  results <- runQuery_ env repo $ blob "hello"
+  assertEqual "parameter - string" 1 (length results)
+  results <- runQuery_ env repo $ blob "nomatch"
+  assertEqual "parameter - string, no match" [] results
+
+  results <- runQuery_ env repo $
+    parameter "n" (QueryParameter_nat_value (toNat 37)) $
+    angle @Glean.Test.Predicate
+      "glean.test.Predicate { named_sum_ = { tue = $n } }"
+  assertEqual "parameter - nat" 1 (length results)
+
+  -- $name in strings and comments is left alone
+  r <- runQuery_ env repo $
+    parameter "x" (QueryParameter_string_value "unused") $
+    angleData @Text "\"$x\" # $x"
+  assertEqual "parameter - string literal" ["$x"] r
+
+  -- a parameter compared with a literal is inlined instead
+  r <- runQuery_ env repo $
+    parameter "x" (QueryParameter_string_value "a") $
+    angleData @Text "X where X = $x; X = \"a\""
+  assertEqual "parameter - inlined" ["a"] r
+
+  r <- try $ runQuery_ env repo $ angle @Sys.Blob "sys.Blob $blob"
+  assertBool "parameter - unknown" $
+    case r of
+      Left (BadQuery x) -> "unknown query parameter" `Text.isInfixOf` x
+      _ -> False
@@ -6,18 +6,27 @@
   LICENSE file in the root directory of this source tree.
 -}
 
+{-# LANGUAGE TypeApplications #-}
 {-# OPTIONS_GHC -Wno-incomplete-uni-patterns #-}
 module BackupTest (main) where
 
 import Util.STM
+import Control.Concurrent
+import Control.Exception
 import Control.Monad
+import qualified Data.ByteString as BS
 import Data.Default
+import qualified Data.HashMap.Strict as HashMap
 import qualified Data.HashSet as HashSet
 import Data.Int (Int64)
+import Data.IORef
 import Data.List
+import Data.Maybe (isJust)
 import Data.Text (Text)
 import qualified Data.Text as Text
 import Data.Time.Clock
+import System.Directory
+import System.FilePath
 import System.IO.Temp
 import Test.HUnit
 
@@ -28,6 +37,8 @@ import Glean.Backend.Local ()
 import Glean.Backend.Types
 import Glean.Database.Backup (Event(..))
 import qualified Glean.Database.Backup.Backend as Backup
+import qualified Glean.Database.Backup.Chunked as Chunked
+import Glean.Database.Backup.Locator (fromRepoLocator)
 import qualified Glean.Database.Backup.Mock as Backup.Mock
 import Glean.Database.Catalog as Catalog
 import Glean.Database.Config
@@ -38,7 +49,12 @@ import Glean.Database.Test hiding (withTestEnv)
 import Glean.Database.Types
 import Glean.Database.Finish (finalizeWait)
 import Glean.Init
+import Glean.Query.Angle
+import Glean.Query.Thrift (allFacts, runQuery_)
+import qualified Glean.Schema.GleanTest as Glean.Test
+import qualified Glean.Schema.GleanTest.Types as Glean.Test
 import Glean.ServerConfig.Types as ServerTypes
+import Glean.Typed (Fid(..), getId, idOf, makeFact_)
 import Glean.Types as Thrift
 import Glean.Util.ConfigProvider
 import Glean.Util.ThriftSource as ThriftSource
@@ -309,6 +325,262 @@ restoreNoDiskSpaceTest settings =
     tb :: Int64
     tb = 1000000000000
 
+-- | Write a DB of glean.test.Node facts with the given labels
+writeNodes :: Env -> Repo -> [Text] -> IO ()
+writeNodes env repo labels = do
+  KickOffResponse False <- kickOffDatabase env def
+    { kickOff_repo = repo }
+  writeFactsIntoDB env repo [ Glean.Test.allPredicates ] $
+    forM_ labels $ \label ->
+      makeFact_ @Glean.Test.Node (Glean.Test.Node_key label)
+  void $ finishDatabase env repo
+
+-- | Back up a DB, delete it, and restore it from the backup
+backupAndRestore :: TestEnv -> Repo -> IO ()
+backupAndRestore env@TestEnv{..} repo = do
+  backUp env repo
+  startRestore env repo def
+  expect testEvents $ expectRestore [repo]
+
+backUp :: TestEnv -> Repo -> IO ()
+backUp TestEnv{..} repo = do
+  testUpdConfig $ \scfg -> scfg
+    { config_backup = (config_backup scfg)
+        { databaseBackupPolicy_allowed =
+            HashSet.singleton (repo_name repo) } }
+  expect testEvents $ mconcat [ expectBackups [repo], want Waiting ]
+
+-- | Delete a DB and start restoring it with the given policy
+startRestore :: TestEnv -> Repo -> DatabaseRestorePolicy -> IO ()
+startRestore TestEnv{..} repo policy = do
+  deleteDatabase testEnv repo
+  testUpdConfig $ \scfg -> scfg
+    { config_restore = policy { databaseRestorePolicy_enabled = True } }
+  runDatabaseJanitor testEnv
+
+-- | Back up DBs as SST files, on a site that stores them as files
+sstFiles :: ServerTypes.Config -> ServerTypes.Config
+sstFiles = sstFilesOn "local:"
+
+-- | Back up DBs as SST files, on the sites of the given backend
+sstFilesOn :: Text -> ServerTypes.Config -> ServerTypes.Config
+sstFilesOn backend scfg = scfg
+  { config_backup = (config_backup scfg)
+      { databaseBackupPolicy_location = Text.replace "mock:" backend $
+          databaseBackupPolicy_location (config_backup scfg) }
+  , config_db_rocksdb_backup_sst_files = True
+  }
+
+-- | Back up a RocksDB DB as SST files to a local site, and restore it
+sstRestoreTest :: Test
+sstRestoreTest = TestCase $ withTest $ withTestEnv [] [] sstFiles
+  $ \env@TestEnv{..} -> do
+    writeNodes testEnv repo labels
+    expect testEvents $ expectFinalize [repo]
+
+    -- each fact found by its key, and then by its id
+    let lookups = forM labels $ \label -> do
+          nodes <- runQuery_ testEnv repo $ query $
+            predicate @Glean.Test.Node $
+              rec $ field @"label" (string label) end
+          let ids = map (fromFid . idOf . getId) nodes
+          facts <- mapM (queryFact testEnv repo) ids
+          return (label, ids, facts)
+    found <- lookups
+    forM_ found $ \(label, ids, facts) -> do
+      assertEqual ("fact by key " <> show label) 1 (length ids)
+      assertBool ("fact by id " <> show label) (all isJust facts)
+    before <- factIdRange testEnv repo
+
+    backupAndRestore env repo
+
+    after <- factIdRange testEnv repo
+    assertEqual "fact id range" before after
+    void $ getSchemaInfo testEnv (Just repo) def
+
+    -- the ingested files have the same facts, under the same ids
+    restored <- lookups
+    assertEqual "facts by key and id" found restored
+    forM_ found $ \(label, ids, facts) -> do
+      byId <- mapM (queryFact testEnv repo) ids
+      assertEqual ("restored fact by id " <> show label) facts byId
+  where
+    repo = Repo "test" "1"
+    labels = [ "node" <> Text.pack (show i) | i <- [1 .. 100 :: Int] ]
+
+-- | Without restore.lazy, a DB restored from SST files is complete as
+-- soon as it is available: nothing is added to it afterwards.
+sstRestoreCompleteTest :: Test
+sstRestoreCompleteTest = TestCase $ withTest $ withTestEnv [] [] sstFiles
+  $ \env@TestEnv{..} -> do
+    writeNodes testEnv repo labels
+    expect testEvents $ expectFinalize [repo]
+    meta <- atomically $ Catalog.readMeta (envCatalog testEnv) repo
+    stats <- predicateStats testEnv repo ExcludeBase
+
+    backupAndRestore env repo
+
+    restoredMeta <- atomically $ Catalog.readMeta (envCatalog testEnv) repo
+    assertBool "complete" $ case metaCompleteness restoredMeta of
+      Complete{} -> True
+      _ -> False
+    assertEqual "properties" (metaProperties meta)
+      (metaProperties restoredMeta)
+    assertEqual "predicate stats" stats
+      =<< predicateStats testEnv repo ExcludeBase
+    nodes <- runQuery_ testEnv repo $ allFacts @Glean.Test.Node
+    assertEqual "facts" (length labels) (length nodes)
+  where
+    repo = Repo "test" "1"
+    labels = [ "node" <> Text.pack (show i) | i <- [1 .. 10 :: Int] ]
+
+-- | With restore.lazy, a DB backed up as SST files to a local site is
+-- available once the chunks holding its first part have been fetched.
+-- Fetching the rest is held up meanwhile: the DB's properties, schema
+-- and predicate stats can be read, but queries for its facts fail with
+-- Retry. Once the rest has been restored, the DB has all its facts.
+stagedRestoreTest :: Test
+stagedRestoreTest = TestCase $ do
+  blocked <- newIORef (const False)
+  waiting <- newEmptyMVar
+  release <- newEmptyMVar
+  let
+    throttle = Backup.Mock.Throttle
+      { Backup.Mock.throttleBytesPerSecond = 0
+      , Backup.Mock.throttleBefore = \name -> do
+          isBlocked <- readIORef blocked
+          when (isBlocked name) $ do
+            void $ tryPutMVar waiting ()
+            readMVar release
+      }
+    opts = Chunked.defaultOptions { Chunked.optionsChunkBytes = chunkBytes }
+    throttledSites cfg = cfg
+      { cfgBackupBackends = HashMap.insert "throttled"
+          (Backup.Mock.throttledBackend throttle opts)
+          (cfgBackupBackends cfg) }
+  withTest $ withTestEnv [throttledSites] [] (sstFilesOn "throttled:")
+    $ \env@TestEnv{..} -> do
+    writeNodes testEnv repo labels
+    expect testEvents $ expectFinalize [repo]
+    meta <- atomically $ Catalog.readMeta (envCatalog testEnv) repo
+    stats <- predicateStats testEnv repo ExcludeBase
+    backUp env repo
+
+    -- the backup is in two parts, and the second one starts in a
+    -- later chunk than the first
+    Just loc <- metaBackup <$>
+      atomically (Catalog.readMeta (envCatalog testEnv) repo)
+    Just (_, site, _) <- return $
+      fromRepoLocator (envBackupBackends testEnv) loc
+    backupMeta <- Backup.inspect site repo
+    Just headBytes <- return $ backupHead backupMeta
+    let offset name = chunkBytes * read (takeWhile (/= '-') name)
+        Complete DatabaseComplete{databaseComplete_bytes = Just size} =
+          metaCompleteness backupMeta
+    assertBool "two parts" (headBytes + chunkBytes < fromIntegral size)
+    writeIORef blocked $ \name -> offset name >= headBytes
+
+    startRestore env repo def { databaseRestorePolicy_lazy = True }
+    -- the DB was added before the second part was asked for
+    takeMVar waiting
+    expect testEvents $ opt (want Waiting) <> want (RestoreStarted repo)
+    partial <- atomically $ Catalog.readMeta (envCatalog testEnv) repo
+    assertBool "partially restored" (isPartiallyRestored partial)
+    assertEqual "predicate stats" stats
+      =<< predicateStats testEnv repo ExcludeBase
+    void $ getSchemaInfo testEnv (Just repo) def
+    r <- try $ runQuery_ testEnv repo $ allFacts @Glean.Test.Node
+    assertBool "facts are not read" $ case r of
+      Left Thrift.Retry{} -> True
+      Right _ -> False
+
+    -- the backup thread goes on to other work while the rest is restored
+    putMVar release ()
+    expect testEvents $ opt (want Waiting) <> want (RestoreFinished repo)
+    restored <- atomically $ Catalog.readMeta (envCatalog testEnv) repo
+    assertEqual "properties" (metaProperties meta) (metaProperties restored)
+    assertEqual "restored predicate stats" stats
+      =<< predicateStats testEnv repo ExcludeBase
+    nodes <- runQuery_ testEnv repo $ allFacts @Glean.Test.Node
+    assertEqual "facts" (length labels) (length nodes)
+  where
+    repo = Repo "test" "1"
+    labels = [ "node" <> Text.pack (show i) | i <- [1 .. 100 :: Int] ]
+    chunkBytes = 4096
+
+-- | Transfer a file in chunks over a slow site that drops transfers,
+-- and resume an upload and a download that failed
+chunkedTransferTest :: Test
+chunkedTransferTest = TestCase $
+  withSystemTempDirectory "glean-chunked" $ \dir -> do
+    let file = dir </> "file"
+        copy = dir </> "copy"
+        contents = BS.pack $ take 10500 $ cycle [0 .. 250]
+    BS.writeFile file contents
+
+    transfers <- newIORef (0 :: Int)
+    dropping <- newIORef $ \_ -> return False
+    let
+      opts = Chunked.defaultOptions
+        { Chunked.optionsChunkBytes = 1000
+        , Chunked.optionsStreams = 1
+        , Chunked.optionsAttempts = 2
+        }
+      chunks = Backup.Mock.throttled
+        Backup.Mock.Throttle
+          { Backup.Mock.throttleBytesPerSecond = 100000
+          , Backup.Mock.throttleBefore = \name -> do
+              atomicModifyIORef' transfers $ \n -> (n + 1, ())
+              rule <- readIORef dropping
+              dropped <- rule name
+              when dropped $ throwIO $ ErrorCall "dropped"
+          }
+        (Chunked.directory (dir </> "chunks"))
+      fails act = do
+        r <- try act
+        return $ case r of
+          Left (_ :: ErrorCall) -> True
+          Right _ -> False
+
+    -- chunk 4 never gets through
+    writeIORef dropping $ return . ("00000004-" `isPrefixOf`)
+    fails (Chunked.upload opts chunks file) >>= assertBool "upload fails"
+
+    writeIORef dropping $ \_ -> return False
+    writeIORef transfers 0
+    manifest <- Chunked.upload opts chunks file
+    assertEqual "chunks" 11 (length manifest)
+    uploaded <- readIORef transfers
+    assertEqual "resumed upload" 7 uploaded
+
+    -- every chunk is dropped the first time it is fetched
+    fetched <- newIORef []
+    writeIORef dropping $ \name -> atomicModifyIORef' fetched $ \names ->
+      (name : names, name `notElem` names)
+    Chunked.download opts { Chunked.optionsStreams = 3 } chunks manifest copy
+    copied <- BS.readFile copy
+    assertEqual "contents" contents copied
+
+    -- chunk 6 never gets through, so the download stops after chunk 5
+    let resumed = dir </> "resumed"
+    writeIORef dropping $ return . ("00000006-" `isPrefixOf`)
+    fails (Chunked.download opts chunks manifest resumed)
+      >>= assertBool "download fails"
+
+    writeIORef dropping $ \_ -> return False
+    writeIORef transfers 0
+    Chunked.download opts chunks manifest resumed
+    downloaded <- readIORef transfers
+    assertEqual "resumed download" 5 downloaded
+    assertEqual "resumed contents" contents =<< BS.readFile resumed
+    left <- listDirectory dir
+    assertEqual "no progress left" [] (filter (".chunks" `isSuffixOf`) left)
+
+    BS.writeFile (dir </> "chunks" </> Chunked.chunkName (head manifest))
+      "corrupt"
+    fails (Chunked.download opts chunks manifest copy)
+      >>= assertBool "corrupt chunk"
+
 backends :: ([Setting] -> Test) -> Test
 backends fn =
   TestList [
@@ -324,4 +596,8 @@ main = withUnitTest $ testRunner $ TestList
   , TestLabel "allowedTest" $ backends allowedTest
   , TestLabel "restoreOrderTest" $ backends restoreOrderTest
   , TestLabel "restoreNoDiskSpace" $ backends restoreNoDiskSpaceTest
+  , TestLabel "sstRestore" sstRestoreTest
+  , TestLabel "sstRestoreComplete" sstRestoreCompleteTest
+  , TestLabel "stagedRestore" stagedRestoreTest
+  , TestLabel "chunkedTransfer" chunkedTransferTest
   ]
@@ -9,6 +9,8 @@
 {-# LANGUAGE TypeApplications #-}
 module ContinuationTest (main) where
 
+import Data.List (sort)
+import Data.Maybe
 import Data.Proxy
 import Test.HUnit
 
@@ -41,10 +43,66 @@ continuationCheckTest f = dbTestCase $ \env repo -> do
   assertThrowsType "bad cont" (Proxy :: Proxy BadQuery)
       $ runQueryPage env repo (Just $ f cont) $ allFacts @Cxx.Name
 
+-- | A streamed query returns the same results, and its continuation
+-- can't be used twice.
+streamTest :: Test
+streamTest = dbTestCase $ \env repo -> do
+  let q = limit 1 $ allFacts @Cxx.Name
+  paged <- runQuery_ env repo q
+  streamedResults <- runQuery_ env repo (streamed q)
+  assertEqual "streamed results"
+    (sort (map Cxx.name_key paged))
+    (sort (map Cxx.name_key streamedResults))
+
+  (_, cont) <- runQueryPage env repo Nothing (streamed q)
+  assertBool "stream continuation" $ isJust (userQueryCont_stream =<< cont)
+  (io, _) <- runQueryPage env repo cont (streamed q)
+  r <- io
+  assertEqual "second page" (length r) 1
+  assertThrowsType "repeated cont" (Proxy :: Proxy BadQuery)
+      $ runQueryPage env repo cont (streamed q)
+
+  (_, cont2) <- runQueryPage env repo Nothing (streamed q)
+  let corrupt c = c { userQueryCont_hash = userQueryCont_hash c + 1 }
+  assertThrowsType "bad hash" (Proxy :: Proxy BadQuery)
+      $ runQueryPage env repo (corrupt <$> cont2) (streamed q)
+
+-- | A query run in parallel returns the same results, and its
+-- continuation resumes the parts that didn't finish.
+parallelTest :: Test
+parallelTest = dbTestCase $ \env repo -> do
+  let q = allFacts @Cxx.Name
+  expected <- sort . map Cxx.name_key <$> runQuery_ env repo q
+  whole <- runQuery_ env repo (inParallel 4 q)
+  assertEqual "parallel results" expected (sort (map Cxx.name_key whole))
+  paged <- runQuery_ env repo (inParallel 4 (limit 1 q))
+  assertEqual "parallel pages" expected (sort (map Cxx.name_key paged))
+
+  (page, cont) <- runQueryPage env repo Nothing (inParallel 4 (limit 1 q))
+  facts <- page
+  assertEqual "parallel page limit" 1 (length facts)
+  assertBool "parallel continuation" $
+    maybe False (not . null . userQueryCont_partitions) cont
+
+  -- every page is within the limit, and no result is lost between them
+  let pages c n = do
+        (getPage, next) <- runQueryPage env repo c (inParallel 4 (limit 3 q))
+        rs <- getPage
+        assertBool "parallel pages within limit" (length rs <= 3)
+        case next of
+          Nothing -> return [rs]
+          Just _ | n > (1000 :: Int) -> assertFailure "too many pages"
+          Just _ -> (rs :) <$> pages next (n + 1)
+  limited <- concat <$> pages Nothing 0
+  assertEqual "parallel limited pages" expected
+    (sort (map Cxx.name_key limited))
+
 main :: IO ()
 main = withUnitTest $ testRunner $ TestList
   [ TestLabel "version" $ continuationCheckTest $ \c -> c
       { userQueryCont_version = 0 }
   , TestLabel "bytes" $ continuationCheckTest $ \c -> c
       { userQueryCont_continuation = "helloworld" }
+  , TestLabel "stream" streamTest
+  , TestLabel "parallel" parallelTest
   ]
@@ -61,7 +61,7 @@ rebaseTest = TestList
         , [s|{ "id" : 9992, "key": 1024  }|]
         ]
 
-      cache <- LookupCache.new 1 1 =<< LookupCache.newStats
+      cache <- LookupCache.new 1 0 =<< LookupCache.newStats
       r <- try $ FactSet.rebase inventory subst cache local
       result <- case r of
         Left err@SomeException{} -> assertFailure $ "Failed with: " <> show err
@@ -103,7 +103,7 @@ rebaseTest = TestList
         , [s|{ "id" : 9002, "key": 1000, "value": 1000 }|]
         ]
 
-      cache <- LookupCache.new 1 1 =<< LookupCache.newStats
+      cache <- LookupCache.new 1 0 =<< LookupCache.newStats
       r <- try $ FactSet.rebase inventory subst cache local
       result <- case r of
         Left err@SomeException{} -> assertFailure $ "Failed with: " <> show err
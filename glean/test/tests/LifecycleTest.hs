@@ -24,7 +24,7 @@ import Test.QuickCheck.IO ()
 
 import TestRunner
 
-import Glean (fillDatabase, enqueueJsonBatch)
+import Glean (fillDatabase, enqueueJsonBatch, userQuery)
 import qualified Glean.Database.Catalog as Catalog
 import Glean.Database.Catalog.Filter
 import Glean.Database.Catalog.Test
@@ -38,6 +38,7 @@ import Glean.Database.Test
 import Glean.Database.Types
 import Glean.Init
 import Glean.Internal.Types
+import qualified Glean.Query.PlanCache as PlanCache
 import Glean.Test.HUnit
 import Glean.Test.Mock
 import Glean.Types hiding (Exception)
@@ -219,6 +220,19 @@ deleteWhileUsing = TestCase $ withTEnv $ \TEnv{..} -> do
     return del
   wait del
 
+-- | Deleting a DB drops its compiled queries, so that a DB created
+-- later under the same repo compiles its queries again
+deleteDropsPlans :: Test
+deleteDropsPlans = TestCase $ withTEnv $ \TEnv{..} -> do
+  mkDB tEnv repo1
+  _ <- userQuery tEnv repo1 def { userQuery_query = "glean.test.Node _" }
+  plans <- PlanCache.size (envPlanCache tEnv)
+  assertEqual "plans" 1 plans
+
+  deleteDatabase tEnv repo1
+  plans <- PlanCache.size (envPlanCache tEnv)
+  assertEqual "plans after delete" 0 plans
+
 kickOffWhileDeleting :: Test
 kickOffWhileDeleting = TestCase $ withTEnv $ \TEnv{..} -> do
   mkDB tEnv repo1
@@ -292,6 +306,7 @@ main = withUnitTest $ testRunner $ TestList
   , TestLabel "closeUsed" closeUsed
   , TestLabel "deleteOpen" deleteOpen
   , TestLabel "deleteWhileUsing" deleteWhileUsing
+  , TestLabel "deleteDropsPlans" deleteDropsPlans
   , TestLabel "kickOffWhileDeleting" kickOffWhileDeleting
   , TestLabel "useWhileDeleting" useWhileDeleting
   , TestLabel "writeAfterFinished" writeAfterFinished
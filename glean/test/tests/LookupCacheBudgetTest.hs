@@ -0,0 +1,58 @@
+{-
+  Copyright (c) Meta Platforms, Inc. and affiliates.
+  All rights reserved.
+
+  This source code is licensed under the BSD-style license found in the
+  LICENSE file in the root directory of this source tree.
+-}
+
+module LookupCacheBudgetTest (main) where
+
+import Data.Word
+import Test.HUnit
+
+import TestRunner
+
+import Glean.Database.LookupCacheBudget
+import Glean.Init
+
+full :: Double -> Word64 -> Demand
+full weight capacity = Demand weight capacity capacity
+
+allocated :: Word64 -> Word64 -> [Demand] -> [Word64]
+allocated budget maxEach demands =
+  map snd $ allocate budget maxEach (zip [0 :: Int ..] demands)
+
+allocateTest :: Test
+allocateTest = TestList
+  [ TestLabel "empty" $ TestCase $
+      assertEqual "allocation" [] (allocated 400 1000 [])
+
+  , TestLabel "idle" $ TestCase $
+      assertEqual "allocation" [100, 100, 100, 100] $
+        allocated 400 1000 (replicate 4 (full 0 50))
+
+  , TestLabel "weighted" $ TestCase $
+      -- 50 each, and the rest 3:1
+      assertEqual "allocation" [275, 125] $
+        allocated 400 1000 [full 3 100, full 1 100]
+
+  , TestLabel "max" $ TestCase $
+      assertEqual "allocation" [300, 300] $
+        allocated 1000 300 [full 1 100, full 0 100]
+
+  , TestLabel "not full" $ TestCase $
+      -- the busy cache only uses 100 bytes, so it gets 200 and the rest
+      -- goes to the full cache
+      assertEqual "allocation" [200, 800] $
+        allocated 1000 1000 [Demand 10 100 500, full 1 500]
+
+  , TestLabel "within budget" $ TestCase $
+      assertBool "allocation" $ (<= 1000) $ sum $
+        allocated 1000 1000 [full 1 10, full 2 10, Demand 3 1 900, full 0 0]
+  ]
+
+main :: IO ()
+main = withUnitTest $ testRunner $ TestList
+  [ TestLabel "allocate" allocateTest
+  ]
@@ -6,8 +6,11 @@
   LICENSE file in the root directory of this source tree.
 -}
 
+{-# LANGUAGE TypeApplications #-}
 module LookupTest (main) where
 
+import Data.List (sort)
+import qualified Data.Vector.Storable as V
 import Foreign
 import Foreign.C.String (CString)
 import Test.HUnit
@@ -17,7 +20,12 @@ import Util.FFI
 
 import Glean.Database.Open (readDatabase)
 import Glean.Init
+import Glean.Query.Thrift (allFacts, runQuery_)
 import Glean.RTS.Foreign.Lookup
+import Glean.RTS.Types (Pid(..))
+import qualified Glean.Schema.Cxx1.Types as Cxx
+import Glean.Typed (getId, idOf)
+import qualified Glean.Types as Thrift
 
 import TestDB
 
@@ -31,7 +39,23 @@ invariantsTest :: Test
 invariantsTest = dbTestCase $ \env repo ->
     readDatabase env repo $ \_ -> checkLookupInvariants
 
+-- | sampleIds returns facts of the predicate, all of them if there are
+-- few enough
+sampleIdsTest :: Test
+sampleIdsTest = dbTestCase $ \env repo -> do
+  names <- runQuery_ env repo $ allFacts @Cxx.Name
+  let ids = sort [ idOf (getId name) | name <- names ]
+  readDatabase env repo $ \_ lookup -> do
+    Just fact <- lookupFact lookup (head ids)
+    let pid = Pid (Thrift.fact_type fact)
+    sampled <- sampleIds lookup pid (length ids + 1)
+    assertEqual "all facts" ids (sort (V.toList sampled))
+    sampled <- sampleIds lookup pid 2
+    assertEqual "sample size" 2 (V.length sampled)
+    assertBool "sampled facts" $ all (`elem` ids) (V.toList sampled)
+
 main :: IO ()
 main = withUnitTest $ testRunner $ TestList
   [ TestLabel "invariants" invariantsTest
+  , TestLabel "sampleIds" sampleIdsTest
   ]
@@ -8,17 +8,33 @@
 
 module StorageRocksDBTest where
 
+import Control.Exception (SomeException, bracket, try)
+import Control.Monad
 import Data.Default
+import qualified Data.Map as Map
+import Data.List (sort)
 import Data.Maybe (isJust, isNothing)
+import Data.Text (Text)
+import qualified Data.Text as Text
+import qualified Data.Text.Encoding as Text
+import qualified Data.Vector.Storable as VS
 import System.IO.Temp (withSystemTempDirectory)
 import Test.HUnit
 
-import Glean.Database.Storage (Storage(..))
+import Glean.Database.Storage
 import qualified Glean.Database.Storage.RocksDB as RocksDB
+import Glean.RTS.Builder
+import Glean.RTS.Foreign.Benchmarking
+import Glean.RTS.Foreign.Define (defineFact)
+import qualified Glean.RTS.Foreign.FactSet as FactSet
+import qualified Glean.RTS.Foreign.Lookup as Lookup
+import Glean.RTS.Types (Fid, Pid, lowestFid, lowestPid)
 import qualified Glean.ServerConfig.Types as ServerConfig
+import Glean.Typed.Binary (buildRtsValue)
 import TestRunner
 import Glean.Impl.MemoryReader
 import Glean.Init
+import Glean.Types (Repo(..))
 import Glean.Util.Disk (getDiskSize)
 
 --------------------- Disk Capacity tests ------------------------------
@@ -126,6 +142,147 @@ testCacheIsNothingWhenCacheMbIsZero =
     assertBool "Cache should be Nothing when cache_mb is 0" $
       isNothing (RocksDB.rocksCache storage)
 
+--------------------- Helpers ------------------------------
+
+-- | The predicate of the facts written by the tests. The storage doesn't
+-- need a schema.
+testPid :: Pid
+testPid = lowestPid
+
+-- | Write facts of 'testPid' with the given keys. Returns a block of
+-- them for checking that they can be read back, and their IDs.
+writeFacts
+  :: Database RocksDB.RocksDB
+  -> [Text]
+  -> IO (FactBlock, [(Text, Fid)])
+writeFacts db keys = do
+  facts <- FactSet.new =<< Lookup.firstFreeId db
+  ids <- forM keys $ \key -> withBuilder $ \builder -> do
+    buildRtsValue builder key
+    size <- sizeOfBuilder builder
+    (key,) <$> defineFact facts testPid builder size
+  commit db facts
+  block <- createFactBlock facts
+  return (block, ids)
+
+-- | Check that the facts of a block can be found by ID and by key.
+assertFacts :: Database RocksDB.RocksDB -> FactBlock -> Assertion
+assertFacts db block = do
+  assertBool "facts by id" =<< lookupEachById db block
+  assertBool "facts by key" =<< lookupEachByKey db block
+  assertBool "facts by seek" =<< seekToEach db block
+
+--------------------- Compression tests ------------------------------
+
+testFinishedCompression :: Test
+testFinishedCompression =
+  TestCase $ withSystemTempDirectory "rocksdb-test" $ \tmpDir -> do
+    let config = def
+          { ServerConfig.config_db_rocksdb_finished_compression = Map.fromList
+              [ ("entities", ServerConfig.RocksDBCompression_ZSTD_DICTIONARY)
+              , ("keys", ServerConfig.RocksDBCompression_ZSTD_DICTIONARY)
+              , ("meta", ServerConfig.RocksDBCompression_NONE)
+              ]
+          }
+        repo = Repo "test" "0"
+        keys = [ "glean.test.name." <> Text.pack (show i) | i <- [1..5000] ]
+    storage <- RocksDB.newStorage tmpDir config
+    assertEqual "families to recompress"
+      [ ("entities", ServerConfig.RocksDBCompression_ZSTD_DICTIONARY)
+      , ("keys", ServerConfig.RocksDBCompression_ZSTD_DICTIONARY)
+      , ("meta", ServerConfig.RocksDBCompression_NONE)
+      ]
+      (RocksDB.rocksFinishedCompression storage)
+
+    blocks <- bracket
+      (open storage repo (Create lowestFid Nothing UseDefaultSchema)
+        (currentVersion storage))
+      close
+      $ \db -> do
+        -- in two batches, so the compaction has more than one file
+        (first, _) <- writeFacts db (take 2500 keys)
+        optimize db False
+        (second, _) <- writeFacts db (drop 2500 keys)
+        optimize db True
+        mapM_ (assertFacts db) [first, second]
+        return [first, second]
+
+    -- the recompressed facts can be read after the DB is opened again
+    bracket
+      (open storage repo ReadOnly (currentVersion storage))
+      close
+      $ \db -> do
+        mapM_ (assertFacts db) blocks
+        assertEqual "all facts" (length keys)
+          =<< seekCount db (VS.singleton testPid)
+
+testUnknownCompressionFamily :: Test
+testUnknownCompressionFamily =
+  TestCase $ withSystemTempDirectory "rocksdb-test" $ \tmpDir -> do
+    let config = def
+          { ServerConfig.config_db_rocksdb_finished_compression = Map.fromList
+              [ ("nosuchfamily", ServerConfig.RocksDBCompression_ZSTD) ]
+          }
+    r <- try $ RocksDB.newStorage tmpDir config
+    case r of
+      Left (_ :: SomeException) -> return ()
+      Right _ -> assertFailure "unknown column family should be rejected"
+
+--------------------- Prefix bloom tests ------------------------------
+
+testKeyPrefixBytes :: Test
+testKeyPrefixBytes =
+  TestCase $ withSystemTempDirectory "rocksdb-test" $ \tmpDir -> do
+    let withPrefix n = RocksDB.newStorage tmpDir def
+          { ServerConfig.config_db_rocksdb_key_prefix_bytes = n }
+    prefixed <- withPrefix 4
+    plain <- withPrefix 0
+    assertEqual "key prefix bytes" 4 (RocksDB.rocksKeyPrefixBytes prefixed)
+
+    let
+      -- each batch is flushed to its own file. The filters hold the
+      -- first 4 bytes of each key, and "", "a" and "ab" are shorter
+      -- than that once encoded.
+      batches =
+        [ ["a", "abcd", "abcdef", "b"]
+        , ["", "ab", "abc", "abcde", "abcz", "zz"]
+        , ["abcdefgh", "abd", "abcdz", "q"]
+        ]
+      -- shorter than the prefixes in the filters, the same length, and
+      -- longer, with and without matching keys
+      prefixes =
+        [ "", "a", "ab", "abc", "c"
+        , "abcd", "abcz", "abcx"
+        , "abcde", "abcdef", "abcdq"
+        ]
+
+    forM_ [("prefixed", prefixed), ("plain", plain)] $ \(name, storage) -> do
+      let repo = Repo name "0"
+      written <- bracket
+        (open storage repo (Create lowestFid Nothing UseDefaultSchema)
+          (currentVersion storage))
+        close
+        $ \db -> fmap concat $ forM batches $ \keys -> do
+          (_, ids) <- writeFacts db keys
+          optimize db False
+          return ids
+
+      -- a DB written with or without the filters can be read with or
+      -- without them
+      forM_ [prefixed, plain] $ \reader ->
+        bracket
+          (open reader repo ReadOnly (currentVersion reader))
+          close
+          $ \db -> forM_ prefixes $ \prefix -> do
+            found <- seekPrefix db testPid (Text.encodeUtf8 prefix)
+            let expected =
+                  [ fid | (key, fid) <- written, prefix `Text.isPrefixOf` key ]
+            assertEqual
+              (Text.unpack name <> " read with "
+                <> show (RocksDB.rocksKeyPrefixBytes reader)
+                <> " prefix bytes: seek " <> show prefix)
+              (sort expected)
+              (sort (VS.toList found))
 
 -- TODO: implment last 3 tests, devmate drafted them, might be incorrect
 main :: IO ()
@@ -137,4 +294,7 @@ main = withUnitTest $ testRunner $ TestList
   , TestLabel "Test cache with only cache_mb" testCacheWithOnlyCacheMb
   , TestLabel "Test cache is Nothing when cache_mb is 0 and no ratio"
       testCacheIsNothingWhenCacheMbIsZero
+  , TestLabel "Test finished compression" testFinishedCompression
+  , TestLabel "Test unknown compression family" testUnknownCompressionFamily
+  , TestLabel "Test key prefix bytes" testKeyPrefixBytes
   ]
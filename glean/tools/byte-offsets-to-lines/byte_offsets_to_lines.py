@@ -7,47 +7,322 @@
 
 # pyre-strict
 
+"""
+Convert byte offsets in files to line:column positions.
+
+Lines and columns are 1-based; the column counts characters, decoding
+the file as UTF-8. Usable as a library:
+
+    with LineIndex.from_file(path) as index:
+        line, column = index.position(offset)
+
+or from the command line, either for one file:
+
+    byte_offsets_to_lines.py FILE OFFSET...
+
+or for many files at once, reading a JSON object mapping paths to lists
+of offsets from a file (or "-" for stdin):
+
+    byte_offsets_to_lines.py --batch offsets.json --json
+
+With --cache-dir, line start tables are kept on disk keyed by a hash of
+the file contents, so files seen before are not scanned for newlines
+again.
+"""
 
 import argparse
-from typing import List, Tuple
+import hashlib
+import json
+import mmap
+import os
+import sys
+import tempfile
+from array import array
+from bisect import bisect_right
+from types import TracebackType
+from typing import Dict, Iterable, List, Optional, Tuple, Type, Union
+
+Buffer = Union[bytes, mmap.mmap]
+
+
+def line_starts(data: Buffer) -> "array[int]":
+    """
+    Returns the byte offset at which each line of data starts.
+    """
+    starts = array("Q", [0])
+    find = data.find
+    pos = find(b"\n")
+    while pos != -1:
+        starts.append(pos + 1)
+        pos = find(b"\n", pos + 1)
+    return starts
+
+
+def _map_file(path: str) -> Buffer:
+    with open(path, "rb") as f:
+        # mmap cannot map an empty file
+        if f.seek(0, 2) == 0:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class LineIndex:
+    """
+    A table of line start offsets for the contents of a file, answering
+    offset to position queries with a binary search.
+    """
+
+    def __init__(self, data: Buffer, starts: "Optional[array[int]]" = None) -> None:
+        self._data = data
+        self._starts: "array[int]" = line_starts(data) if starts is None else starts
+
+    @staticmethod
+    def from_file(path: str, cache: "Optional[LineIndexCache]" = None) -> "LineIndex":
+        """
+        Memory-maps the file at path and indexes its lines, reusing the
+        line starts stored in cache if there are any.
+        """
+        data = _map_file(path)
+        if cache is None:
+            return LineIndex(data)
+        return cache.index(data)
+
+    def close(self) -> None:
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+
+    def __enter__(self) -> "LineIndex":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc: Optional[BaseException],
+        tb: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        """The number of bytes indexed."""
+        return len(self._data)
+
+    @property
+    def starts(self) -> "array[int]":
+        return self._starts
+
+    def line(self, offset: int) -> int:
+        """
+        The 1-based line containing the byte at offset.
+        """
+        if offset < 0 or offset > len(self._data):
+            raise ValueError(f"offset {offset} is outside the file")
+        return bisect_right(self._starts, offset)
 
+    def position(self, offset: int) -> Tuple[int, int]:
+        """
+        The 1-based (line, column) of the byte at offset.
+        """
+        line = self.line(offset)
+        start = self._starts[line - 1]
+        prefix = self._data[start:offset].decode("utf-8", errors="replace")
+        return line, len(prefix) + 1
 
-def read_file(path: str, offsets: List[int]) -> None:
-    offsets.sort()
-    relative_offsets = [offsets[n] - offsets[n - 1] for n in range(1, len(offsets))]
-    relative_offsets.insert(0, offsets[0])
+    def positions(self, offsets: Iterable[int]) -> List[Tuple[int, int]]:
+        return [self.position(offset) for offset in offsets]
 
-    offsets: Tuple[int, int] = zip(offsets, relative_offsets)
 
-    with open(path, "r") as infile:
-        current_line = 1
-        current_column = 1
-        for offset in offsets:
-            absolute_offset, relative_offset = offset
+class LineIndexCache:
+    """
+    An on-disk store of line start tables, one file per distinct file
+    content named by its BLAKE2 digest. When the store grows beyond
+    max_bytes the least recently used tables are removed, down to
+    LOW_WATER of max_bytes.
 
-            chunk = infile.read(relative_offset).split("\n")
-            last_line = chunk[-1]
-            num_new_lines = len(chunk) - 1
+    The size of the store is scanned once when the cache is created and
+    then tracked as tables are added, so adding a table doesn't list the
+    directory.
+    """
 
-            if num_new_lines != 0:
-                current_line += num_new_lines
-                current_column = 1
+    LOW_WATER = 0.9
 
-            current_column += len(last_line)
+    def __init__(self, directory: str, max_bytes: int = 256 * 1024 * 1024) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+        self._total: int = sum(size for _, size, _ in self._entries())
 
-            print(f"{absolute_offset} -> {current_line}:{current_column}")
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.directory, digest + ".lines")
+
+    def index(self, data: Buffer) -> LineIndex:
+        path = self._path(hashlib.blake2b(data, digest_size=20).hexdigest())
+        starts = array("Q")
+        found = False
+        try:
+            with open(path, "rb") as f:
+                starts.frombytes(f.read())
+            # bump the entry for LRU eviction
+            os.utime(path)
+            found = len(starts) > 0
+        except (FileNotFoundError, ValueError):
+            pass
+        if found:
+            self.hits += 1
+            return LineIndex(data, starts)
+
+        self.misses += 1
+        index = LineIndex(data)
+        self._store(path, index.starts)
+        return index
+
+    def _store(self, path: str, starts: "array[int]") -> None:
+        # write to a temporary file first so that concurrent readers
+        # never see a partial table
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                starts.tofile(f)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        self._total += len(starts) * starts.itemsize
+        if self._total > self.max_bytes:
+            self._evict()
+
+    def _entries(self) -> List[Tuple[float, int, str]]:
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith(".lines"):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def _evict(self) -> None:
+        # rescan, since other processes may share the directory
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        low_water = int(self.max_bytes * self.LOW_WATER)
+        entries.sort()
+        for _, size, path in entries:
+            if total <= low_water:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        self._total = total
+
+
+def convert(
+    requests: Dict[str, List[int]], cache: Optional[LineIndexCache] = None
+) -> Dict[str, List[Tuple[int, int]]]:
+    """
+    Converts offsets for many files, opening each file once.
+    """
+    results = {}
+    for path, offsets in requests.items():
+        with LineIndex.from_file(path, cache) as index:
+            try:
+                results[path] = index.positions(offsets)
+            except ValueError as e:
+                raise ValueError(f"{path}: {e}") from e
+    return results
+
+
+def read_file(
+    path: str, offsets: List[int], cache: Optional[LineIndexCache] = None
+) -> None:
+    offsets = sorted(offsets)
+    with LineIndex.from_file(path, cache) as index:
+        for offset, (line, column) in zip(offsets, index.positions(offsets)):
+            print(f"{offset} -> {line}:{column}")
 
 
 def main() -> None:
     parser = argparse.ArgumentParser(fromfile_prefix_chars="@")
-    parser.add_argument("file", help="File path to read")
+    parser.add_argument("file", nargs="?", help="File path to read")
+    parser.add_argument(
+        "offsets", nargs="*", type=int, help="Byte offsets to convert to line numbers"
+    )
     parser.add_argument(
-        "offsets", nargs="+", type=int, help="Byte offsets to convert to line numbers"
+        "--batch",
+        metavar="JSON",
+        help='JSON file ("-" for stdin) mapping file paths to lists of offsets',
+    )
+    parser.add_argument(
+        "--json",
+        action="store_true",
+        help="Print a JSON object mapping each path to "
+        '[{"offset", "line", "column"}, ...] in input order',
+    )
+
+    parser.add_argument(
+        "--cache-dir",
+        help="Directory in which to keep line start tables between runs",
+    )
+    parser.add_argument(
+        "--cache-size-mb",
+        type=int,
+        default=256,
+        help="Maximum size of the --cache-dir contents (default: 256)",
     )
 
     parsed_args = parser.parse_args()
 
-    read_file(parsed_args.file, parsed_args.offsets)
+    cache = None
+    if parsed_args.cache_dir is not None:
+        cache = LineIndexCache(
+            parsed_args.cache_dir, parsed_args.cache_size_mb * 1024 * 1024
+        )
+
+    if parsed_args.batch is not None:
+        if parsed_args.file is not None:
+            parser.error("Cannot specify both --batch and a file")
+        if parsed_args.batch == "-":
+            requests = json.load(sys.stdin)
+        else:
+            with open(parsed_args.batch) as f:
+                requests = json.load(f)
+    elif parsed_args.file is None or not parsed_args.offsets:
+        parser.error("Specify either a file and offsets, or --batch")
+    elif not parsed_args.json:
+        try:
+            read_file(parsed_args.file, parsed_args.offsets, cache)
+        except ValueError as e:
+            parser.error(f"{parsed_args.file}: {e}")
+        return
+    else:
+        requests = {parsed_args.file: parsed_args.offsets}
+
+    try:
+        results = convert(requests, cache)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if parsed_args.json:
+        json.dump(
+            {
+                path: [
+                    {"offset": offset, "line": line, "column": column}
+                    for offset, (line, column) in zip(requests[path], positions)
+                ]
+                for path, positions in results.items()
+            },
+            sys.stdout,
+        )
+        print()
+    else:
+        for path, positions in results.items():
+            for offset, (line, column) in zip(requests[path], positions):
+                print(f"{path}:{offset} -> {line}:{column}")
 
 
 if __name__ == "__main__":
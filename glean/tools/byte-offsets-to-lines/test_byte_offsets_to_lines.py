@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+# pyre-strict
+
+"""
+Unit tests for byte_offsets_to_lines.
+"""
+
+import hashlib
+import os
+import tempfile
+import unittest
+from typing import List
+
+from byte_offsets_to_lines import convert, LineIndex, LineIndexCache
+
+
+class LineIndexTest(unittest.TestCase):
+    def test_positions(self) -> None:
+        index = LineIndex(b"ab\ncd\n\nef")
+        self.assertEqual(list(index.starts), [0, 3, 6, 7])
+        self.assertEqual(
+            index.positions([0, 2, 3, 6, 8, 9]),
+            [(1, 1), (1, 3), (2, 1), (3, 1), (4, 2), (4, 3)],
+        )
+
+    def test_columns_count_characters(self) -> None:
+        # "é" is two bytes
+        index = LineIndex("xé y\n".encode())
+        self.assertEqual(index.position(4), (1, 4))
+
+    def test_offset_outside_the_file(self) -> None:
+        index = LineIndex(b"abc")
+        with self.assertRaises(ValueError):
+            index.position(4)
+        with self.assertRaises(ValueError):
+            index.position(-1)
+
+    def test_from_file(self) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "f")
+            with open(path, "wb") as f:
+                f.write(b"a\nb\n")
+            with LineIndex.from_file(path) as index:
+                self.assertEqual(len(index), 4)
+                self.assertEqual(index.position(2), (2, 1))
+            empty = os.path.join(directory, "empty")
+            open(empty, "wb").close()
+            with LineIndex.from_file(empty) as index:
+                self.assertEqual(index.position(0), (1, 1))
+
+    def test_convert(self) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            a = os.path.join(directory, "a")
+            b = os.path.join(directory, "b")
+            for path in [a, b]:
+                with open(path, "wb") as f:
+                    f.write(b"x\ny\n")
+            self.assertEqual(
+                convert({a: [2, 0], b: [3]}),
+                {a: [(2, 1), (1, 1)], b: [(2, 2)]},
+            )
+            with self.assertRaisesRegex(ValueError, "^" + a):
+                convert({a: [10]})
+
+
+class LineIndexCacheTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.directory = os.path.join(self.tmp.name, "cache")
+
+    def tables(self) -> List[str]:
+        return sorted(f for f in os.listdir(self.directory) if f.endswith(".lines"))
+
+    def table(self, data: bytes) -> str:
+        digest = hashlib.blake2b(data, digest_size=20).hexdigest()
+        return digest + ".lines"
+
+    def test_hits_reuse_stored_starts(self) -> None:
+        cache = LineIndexCache(self.directory)
+        data = b"one\ntwo\nthree\n"
+        self.assertEqual(list(cache.index(data).starts), [0, 4, 8, 14])
+        self.assertEqual((cache.hits, cache.misses), (0, 1))
+        self.assertEqual(len(self.tables()), 1)
+
+        # a new cache on the same directory finds the table
+        again = LineIndexCache(self.directory)
+        index = again.index(data)
+        self.assertEqual((again.hits, again.misses), (1, 0))
+        self.assertEqual(index.position(9), (3, 2))
+
+    def test_corrupt_table_is_rebuilt(self) -> None:
+        cache = LineIndexCache(self.directory)
+        cache.index(b"a\nb\n")
+        [table] = self.tables()
+        with open(os.path.join(self.directory, table), "wb") as f:
+            f.write(b"xyz")
+        self.assertEqual(list(cache.index(b"a\nb\n").starts), [0, 2, 4])
+        self.assertEqual(cache.misses, 2)
+
+    def test_evicts_least_recently_used(self) -> None:
+        # each table holds 3 line starts of 8 bytes
+        cache = LineIndexCache(self.directory, max_bytes=60)
+        a, b, c = b"a\na\n", b"b\nb\n", b"c\nc\n"
+        cache.index(a)
+        cache.index(b)
+        self.assertEqual(cache._total, 48)
+        for time, data in [(1, a), (2, b)]:
+            os.utime(os.path.join(self.directory, self.table(data)), (time, time))
+
+        # using a makes b the least recently used
+        cache.index(a)
+        cache.index(c)
+        self.assertEqual(self.tables(), sorted([self.table(a), self.table(c)]))
+        self.assertEqual(cache._total, 48)
+
+    def test_size_is_scanned_on_start(self) -> None:
+        cache = LineIndexCache(self.directory)
+        cache.index(b"a\n")
+        self.assertEqual(LineIndexCache(self.directory)._total, cache._total)
+
+
+if __name__ == "__main__":
+    unittest.main()
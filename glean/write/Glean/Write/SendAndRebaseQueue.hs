@@ -394,7 +394,7 @@ withSendAndRebaseQueue backend repo inventory settings action = do
         <$> pure sendQueue
         <*> newTQueueIO
         <*> pure inventory
-        <*> LookupCache.new cacheSize 1 cacheStats
+        <*> LookupCache.new cacheSize 0 cacheStats
         <*> pure cacheStats
         <*> pure sendAndRebaseQueueStats
         <*> pure sendAndRebaseQueueFactBufferSize